@@ -0,0 +1,191 @@
+import atexit
+import dataclasses
+import threading
+import time
+from concurrent.futures import Future
+
+from logger import logger
+from metrics import metrics
+from models.message import publish_with_retry
+from utils import size_in_megabytes
+
+_lock = threading.Lock()
+_aggregator = None
+
+
+def aggregation_key(message):
+    parsed = message.first_file().parsed()
+    return parsed.type, parsed.tla, parsed.instrument_name
+
+
+def message_size(message):
+    return sum(int(file.sizeBytes) for file in message.files)
+
+
+def merge_messages(messages):
+    metrics.observe("manifest_files", len(messages))
+    if len(messages) == 1:
+        return messages[0]
+    files = [file for message in messages for file in message.files]
+    return dataclasses.replace(
+        messages[-1],
+        files=files,
+        fullSizeMegabytes=size_in_megabytes(sum(message_size(m) for m in messages)),
+    )
+
+
+@dataclasses.dataclass
+class Group:
+    deadline: float = None
+    items: list = dataclasses.field(default_factory=list)
+    size_bytes: int = 0
+
+    def fits(self, message, max_files, max_bytes):
+        if not self.items:
+            return True
+        return (
+            len(self.items) < max_files
+            and self.size_bytes + message_size(message) <= max_bytes
+        )
+
+    def add(self, tag, message):
+        self.items.append((tag, message))
+        self.size_bytes += message_size(message)
+
+    def messages(self):
+        return [message for _, message in self.items]
+
+
+def group_messages(items, max_files, max_bytes):
+    open_groups = {}
+    groups = []
+    for tag, message in items:
+        key = aggregation_key(message)
+        group = open_groups.get(key)
+        if group is None or not group.fits(message, max_files, max_bytes):
+            group = Group()
+            open_groups[key] = group
+            groups.append(group)
+        group.add(tag, message)
+    return [group.items for group in groups]
+
+
+class Aggregator:
+    def __init__(
+        self, publish, window=2.0, max_files=100, max_bytes=5000000000, clock=None
+    ):
+        self.publish = publish
+        self.window = window
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.clock = clock or time.monotonic
+        self._groups = {}
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, message):
+        future = Future()
+        ready = []
+        key = aggregation_key(message)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("aggregator has been shut down")
+            group = self._groups.get(key)
+            if group is not None and not group.fits(
+                message, self.max_files, self.max_bytes
+            ):
+                ready.append(self._groups.pop(key))
+                group = None
+            if group is None:
+                group = Group(deadline=self.clock() + self.window)
+                self._groups[key] = group
+                self._condition.notify()
+            group.add(future, message)
+            if len(group.items) >= self.max_files:
+                ready.append(self._groups.pop(key))
+        for group in ready:
+            self._publish_group(group)
+        return future
+
+    def flush(self):
+        with self._condition:
+            groups = list(self._groups.values())
+            self._groups.clear()
+        for group in groups:
+            self._publish_group(group)
+
+    def shutdown(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def _publish_group(self, group):
+        futures = [future for future, _ in group.items]
+        try:
+            result = self.publish(merge_messages(group.messages()))
+        except Exception as error:
+            for future in futures:
+                future.set_exception(error)
+        else:
+            for future in futures:
+                future.set_result(result)
+
+    def _expired_groups(self):
+        now = self.clock()
+        expired = [key for key, group in self._groups.items() if group.deadline <= now]
+        return [self._groups.pop(key) for key in expired]
+
+    def _run(self):
+        while True:
+            expired = self._wait_for_expired()
+            if expired is None:
+                return
+            for group in expired:
+                self._publish_group(group)
+
+    def _wait_for_expired(self):
+        with self._condition:
+            while not self._closed:
+                expired = self._expired_groups()
+                if expired:
+                    return expired
+                self._condition.wait(self._next_timeout())
+        return None
+
+    def _next_timeout(self):
+        deadlines = [group.deadline for group in self._groups.values()]
+        return min(deadlines) - self.clock() if deadlines else None
+
+
+def get_aggregator(config):
+    global _aggregator
+    if not config.aggregate_enabled:
+        return None
+    if _aggregator is None:
+        with _lock:
+            if _aggregator is None:
+                _aggregator = Aggregator(
+                    lambda message: publish_with_retry(config, message),
+                    window=config.aggregate_window,
+                    max_files=config.aggregate_max_files,
+                    max_bytes=config.aggregate_max_bytes,
+                )
+    return _aggregator
+
+
+def shutdown():
+    global _aggregator
+    with _lock:
+        aggregator, _aggregator = _aggregator, None
+    if aggregator is not None:
+        try:
+            aggregator.shutdown()
+        except Exception as error:
+            logger.warning("failed to flush aggregated manifests", error=str(error))
+
+
+atexit.register(shutdown)
@@ -0,0 +1,162 @@
+import asyncio
+import functools
+import time
+
+from aggregate import get_aggregator
+from batch import EventResult
+from dds import flush_updates, get_updater
+from dedup import get_deduplicator
+from logger import StageTimer, logger
+from main import (
+    accept_event,
+    build_message,
+    drain_spool,
+    event_arrived,
+    event_failed,
+    event_published,
+    is_duplicate,
+    report_event,
+    spool_to_drain,
+    verify_event,
+)
+from models.message import (
+    PublishResult,
+    message_ordering_key,
+    publish_failed,
+    publish_message,
+)
+from retry import Backoff, call_with_retry_async
+from utils import EventRejected
+
+
+def bridge_future(future, loop=None):
+    loop = loop or asyncio.get_running_loop()
+    bridged = loop.create_future()
+
+    def transfer(completed):
+        if bridged.cancelled():
+            return
+        error = completed.exception()
+        if error is not None:
+            bridged.set_exception(error)
+        else:
+            bridged.set_result(completed.result())
+
+    # Pub/Sub resolves publish futures on its own threads
+    future.add_done_callback(
+        lambda completed: loop.call_soon_threadsafe(transfer, completed)
+    )
+    return bridged
+
+
+async def run_blocking(function, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, functools.partial(function, *args, **kwargs)
+    )
+
+
+async def send_pub_sub_message_async(config, message):
+    published_at = time.perf_counter()
+    future = publish_message(config, message)
+    try:
+        message_id = await asyncio.wait_for(
+            bridge_future(future), config.publish_timeout
+        )
+    except Exception as error:
+        publish_failed(
+            config, error, published_at, message_ordering_key(config, message)
+        )
+        raise
+    result = PublishResult(
+        message_id=message_id,
+        ack_latency_ms=(time.perf_counter() - published_at) * 1000,
+    )
+    logger.info(
+        "Message published",
+        sampled=True,
+        message_id=result.message_id,
+        ack_latency_ms=round(result.ack_latency_ms, 3),
+    )
+    return result
+
+
+async def publish_with_retry_async(config, message):
+    return await call_with_retry_async(
+        lambda: send_pub_sub_message_async(config, message),
+        Backoff.from_config(config),
+        config.publish_retry_attempts,
+    )
+
+
+async def publish_async(config, message, aggregate=True):
+    aggregator = get_aggregator(config) if aggregate else None
+    if aggregator is None:
+        return await publish_with_retry_async(config, message)
+    # adding a message can publish a full group, which blocks
+    future = await run_blocking(aggregator.add, message)
+    # settled by the aggregator once the publish and its retries are done
+    return await bridge_future(future)
+
+
+async def build_message_async(accepted, config, timer):
+    # listing a zip's members reads the object
+    if config.zip_listing_enabled:
+        return await run_blocking(build_message, accepted, config, timer)
+    return build_message(accepted, config, timer)
+
+
+async def process_event_async(event, config, dds_updater, aggregate=True):
+    # the same steps as main.process_event, with the blocking ones run on the
+    # loop's thread pool
+    timer = StageTimer()
+    try:
+        accepted = accept_event(event, config, timer)
+    except EventRejected as error:
+        return EventResult.rejected(event, error)
+    deduplicator = get_deduplicator(config)
+    if deduplicator is not None and await run_blocking(
+        is_duplicate, event, deduplicator, timer
+    ):
+        return EventResult(name=event["name"], status="duplicate")
+    spool = spool_to_drain(config)
+    if spool is not None:
+        await run_blocking(drain_spool, spool, config, deduplicator, timer)
+
+    event_arrived(event, dds_updater, timer)
+    message = None
+    result = None
+    error_repr = None
+    try:
+        if config.verify_enabled:
+            await run_blocking(verify_event, event, config, timer)
+        message = await build_message_async(accepted, config, timer)
+        with timer.stage("publish"):
+            result = await publish_async(config, message, aggregate)
+        outcome = event_published(event, deduplicator, dds_updater)
+    except Exception as error:
+        error_repr = repr(error)
+        outcome = await run_blocking(
+            event_failed, event, message, error, timer.current, config, dds_updater
+        )
+    report_event(event, message, outcome, timer)
+    return EventResult(
+        name=event["name"],
+        status=outcome,
+        message_id=getattr(result, "message_id", None),
+        error=error_repr,
+    )
+
+
+async def publish_events(events, config, concurrency=None):
+    semaphore = asyncio.Semaphore(concurrency or config.async_concurrency)
+    dds_updater = get_updater(config)
+
+    async def bounded(event):
+        async with semaphore:
+            return await process_event_async(event, config, dds_updater)
+
+    try:
+        return await asyncio.gather(*(bounded(event) for event in events))
+    finally:
+        await run_blocking(flush_updates, dds_updater, config)
@@ -0,0 +1,206 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from dds import flush_updates, get_updater
+from logger import StageTimer, logger
+from main import process_event
+from models.config import get_config
+from storage import GCSStorage, LocalStorage
+from utils import InvalidConfig
+
+# the count each outcome of process_event adds to, anything else has failed
+OUTCOME_COUNTS = {
+    "published": "published",
+    "duplicate": "skipped",
+    "rejected": "unsupported",
+    "spooled": "spooled",
+}
+
+
+@dataclass
+class BackfillStats:
+    listed: int = 0
+    skipped: int = 0
+    unsupported: int = 0
+    published: int = 0
+    spooled: int = 0
+    failed: int = 0
+    started: float = 0.0
+
+    def count(self, outcome):
+        field = OUTCOME_COUNTS.get(outcome, "failed")
+        setattr(self, field, getattr(self, field) + 1)
+
+    def progress(self, every):
+        if every and self.listed % every == 0:
+            self.log()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.listed / elapsed if elapsed > 0 else 0.0
+
+    def log(self):
+        logger.info(
+            self.summary(),
+            listed=self.listed,
+            skipped=self.skipped,
+            unsupported=self.unsupported,
+            published=self.published,
+            spooled=self.spooled,
+            failed=self.failed,
+            objects_per_second=round(self.rate(), 1),
+        )
+
+    def summary(self):
+        return (
+            f"Backfill: listed {self.listed}, skipped {self.skipped}, "
+            f"unsupported {self.unsupported}, published {self.published}, "
+            f"spooled {self.spooled}, failed {self.failed} in {self.elapsed():.1f}s "
+            f"({self.rate():.1f} objects/s)"
+        )
+
+
+class NotifiedLedger:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._names = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as ledger:
+                self._names.update(line.rstrip("\n") for line in ledger)
+
+    def __contains__(self, obj):
+        return self._key(obj) in self._names
+
+    def record(self, obj):
+        key = self._key(obj)
+        with self._lock:
+            self._names.add(key)
+            with open(self.path, "a", encoding="utf-8") as ledger:
+                ledger.write(f"{key}\n")
+
+    @staticmethod
+    def _key(obj):
+        return f"{obj.bucket}/{obj.name}"
+
+
+def republish(obj, config):
+    # objects go through the same steps as a bucket event, so DDS updates
+    # are queued behind the breaker and failed publishes are retried and
+    # spooled. Updates are flushed once the backfill finishes
+    try:
+        outcome, _ = process_event(
+            obj.to_event(), config, StageTimer(), flush_dds=False
+        )
+    except Exception as error:
+        logger.warning(
+            "Backfill: failed to publish", file_name=obj.name, error=repr(error)
+        )
+        return "errored"
+    return outcome
+
+
+def backfill(
+    storage,
+    config,
+    prefix=None,
+    workers=8,
+    ledger=None,
+    progress_every=1000,
+):
+    stats = BackfillStats(started=time.perf_counter())
+    max_pending = workers * 2
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for obj in storage.list_objects(prefix):
+            stats.listed += 1
+            if ledger is not None and obj in ledger:
+                stats.skipped += 1
+            else:
+                make_room(pending, max_pending, stats, ledger)
+                pending[executor.submit(republish, obj, config)] = obj
+            stats.progress(progress_every)
+        collect(wait(pending).done, pending, stats, ledger)
+    flush_updates(get_updater(config), config)
+
+    stats.log()
+    return stats
+
+
+def make_room(pending, max_pending, stats, ledger):
+    # listing runs ahead of publishing by at most max_pending objects
+    if len(pending) >= max_pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        collect(done, pending, stats, ledger)
+
+
+def collect(done, pending, stats, ledger):
+    for future in done:
+        obj = pending.pop(future)
+        outcome = future.result()
+        stats.count(outcome)
+        if outcome == "published" and ledger is not None:
+            ledger.record(obj)
+
+
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"{value} is negative")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Republish manifests for objects already in the NiFi bucket"
+    )
+    parser.add_argument("--bucket", required=True, help="bucket to backfill")
+    parser.add_argument("--prefix", help="only backfill objects with this prefix")
+    parser.add_argument(
+        "--local-dir", help="read objects from a local directory instead of GCS"
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--ledger",
+        default="backfill_ledger.txt",
+        help="file recording objects already notified, skipped on later runs",
+    )
+    parser.add_argument(
+        "--progress-every",
+        type=non_negative_int,
+        default=1000,
+        help="log progress after this many objects, 0 to only log the summary",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        config = get_config()
+    except InvalidConfig as error:
+        parser.error(str(error))
+
+    if args.local_dir:
+        storage = LocalStorage(args.local_dir, bucket_name=args.bucket)
+    else:
+        storage = GCSStorage(args.bucket)
+
+    stats = backfill(
+        storage,
+        config,
+        prefix=args.prefix,
+        workers=args.workers,
+        ledger=NotifiedLedger(args.ledger),
+        progress_every=args.progress_every,
+    )
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
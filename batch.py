@@ -0,0 +1,222 @@
+import itertools
+import time
+from dataclasses import dataclass
+
+from aggregate import group_messages, merge_messages
+from dds import flush_updates, get_updater
+from dedup import dedup_key, get_deduplicator
+from logger import logger
+from metrics import metrics, record_publish_lag
+from models.message import (
+    create_messages,
+    message_ordering_key,
+    publish_message,
+    send_pub_sub_message,
+    wait_for_publish,
+)
+from models.preflight import preflight
+from retry import Backoff, call_with_retry, is_transient
+from spool import spool_failed_publish
+from utils import EventRejected, InvalidContent
+from verify import verify_messages
+
+
+@dataclass
+class EventResult:
+    name: str
+    status: str
+    message_id: str = None
+    error: str = None
+    reason: str = None
+
+    @classmethod
+    def rejected(cls, event, error):
+        name = event.get("name") if isinstance(event, dict) else None
+        return cls(name=name, status="rejected", error=str(error), reason=error.reason)
+
+
+def reject(event, error):
+    result = EventResult.rejected(event, error)
+    logger.warning(
+        "Event rejected", file_name=result.name, reason=error.reason, error=result.error
+    )
+    metrics.increment("rejections_total", reason=error.reason)
+    return result
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def publish_batch(events, config):
+    dds_updater = get_updater(config)
+    deduplicator = get_deduplicator(config)
+    try:
+        for chunk in chunked(events, config.batch_size):
+            # each event's result goes in its slot so results are yielded in
+            # the order of the events, whichever stage settled them
+            results = [None] * len(chunk)
+            indexes, accepted = _preflight(chunk, config, results)
+            if deduplicator is not None:
+                indexes, accepted = _skip_duplicates(
+                    chunk, indexes, accepted, deduplicator, results
+                )
+            fresh = [chunk[index] for index in indexes]
+            messages = list(create_messages(fresh, config, accepted))
+            if config.verify_enabled:
+                messages = verify_messages(messages, config)
+            published = _publish_chunk(messages, config, dds_updater, deduplicator)
+            for index, result in zip(indexes, published):
+                results[index] = result
+            yield from results
+    finally:
+        flush_updates(dds_updater, config)
+
+
+def _preflight(chunk, config, results):
+    indexes = []
+    accepted = []
+    for index, event in enumerate(chunk):
+        try:
+            typed_event = preflight(event, config)
+        except EventRejected as error:
+            results[index] = reject(event, error)
+            _record_outcome(None, "rejected")
+            continue
+        indexes.append(index)
+        accepted.append(typed_event)
+    return indexes, accepted
+
+
+def _skip_duplicates(chunk, indexes, accepted, deduplicator, results):
+    fresh = []
+    fresh_accepted = []
+    keys = set()
+    for index, typed_event in zip(indexes, accepted):
+        event = chunk[index]
+        key = dedup_key(event)
+        if key in keys or deduplicator.is_duplicate(event):
+            _record_outcome(None, "duplicate")
+            results[index] = EventResult(name=event["name"], status="duplicate")
+            continue
+        keys.add(key)
+        fresh.append(index)
+        fresh_accepted.append(typed_event)
+    return fresh, fresh_accepted
+
+
+def _publish_chunk(chunk, config, dds_updater, deduplicator):
+    dds_updater.enqueue_all((event for event, _, _ in chunk), "in_nifi_bucket")
+
+    outcomes = [None] * len(chunk)
+    valid = _built_messages(chunk, outcomes)
+    # every manifest is sent before any is waited on, so their publishes overlap
+    pending = [_start_publish(unit, config) for unit in _publish_units(valid, config)]
+    for indexes, manifest, future, published_at in pending:
+        outcome = _finish_publish(config, manifest, future, published_at)
+        for index in indexes:
+            outcomes[index] = outcome
+
+    results = [
+        _settle(config, event, message, outcome, dds_updater, deduplicator)
+        for (event, message, _), outcome in zip(chunk, outcomes)
+    ]
+    dds_updater.enqueue_all(
+        (
+            event
+            for (event, _, _), result in zip(chunk, results)
+            if result.status == "published"
+        ),
+        "nifi_notified",
+    )
+    return results
+
+
+def _built_messages(chunk, outcomes):
+    valid = []
+    for index, (_, message, error) in enumerate(chunk):
+        if error is None:
+            valid.append((index, message))
+        else:
+            stage = "verify" if isinstance(error, InvalidContent) else "build"
+            outcomes[index] = (None, error, stage)
+    return valid
+
+
+def _start_publish(unit, config):
+    indexes = [index for index, _ in unit]
+    published_at = time.perf_counter()
+    try:
+        manifest = merge_messages([message for _, message in unit])
+    except Exception as error:
+        return indexes, None, error, published_at
+    try:
+        future = publish_message(config, manifest)
+    except Exception as error:
+        future = error
+    return indexes, manifest, future, published_at
+
+
+def _finish_publish(config, manifest, future, published_at):
+    if manifest is None:
+        # the manifest could not be built, so there is nothing to retry
+        return (None, future, "build")
+    try:
+        if isinstance(future, Exception):
+            raise future
+        result = wait_for_publish(
+            config, future, published_at, message_ordering_key(config, manifest)
+        )
+    except Exception as error:
+        return _retry_publish(config, manifest, error)
+    return (result, None, None)
+
+
+def _settle(config, event, message, outcome, dds_updater, deduplicator):
+    result, error, stage = outcome
+    if error is None:
+        record_publish_lag(event)
+        _record_outcome(message, "published")
+        if deduplicator is not None:
+            deduplicator.record(event)
+        return EventResult(
+            name=event["name"], status="published", message_id=result.message_id
+        )
+    metrics.increment("errors_total", stage=stage, error=type(error).__name__)
+    if stage == "publish" and spool_failed_publish(config, event, message, error):
+        _record_outcome(message, "spooled")
+        return EventResult(name=event["name"], status="spooled", error=repr(error))
+    _record_outcome(message, "errored")
+    dds_updater.enqueue(event, "errored", repr(error))
+    return EventResult(name=event["name"], status="errored", error=repr(error))
+
+
+def _retry_publish(config, manifest, error):
+    if not is_transient(error) or config.publish_retry_attempts < 2:
+        return (None, error, "publish")
+    try:
+        result = call_with_retry(
+            lambda: send_pub_sub_message(config, manifest),
+            Backoff.from_config(config),
+            config.publish_retry_attempts - 1,
+        )
+    except Exception as retry_error:
+        return (None, retry_error, "publish")
+    return (result, None, None)
+
+
+def _publish_units(items, config):
+    if not config.aggregate_enabled:
+        return [[item] for item in items]
+    return group_messages(items, config.aggregate_max_files, config.aggregate_max_bytes)
+
+
+def _record_outcome(message, outcome):
+    if metrics.enabled:
+        route = message.route_name() if message is not None else "none"
+        metrics.increment("events_total", outcome=outcome, route=route)
@@ -0,0 +1,87 @@
+"""Events per second through the asyncio pipeline by concurrency level.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_async
+    python -m benchmarks.bench_async --events 2000 --concurrency 1 16 256
+
+Pub/Sub and DDS are replaced by the fakes in fakes.py with the given latency.
+The DDS client is synchronous, so DDS updates are sent by DDS_WORKERS threads
+in both runners. With --threads the same events are also sent through
+publishMsg from a thread pool of each size, for comparison.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("PROJECT_ID", "bench_project_id")
+os.environ.setdefault("TOPIC_NAME", "nifi-notify")
+os.environ.setdefault("ENV", "bench")
+os.environ.setdefault("ON-PREM-SUBFOLDER", "DEV")
+os.environ.setdefault("DDS_WORKERS", "64")
+
+import clients  # noqa:E402
+import dds  # noqa:E402
+from aio import publish_events  # noqa:E402
+from benchmarks.loadgen import synthetic_events  # noqa:E402
+from fakes import FakeDDSClient, FakePublisherClient  # noqa:E402
+from logger import logger  # noqa:E402
+from main import publishMsg  # noqa:E402
+from models.config import get_config  # noqa:E402
+
+
+def run_async(events, concurrency):
+    start = time.perf_counter()
+    asyncio.run(publish_events(events, get_config(), concurrency))
+    return time.perf_counter() - start
+
+
+def run_threads(events, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda event: publishMsg(event, None), events))
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 8, 32, 128, 512]
+    )
+    parser.add_argument("--publish-latency", type=float, default=0.05)
+    parser.add_argument("--dds-latency", type=float, default=0.05)
+    parser.add_argument("--threads", action="store_true", help="also run publishMsg")
+    args = parser.parse_args(argv)
+
+    publisher = FakePublisherClient(latency=args.publish_latency)
+    dds_client = FakeDDSClient(latency=args.dds_latency)
+    clients.set_client_factories(lambda _config: publisher, lambda: dds_client)
+    runners = {"asyncio": run_async}
+    if args.threads:
+        runners["threads"] = run_threads
+
+    print(f"{'runner':>8} {'concurrency':>11} {'seconds':>8} {'events/s':>9}")
+    with open(os.devnull, "w") as devnull:
+        logger.stream = devnull
+        try:
+            for concurrency in args.concurrency:
+                for name, runner in runners.items():
+                    events = list(synthetic_events(args.events, seed=concurrency))
+                    elapsed = runner(events, concurrency)
+                    dds.shutdown()
+                    print(
+                        f"{name:>8} {concurrency:>11} {elapsed:>8.2f} "
+                        f"{len(events) / elapsed:>9.0f}"
+                    )
+        finally:
+            logger.stream = None
+            clients.set_client_factories()
+            publisher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Per-event latency of warm publishMsg invocations with and without shared clients.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_clients
+"""
+
+import os
+import statistics
+import time
+from unittest import mock
+
+os.environ.setdefault("PUBSUB_EMULATOR_HOST", "localhost:8085")
+os.environ.setdefault("PROJECT_ID", "bench_project_id")
+os.environ.setdefault("TOPIC_NAME", "nifi-notify")
+os.environ.setdefault("ENV", "bench")
+os.environ.setdefault("ON-PREM-SUBFOLDER", "DEV")
+
+import blaise_dds  # noqa:E402
+from google.cloud.pubsub_v1 import PublisherClient  # noqa:E402
+
+import clients  # noqa:E402
+from logger import logger  # noqa:E402
+from main import publishMsg  # noqa:E402
+
+EVENT = {
+    "name": "dd_OPN2102R_0103202021_16428.zip",
+    "bucket": "ons-blaise-v2-nifi",
+    "md5Hash": "0a14db6e48b947b57988a2f61469f228",
+    "size": "20",
+    "timeCreated": "0103202021_16428",
+}
+
+
+def run(invocations, shared_clients):
+    timings = []
+    for _ in range(invocations):
+        if not shared_clients:
+            clients.reset_publisher_client()
+            clients.reset_dds_client()
+        start = time.perf_counter()
+        publishMsg(EVENT, None)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    print(
+        f"{label}: mean {statistics.mean(timings):.3f}ms "
+        f"median {statistics.median(timings):.3f}ms "
+        f"max {max(timings):.3f}ms"
+    )
+
+
+def main(invocations=200):
+    with mock.patch.object(PublisherClient, "publish"), mock.patch.object(
+        blaise_dds.Client, "update_state"
+    ), mock.patch.object(logger, "stream", open(os.devnull, "w")):
+        per_event = run(invocations, shared_clients=False)
+        shared = run(invocations, shared_clients=True)
+    clients.shutdown()
+    report("client per event", per_event)
+    report("shared clients  ", shared)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Publish latency of publishMsg against a slow DDS, with blocking and queued updates.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_dds
+"""
+
+import os
+import statistics
+import time
+from unittest import mock
+
+os.environ.setdefault("PUBSUB_EMULATOR_HOST", "localhost:8085")
+os.environ.setdefault("PROJECT_ID", "bench_project_id")
+os.environ.setdefault("TOPIC_NAME", "nifi-notify")
+os.environ.setdefault("ENV", "bench")
+os.environ.setdefault("ON-PREM-SUBFOLDER", "DEV")
+
+import blaise_dds  # noqa:E402
+from google.cloud.pubsub_v1 import PublisherClient  # noqa:E402
+
+import clients  # noqa:E402
+import dds  # noqa:E402
+from logger import logger  # noqa:E402
+from main import publishMsg  # noqa:E402
+from models.config import Config  # noqa:E402
+from models.message import create_message, send_pub_sub_message  # noqa:E402
+from utils import update_data_delivery_state  # noqa:E402
+
+DDS_LATENCY = 0.05
+
+EVENT = {
+    "name": "dd_OPN2102R_0103202021_16428.zip",
+    "bucket": "ons-blaise-v2-nifi",
+    "md5Hash": "0a14db6e48b947b57988a2f61469f228",
+    "size": "20",
+    "timeCreated": "0103202021_16428",
+}
+
+
+def publish_with_blocking_dds(event, _context):
+    config = Config.from_env()
+    update_data_delivery_state(event, "in_nifi_bucket")
+    send_pub_sub_message(config, create_message(event, config))
+    update_data_delivery_state(event, "nifi_notified")
+
+
+def run(entry_point, invocations):
+    published_at = []
+
+    def publish(*_args, **_kwargs):
+        published_at.append(time.perf_counter())
+        return mock.Mock()
+
+    publish_latencies = []
+    invocation_latencies = []
+    with mock.patch.object(
+        PublisherClient, "publish", side_effect=publish
+    ), mock.patch.object(
+        blaise_dds.Client,
+        "update_state",
+        side_effect=lambda *_: time.sleep(DDS_LATENCY),
+    ), mock.patch.object(
+        logger, "stream", open(os.devnull, "w")
+    ):
+        for _ in range(invocations):
+            start = time.perf_counter()
+            entry_point(EVENT, None)
+            publish_latencies.append((published_at[-1] - start) * 1000)
+            invocation_latencies.append((time.perf_counter() - start) * 1000)
+    return publish_latencies, invocation_latencies
+
+
+def report(label, timings):
+    publish_latencies, invocation_latencies = timings
+    print(
+        f"{label}: publish after {statistics.median(publish_latencies):.1f}ms, "
+        f"invocation {statistics.median(invocation_latencies):.1f}ms (median)"
+    )
+
+
+def main(invocations=20):
+    blocking = run(publish_with_blocking_dds, invocations)
+    queued = run(publishMsg, invocations)
+    dds.shutdown()
+    clients.shutdown()
+    print(f"DDS latency {DDS_LATENCY * 1000:.0f}ms per update")
+    report("blocking dds updates", blocking)
+    report("queued dds updates  ", queued)
+
+
+if __name__ == "__main__":
+    main()
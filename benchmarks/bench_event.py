@@ -0,0 +1,92 @@
+"""Event validation cost per event over a mixed valid and invalid corpus.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_event
+    python -m benchmarks.bench_event --events 10000 --invalid 0.25
+"""
+
+import argparse
+import base64
+import hashlib
+import random
+import timeit
+
+from benchmarks.bench_filename import corpus
+from models.event import parse_event
+from utils import InvalidEvent, md5hash_to_md5sum
+
+BREAKAGES = [
+    lambda event: event.pop("md5Hash"),
+    lambda event: event.update(size="12.5"),
+    lambda event: event.update(md5Hash="not base64"),
+    lambda event: event.update(size=20, timeCreated=None),
+    lambda event: event.update(name=""),
+]
+
+
+def events(size, invalid, seed=2101):
+    generator = random.Random(seed)
+    result = []
+    for key in corpus(size, seed):
+        name, bucket = key.split(":")
+        event = {
+            "name": name,
+            "bucket": bucket,
+            "size": str(generator.randint(1, 10**9)),
+            "md5Hash": base64.b64encode(hashlib.md5(key.encode()).digest()).decode(),
+            "timeCreated": "2021-03-01T16:42:08.123Z",
+            "generation": str(generator.randint(1, 10**16)),
+        }
+        if generator.random() < invalid:
+            generator.choice(BREAKAGES)(event)
+        result.append(event)
+    return result
+
+
+def legacy_parse(event):
+    return (
+        event["name"],
+        event["bucket"],
+        int(event["size"]),
+        md5hash_to_md5sum(event["md5Hash"]),
+        event["timeCreated"],
+    )
+
+
+def validate_all(function, corpus_events):
+    for event in corpus_events:
+        try:
+            function(event)
+        except (InvalidEvent, KeyError, TypeError, ValueError):
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--invalid", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    mixed = events(args.events, args.invalid)
+    valid = events(args.events, 0.0)
+    invalid = events(args.events, 1.0)
+    for label, function, corpus_events in [
+        ("legacy indexing, valid  ", legacy_parse, valid),
+        ("parse_event, valid      ", parse_event, valid),
+        ("parse_event, invalid    ", parse_event, invalid),
+        (f"parse_event, {args.invalid:.0%} invalid", parse_event, mixed),
+    ]:
+        best = min(
+            timeit.repeat(
+                lambda: validate_all(function, corpus_events),
+                number=10,
+                repeat=args.repeat,
+            )
+        )
+        print(f"{label}: {best / (10 * len(corpus_events)) * 1e9:.0f}ns per event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Filename parsing cost of the legacy File accessors against models.filename.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_filename
+"""
+
+import pathlib
+import random
+import timeit
+
+from models.filename import parse_name
+
+SURVEYS = ["OPN", "LMS", "LMC", "LMB", "LMO", "FRS", "IPS", "OLS"]
+SUFFIXES = ["A", "B", "R", "_A1", "_BK1", "_BK2", ""]
+
+
+def corpus(size=1000, seed=2101):
+    generator = random.Random(seed)
+    names = []
+    for _ in range(size):
+        file_type = generator.choice(["dd", "mi"])
+        instrument = (
+            f"{generator.choice(SURVEYS)}{generator.randint(2101, 2512)}"
+            f"{generator.choice(SUFFIXES)}"
+        )
+        timestamp = (
+            f"{generator.randint(1, 28):02}{generator.randint(1, 12):02}"
+            f"{generator.randint(2021, 2026)}_{generator.randint(0, 235959):06}"
+        )
+        names.append(f"{file_type}_{instrument}_{timestamp}.zip:ons-blaise-v2-nifi")
+    return names
+
+
+def legacy_parse(name):
+    filename = name.split(":")[0]
+    file_prefix = pathlib.Path(filename).stem
+    return (
+        pathlib.Path(filename).suffix,
+        name.split("_")[0],
+        filename.split("_")[1][0:3].upper(),
+        "_".join(
+            part for part in file_prefix.split("_")[1:] if not part.isnumeric()
+        ).upper(),
+    )
+
+
+def parse(name):
+    parsed = parse_name(name)
+    return (
+        parsed.extension,
+        parsed.type,
+        parsed.survey_tla(),
+        parsed.instrument_name,
+    )
+
+
+def cold_parse(name):
+    return parse_name.__wrapped__(name)
+
+
+def main(repeat=5):
+    names = corpus()
+    assert [legacy_parse(name) for name in names] == [parse(name) for name in names]
+
+    for label, function in [
+        ("legacy accessors", legacy_parse),
+        ("uncached parse  ", cold_parse),
+        ("cached parse    ", parse),
+    ]:
+        best = min(
+            timeit.repeat(
+                lambda: [function(name) for name in names], number=10, repeat=repeat
+            )
+        )
+        print(f"{label}: {best / (10 * len(names)) * 1e6:.2f}us per name")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Events per second through publishBatch with and without ordering keys.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ordering
+    python -m benchmarks.bench_ordering --events 2000 --instruments 1 10 100
+
+Pub/Sub and DDS are replaced by the fakes in fakes.py. Like the Pub/Sub
+client, the fake publisher sends messages with the same ordering key one
+after another, so with ordering each instrument's manifests take one publish
+latency each while different instruments publish alongside each other. A
+single instrument is the cost of serialising every publish. The run also
+checks that each instrument's manifests arrived in the order of its events.
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import time
+
+os.environ.setdefault("PROJECT_ID", "bench_project_id")
+os.environ.setdefault("TOPIC_NAME", "nifi-notify")
+os.environ.setdefault("ENV", "bench")
+os.environ.setdefault("ON-PREM-SUBFOLDER", "DEV")
+
+import clients  # noqa:E402
+import dds  # noqa:E402
+from batch import publish_batch  # noqa:E402
+from fakes import FakeDDSClient, FakePublisherClient  # noqa:E402
+from logger import logger  # noqa:E402
+from models.config import get_config  # noqa:E402
+
+SURVEYS = ["OPN", "LMS", "LMC", "LMB", "FRS", "IPS", "OLS"]
+
+
+def events(count, instruments):
+    names = [
+        f"{SURVEYS[index % len(SURVEYS)]}{2101 + index}A"
+        for index in range(instruments)
+    ]
+    return [
+        {
+            "name": f"dd_{names[sequence % instruments]}_01032021_{sequence:06}.zip",
+            "bucket": "ons-blaise-v2-nifi",
+            "md5Hash": "CgTbbki5R7V5iPKYFGnyKA==",
+            "size": "20000000",
+            "timeCreated": "2021-03-01T16:42:08.123Z",
+        }
+        for sequence in range(count)
+    ]
+
+
+def in_order(publisher):
+    for manifests in publisher.delivered.values():
+        names = [json.loads(data)["files"][0]["name"] for data in manifests]
+        sequences = [name.split(".")[0].rsplit("_", 1)[1] for name in names]
+        if sequences != sorted(sequences):
+            return False
+    return True
+
+
+def run(config, count, instruments, latency):
+    publisher = FakePublisherClient(latency=latency)
+    clients.set_client_factories(lambda _config: publisher, FakeDDSClient)
+    try:
+        start = time.perf_counter()
+        results = list(publish_batch(events(count, instruments), config))
+        elapsed = time.perf_counter() - start
+    finally:
+        dds.shutdown()
+        clients.set_client_factories()
+        publisher.stop()
+    published = sum(1 for result in results if result.status == "published")
+    return published, elapsed, in_order(publisher)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument(
+        "--instruments", type=int, nargs="+", default=[1, 10, 100, 1000]
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--publish-latency", type=float, default=0.005)
+    args = parser.parse_args(argv)
+
+    config = dataclasses.replace(get_config(), batch_size=args.batch_size)
+    runs = [("unordered", config, None)] + [
+        ("ordered", dataclasses.replace(config, ordering_enabled=True), instruments)
+        for instruments in args.instruments
+    ]
+
+    print(f"{'run':>9} {'instruments':>11} {'seconds':>8} {'events/s':>9} in order")
+    with open(os.devnull, "w") as devnull:
+        logger.stream = devnull
+        try:
+            for name, run_config, instruments in runs:
+                published, elapsed, ordered = run(
+                    run_config,
+                    args.events,
+                    instruments or max(args.instruments),
+                    args.publish_latency,
+                )
+                print(
+                    f"{name:>9} {instruments or max(args.instruments):>11} "
+                    f"{elapsed:>8.2f} {published / elapsed:>9.0f} {ordered}"
+                )
+        finally:
+            logger.stream = None
+
+
+if __name__ == "__main__":
+    main()
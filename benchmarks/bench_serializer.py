@@ -0,0 +1,48 @@
+"""Manifest serialization cost of json.dumps(asdict(...)) against models.serializer.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_serializer
+"""
+
+import json
+import timeit
+from dataclasses import asdict
+
+from models.config import Config
+from models.message import create_message
+from models.serializer import serialize
+
+CONFIG = Config(
+    on_prem_subfolder="DEV", project_id="bench", topic_name="nifi-notify", env="bench"
+)
+
+EVENT = {
+    "name": "dd_LMS2102_BK1_0103202021_16428.zip",
+    "bucket": "ons-blaise-v2-nifi",
+    "md5Hash": "0a14db6e48b947b57988a2f61469f228",
+    "size": "12004783",
+    "timeCreated": "2021-03-01T16:42:08.123Z",
+}
+
+
+def legacy_serialize(message):
+    return bytes(json.dumps(asdict(message)), encoding="utf-8")
+
+
+def main(number=20000, repeat=5):
+    message = create_message(EVENT, CONFIG)
+    assert serialize(message) == legacy_serialize(message)
+
+    for label, function in [
+        ("json.dumps(asdict)", legacy_serialize),
+        ("serializer        ", serialize),
+    ]:
+        best = min(
+            timeit.repeat(lambda: function(message), number=number, repeat=repeat)
+        )
+        print(f"{label}: {best / number * 1e6:.2f}us per message")
+
+
+if __name__ == "__main__":
+    main()
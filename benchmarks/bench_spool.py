@@ -0,0 +1,80 @@
+"""Throughput of draining spooled manifests by spool type and batch size.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_spool
+    python -m benchmarks.bench_spool --entries 5000 --batch-sizes 100 1000 --latency 20
+
+Manifests are published to FakePublisherClient with --latency milliseconds per
+publish and DDS updates go to FakeDDSClient, so the numbers show the spool and
+batching overhead rather than Pub/Sub round trips.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+import clients
+from drain import drain_all
+from fakes import FakeDDSClient, FakePublisherClient
+from logger import logger
+from models.config import Config
+from spool import FileSpool, SpoolEntry, SQLiteSpool
+
+SPOOLS = {
+    "file": lambda root: FileSpool(os.path.join(root, "spool.jsonl")),
+    "sqlite": lambda root: SQLiteSpool(os.path.join(root, "spool.db")),
+}
+
+
+def fill(spool, entries):
+    for number in range(entries):
+        name = f"dd_OPN2101A_{number}.zip"
+        spool.add(
+            SpoolEntry(
+                event={"name": name, "bucket": "ons-blaise-v2-nifi"},
+                manifest=json.dumps({"files": [{"name": name}]}),
+                error="ServiceUnavailable('unavailable')",
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--latency", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    config = Config(
+        on_prem_subfolder="DEV",
+        project_id="bench",
+        topic_name="nifi-notify",
+        env="bench",
+    )
+    publisher = FakePublisherClient(latency=args.latency / 1000)
+    clients.set_client_factories(lambda _config: publisher, FakeDDSClient)
+    print(f"{'spool':>8} {'batch':>6} {'seconds':>8} {'per second':>11}")
+    try:
+        with open(os.devnull, "w") as devnull:
+            logger.stream = devnull
+            for name, create in SPOOLS.items():
+                for batch_size in args.batch_sizes:
+                    with tempfile.TemporaryDirectory() as root:
+                        spool = create(root)
+                        fill(spool, args.entries)
+                        stats = drain_all(spool, config, batch_size)
+                        spool.close()
+                    print(
+                        f"{name:>8} {batch_size:>6} {stats.elapsed_seconds:>8.2f} "
+                        f"{stats.rate():>11.0f}"
+                    )
+    finally:
+        logger.stream = None
+        clients.set_client_factories()
+        publisher.stop()
+
+
+if __name__ == "__main__":
+    main()
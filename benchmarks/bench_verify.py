@@ -0,0 +1,113 @@
+"""Latency of streaming MD5 verification by object size and chunk size.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_verify
+    python -m benchmarks.bench_verify --sizes 1 16 256 --workers 8
+
+Objects are written to a temporary directory and read through LocalStorage,
+so the numbers are a lower bound for GCS, where download bandwidth dominates.
+"""
+
+import argparse
+import base64
+import hashlib
+import os
+import tempfile
+import time
+
+from models.config import Config
+from verify import verify_content, verify_messages
+
+MEGABYTE = 1024 * 1024
+
+
+def write_object(root, bucket, name, size):
+    path = os.path.join(root, bucket, name)
+    md5 = hashlib.md5()
+    block = os.urandom(MEGABYTE)
+    with open(path, "wb") as file:
+        for written in range(0, size, MEGABYTE):
+            data = block[: min(MEGABYTE, size - written)]
+            file.write(data)
+            md5.update(data)
+    return {
+        "name": name,
+        "bucket": bucket,
+        "md5Hash": str(base64.b64encode(md5.digest()), "utf-8"),
+        "size": str(size),
+        "timeCreated": "2021-03-01T16:42:08.123Z",
+    }
+
+
+def config(root, chunk_size, workers=4):
+    return Config(
+        on_prem_subfolder="DEV",
+        project_id="bench",
+        topic_name="nifi-notify",
+        env="bench",
+        verify_enabled=True,
+        verify_max_bytes=2**40,
+        verify_chunk_size=chunk_size,
+        verify_workers=workers,
+        storage_root=root,
+    )
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16, 64, 256])
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[64, 1024, 8192])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        bucket = "ons-blaise-v2-nifi"
+        os.mkdir(os.path.join(root, bucket))
+        events = {
+            size: write_object(
+                root, bucket, f"dd_OPN2101A_{size}MB.zip", size * MEGABYTE
+            )
+            for size in args.sizes
+        }
+
+        print(
+            f"{'size':>8} "
+            + " ".join(f"{f'{c}KB chunk':>16}" for c in args.chunk_sizes)
+        )
+        for size, event in events.items():
+            cells = []
+            for chunk_kb in args.chunk_sizes:
+                bench_config = config(root, chunk_kb * 1024)
+                elapsed = best_of(
+                    lambda: verify_content(event, bench_config), args.repeat
+                )
+                cells.append(f"{elapsed * 1000:>9.1f}ms {size / elapsed:>4.0f}MB/s")
+            print(f"{size:>6}MB " + " ".join(f"{cell:>16}" for cell in cells))
+
+        batch = [(event, None, None) for event in events.values()] * args.workers
+        total = sum(int(event["size"]) for event, _, _ in batch) / MEGABYTE
+        for workers in sorted({1, args.workers}):
+            bench_config = config(root, 1024 * 1024, workers)
+            elapsed = best_of(
+                lambda: verify_messages(batch, bench_config),
+                args.repeat,
+            )
+            print(
+                f"batch of {len(batch)} objects, {workers} workers: "
+                f"{elapsed * 1000:.1f}ms, {total / elapsed:.0f}MB/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Import time of the entry points, checked against a cold-start budget.
+
+Run from the repository root:
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --check --runs 7
+
+Each entry point is imported in a fresh interpreter with -X importtime. The
+median cumulative time of every module it loads is reported, slowest first.
+With --check the run fails when an entry point exceeds its budget in
+benchmarks/import_budget.json or loads a module that budget forbids.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+
+BUDGET_FILE = os.path.join(os.path.dirname(__file__), "import_budget.json")
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+@dataclass
+class ImportRecord:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output):
+    records = []
+    for line in output.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append(
+                ImportRecord(name, int(self_us), int(cumulative_us), len(indent) // 2)
+            )
+    return records
+
+
+def entry_point_imports(records, entry_point):
+    # children are printed before their parent, so the entry point's imports
+    # are the deeper records immediately above it
+    for index, record in enumerate(records):
+        if record.name == entry_point and record.depth == 0:
+            start, end = _first_child(records, index), index + 1
+            return records[start:end]
+    raise ValueError(f"{entry_point} was not imported")
+
+
+def _first_child(records, index):
+    start = index
+    while start > 0 and records[start - 1].depth > 0:
+        start -= 1
+    return start
+
+
+def import_entry_point(entry_point):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entry_point}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return entry_point_imports(parse_importtime(result.stderr), entry_point)
+
+
+def measure(entry_point, runs):
+    timings = {}
+    for _ in range(runs):
+        for record in import_entry_point(entry_point):
+            timings.setdefault(record.name, []).append(record.cumulative_us / 1000)
+    return {name: statistics.median(values) for name, values in timings.items()}
+
+
+def check(entry_point, timings, budget):
+    problems = []
+    total = timings[entry_point]
+    if total > budget["budget_ms"]:
+        problems.append(
+            f"{entry_point} imports in {total:.1f}ms, "
+            f"over its {budget['budget_ms']}ms budget"
+        )
+    for forbidden in budget.get("forbidden", []):
+        loaded = [
+            name
+            for name in timings
+            if name == forbidden or name.startswith(f"{forbidden}.")
+        ]
+        if loaded:
+            problems.append(f"{entry_point} loads {forbidden} at import time")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget", default=BUDGET_FILE)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args(argv)
+
+    with open(args.budget) as budget_file:
+        budgets = json.load(budget_file)
+
+    problems = []
+    for entry_point, budget in budgets.items():
+        timings = measure(entry_point, args.runs)
+        print(
+            f"{entry_point}: {timings[entry_point]:.1f}ms "
+            f"of {budget['budget_ms']}ms budget"
+        )
+        slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)
+        for name, elapsed in slowest[1:][: args.top]:
+            print(f"  {elapsed:>8.1f}ms  {name}")
+        problems.extend(check(entry_point, timings, budget))
+
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if args.check and problems:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
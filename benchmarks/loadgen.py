@@ -0,0 +1,170 @@
+"""Drive synthetic GCS events through publishMsg or publishBatch against fakes.
+
+Run from the repository root, for example:
+
+    python -m benchmarks.loadgen --rate 200 --events 2000 --concurrency 16 \\
+        --publish-latency 0.02 --dds-latency 0.05 --dds-error-rate 0.01
+"""
+
+import argparse
+import base64
+import datetime
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("PROJECT_ID", "loadgen_project_id")
+os.environ.setdefault("TOPIC_NAME", "nifi-notify")
+os.environ.setdefault("ENV", "loadgen")
+os.environ.setdefault("ON-PREM-SUBFOLDER", "DEV")
+
+import clients  # noqa:E402
+import dds  # noqa:E402
+from fakes import FakeDDSClient, FakePublisherClient  # noqa:E402
+from logger import logger  # noqa:E402
+from main import publishBatch, publishMsg  # noqa:E402
+from storage import rfc3339  # noqa:E402
+
+SURVEYS = ["OPN", "LMS", "LMC", "LMB", "FRS", "IPS", "OLS"]
+
+
+def synthetic_events(count, mi_ratio=0.2, seed=None):
+    generator = random.Random(seed)
+    for sequence in range(count):
+        file_type = "mi" if generator.random() < mi_ratio else "dd"
+        survey = generator.choice(SURVEYS)
+        instrument = f"{survey}{generator.randint(2101, 2512)}{generator.choice('ABR')}"
+        created = datetime.datetime.now(datetime.timezone.utc)
+        yield {
+            "name": f"{file_type}_{instrument}_{created:%d%m%Y_%H%M%S}{sequence}.zip",
+            "bucket": "ons-blaise-v2-nifi",
+            "md5Hash": str(
+                base64.b64encode(generator.getrandbits(128).to_bytes(16, "big")),
+                "utf-8",
+            ),
+            "size": str(generator.randint(1000, 500000000)),
+            "timeCreated": rfc3339(created),
+        }
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _paced(events, rate, start):
+    # events are sent on a fixed schedule, so a slow handler shows as latency
+    for sequence, event in enumerate(events):
+        scheduled = start + sequence / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        yield event, scheduled
+
+
+def _chunks(paced, size):
+    chunk = []
+    for item in paced:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _send(event, scheduled, record):
+    publishMsg(event, None)
+    record(scheduled)
+
+
+def _send_batch(chunk, record):
+    publishBatch([event for event, _ in chunk], None)
+    for _, scheduled in chunk:
+        record(scheduled)
+
+
+def run(events, rate, concurrency, batch_size=None):
+    latencies = []
+    lock = threading.Lock()
+
+    def record(scheduled):
+        latency = (time.perf_counter() - scheduled) * 1000
+        with lock:
+            latencies.append(latency)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        paced = _paced(events, rate, start)
+        if batch_size is None:
+            for event, scheduled in paced:
+                executor.submit(_send, event, scheduled, record)
+        else:
+            for chunk in _chunks(paced, batch_size):
+                executor.submit(_send_batch, chunk, record)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "events": len(latencies),
+        "elapsed_seconds": round(elapsed, 3),
+        "events_per_second": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies, default=0.0), 3),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=100.0, help="events per second")
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--batch-size", type=int, help="send events through publishBatch in batches"
+    )
+    parser.add_argument("--mi-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int)
+    for fake in ["publish", "dds"]:
+        parser.add_argument(f"--{fake}-latency", type=float, default=0.0)
+        parser.add_argument(f"--{fake}-jitter", type=float, default=0.0)
+        parser.add_argument(f"--{fake}-error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    publisher = FakePublisherClient(
+        args.publish_latency, args.publish_jitter, args.publish_error_rate
+    )
+    dds_client = FakeDDSClient(args.dds_latency, args.dds_jitter, args.dds_error_rate)
+    clients.set_client_factories(lambda _config: publisher, lambda: dds_client)
+
+    with open(os.devnull, "w") as devnull:
+        logger.stream = devnull
+        try:
+            report = run(
+                synthetic_events(args.events, args.mi_ratio, args.seed),
+                args.rate,
+                args.concurrency,
+                args.batch_size,
+            )
+        finally:
+            dds.shutdown()
+            clients.set_client_factories()
+            publisher.stop()
+            logger.stream = None
+
+    report["publish_failures"] = publisher.failed
+    report["dds_failures"] = dds_client.failed
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
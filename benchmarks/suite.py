@@ -0,0 +1,196 @@
+"""Benchmark suite for the manifest hot path and the publishMsg entry point.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --compare results.json --threshold 10
+
+With --compare the run fails when a benchmark's median is more than
+--threshold percent slower than the same benchmark in the given results.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("PUBSUB_EMULATOR_HOST", "localhost:8085")
+os.environ.setdefault("PROJECT_ID", "bench_project_id")
+os.environ.setdefault("TOPIC_NAME", "nifi-notify")
+os.environ.setdefault("ENV", "bench")
+os.environ.setdefault("ON-PREM-SUBFOLDER", "DEV")
+
+import clients  # noqa:E402
+import dds  # noqa:E402
+from dedup import Deduplicator, MemoryDedupCache  # noqa:E402
+from fakes import FakeDDSClient, FakePublisherClient  # noqa:E402
+from logger import logger  # noqa:E402
+from main import publishMsg  # noqa:E402
+from models.config import Config  # noqa:E402
+from models.event import parse_event  # noqa:E402
+from models.message import File, create_message  # noqa:E402
+from utils import md5hash_to_md5sum, size_in_megabytes  # noqa:E402
+
+CONFIG = Config(
+    on_prem_subfolder="DEV", project_id="bench", topic_name="nifi-notify", env="bench"
+)
+
+INSTRUMENTS = {
+    "mi": ("mi", "OPN2101A"),
+    "lms": ("dd", "LMS2102_BK1"),
+    "frs": ("dd", "FRS2411A"),
+    "default": ("dd", "OPN2102R"),
+}
+
+
+def event(file_type="dd", instrument="OPN2102R"):
+    return {
+        "name": f"{file_type}_{instrument}_0103202021_16428.zip",
+        "bucket": "ons-blaise-v2-nifi",
+        "md5Hash": "0a14db6e48b947b57988a2f61469f228",
+        "size": "12004783",
+        "timeCreated": "2021-03-01T16:42:08.123Z",
+    }
+
+
+def benchmarks():
+    dd_event = event()
+    message = create_message(dd_event, CONFIG)
+    deduplicator = Deduplicator(MemoryDedupCache())
+    deduplicator.record(dd_event)
+    cases = {
+        "parse_event": lambda: parse_event(dd_event),
+        "file_from_event": lambda: File.from_event(dd_event),
+        "md5hash_to_md5sum": lambda: md5hash_to_md5sum(dd_event["md5Hash"]),
+        "size_in_megabytes": lambda: size_in_megabytes(dd_event["size"]),
+        "message_json": message.json,
+        "dedup_lookup": lambda: deduplicator.is_duplicate(dd_event),
+        "publish_msg": lambda: publishMsg(dd_event, None),
+    }
+    for route, (file_type, instrument) in INSTRUMENTS.items():
+        route_event = event(file_type, instrument)
+        cases[f"create_message_{route}"] = (
+            lambda route_event=route_event: create_message(route_event, CONFIG)
+        )
+    return cases
+
+
+def measure(function, rounds, min_round_seconds):
+    # each round repeats the function enough times to take min_round_seconds
+    number = 1
+    elapsed = _time_round(function, number)
+    while elapsed < min_round_seconds:
+        number *= 2
+        elapsed = _time_round(function, number)
+
+    timings = [elapsed / number]
+    timings.extend(_time_round(function, number) / number for _ in range(rounds - 1))
+
+    timings_us = [timing * 1e6 for timing in timings]
+    return {
+        "median_us": round(statistics.median(timings_us), 4),
+        "min_us": round(min(timings_us), 4),
+        "mean_us": round(statistics.mean(timings_us), 4),
+        "stdev_us": round(statistics.pstdev(timings_us), 4),
+        "iterations": number * rounds,
+    }
+
+
+def _time_round(function, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return time.perf_counter() - start
+
+
+def run(selected=None, rounds=7, min_round_seconds=0.05):
+    results = {}
+    publisher = FakePublisherClient()
+    clients.set_client_factories(lambda _config: publisher, FakeDDSClient)
+    with open(os.devnull, "w") as devnull:
+        logger.stream = devnull
+        try:
+            for name, function in benchmarks().items():
+                if selected and name not in selected:
+                    continue
+                results[name] = measure(function, rounds, min_round_seconds)
+        finally:
+            dds.shutdown()
+            clients.set_client_factories()
+            publisher.stop()
+            logger.stream = None
+    return results
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            continue
+        change = (result["median_us"] / previous["median_us"] - 1) * 100
+        status = "REGRESSION" if change > threshold else "ok"
+        print(
+            f"{name:28} {previous['median_us']:>12.3f}us "
+            f"{result['median_us']:>12.3f}us {change:>+8.1f}% {status}"
+        )
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="percent slowdown of a median that fails the comparison",
+    )
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("benchmark", nargs="*", help="only run these benchmarks")
+    args = parser.parse_args(argv)
+
+    results = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "benchmarks": run(args.benchmark, rounds=args.rounds),
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results["benchmarks"], baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks more than {args.threshold}% slower")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from logger import logger
+from metrics import metrics
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, clock=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock or time.monotonic
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+        metrics.set("breaker_state", STATE_VALUES[CLOSED], breaker=name)
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._transition(HALF_OPEN)
+            # while half open a single call probes the service at a time
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state == CLOSED:
+                return False
+            self._transition(CLOSED)
+            return True
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.failures >= self.failure_threshold
+            ):
+                self._opened_at = self.clock()
+                self._transition(OPEN)
+
+    def _transition(self, state):
+        log = logger.info if state == CLOSED else logger.warning
+        log(
+            f"{self.name} circuit breaker {state.replace('_', ' ')}",
+            previous_state=self.state,
+            failures=self.failures,
+        )
+        self.state = state
+        metrics.set("breaker_state", STATE_VALUES[state], breaker=self.name)
+        metrics.increment("breaker_transitions_total", breaker=self.name, state=state)
@@ -0,0 +1,125 @@
+import atexit
+import threading
+import time
+
+from logger import logger
+
+_lock = threading.Lock()
+_publisher_client = None
+_publisher_reset_at = float("-inf")
+_dds_client = None
+
+# errors that leave the publisher client unusable, with its credentials
+# rejected or its channel closed, matched by name like retry.TRANSIENT_ERRORS
+BROKEN_CLIENT_ERRORS = frozenset(
+    ["Unauthenticated", "RefreshError", "DefaultCredentialsError"]
+)
+BROKEN_CLIENT_MESSAGES = ("closed channel", "stopped publisher")
+
+
+def get_publisher_client(config=None):
+    global _publisher_client
+    if _publisher_client is None:
+        with _lock:
+            if _publisher_client is None:
+                _publisher_client = _publisher_factory(config)
+    return _publisher_client
+
+
+def create_publisher_client(config):
+    # the Pub/Sub client pulls in grpc and protobuf, so it is imported on first
+    # use and cold starts that reject an event never pay for it
+    from google.cloud import pubsub_v1
+
+    if config is None:
+        return pubsub_v1.PublisherClient()
+    batch_settings = pubsub_v1.types.BatchSettings(
+        max_messages=config.publish_max_messages,
+        max_bytes=config.publish_max_bytes,
+        max_latency=config.publish_max_latency,
+    )
+    flow_control = pubsub_v1.types.PublishFlowControl(
+        message_limit=config.publish_flow_control_max_messages,
+        byte_limit=config.publish_flow_control_max_bytes,
+        limit_exceeded_behavior=pubsub_v1.types.LimitExceededBehavior.BLOCK,
+    )
+    return pubsub_v1.PublisherClient(
+        batch_settings=batch_settings,
+        publisher_options=pubsub_v1.types.PublisherOptions(
+            flow_control=flow_control,
+            enable_message_ordering=config.ordering_enabled,
+        ),
+    )
+
+
+def get_dds_client():
+    global _dds_client
+    if _dds_client is None:
+        with _lock:
+            if _dds_client is None:
+                _dds_client = _dds_factory()
+    return _dds_client
+
+
+def create_dds_client():
+    import blaise_dds
+
+    return blaise_dds.Client(blaise_dds.Config.from_env())
+
+
+_publisher_factory = create_publisher_client
+_dds_factory = create_dds_client
+
+
+def set_client_factories(publisher_factory=None, dds_factory=None):
+    global _publisher_factory, _dds_factory
+    shutdown()
+    with _lock:
+        _publisher_factory = publisher_factory or create_publisher_client
+        _dds_factory = dds_factory or create_dds_client
+
+
+def is_client_broken(error):
+    if any(cls.__name__ in BROKEN_CLIENT_ERRORS for cls in type(error).__mro__):
+        return True
+    message = str(error).lower()
+    return any(text in message for text in BROKEN_CLIENT_MESSAGES)
+
+
+def reset_publisher_client(published_at=None):
+    global _publisher_client, _publisher_reset_at
+    with _lock:
+        # a publish that started before the last reset may have failed on the
+        # client that reset replaced, so the new client is kept. Publishes
+        # failing together on a broken client then replace it only once
+        if published_at is not None and published_at < _publisher_reset_at:
+            return
+        publisher_client, _publisher_client = _publisher_client, None
+        _publisher_reset_at = time.perf_counter()
+    stop_publisher_client(publisher_client)
+
+
+def stop_publisher_client(publisher_client):
+    if publisher_client is None:
+        return
+    try:
+        publisher_client.stop()
+    except Exception as err:
+        logger.warning("failed to stop publisher client", error=str(err))
+
+
+def reset_dds_client():
+    global _dds_client
+    with _lock:
+        _dds_client = None
+
+
+def shutdown():
+    global _publisher_client, _dds_client
+    with _lock:
+        publisher_client, _publisher_client = _publisher_client, None
+        _dds_client = None
+    stop_publisher_client(publisher_client)
+
+
+atexit.register(shutdown)
@@ -0,0 +1,200 @@
+import atexit
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from breaker import CircuitBreaker
+from logger import logger
+from metrics import metrics
+from utils import send_data_delivery_state
+
+_lock = threading.Lock()
+_updater = None
+
+
+class DeliveryStateUpdater:
+    def __init__(
+        self,
+        workers=4,
+        update=send_data_delivery_state,
+        timeout=None,
+        breaker=None,
+        replay_limit=10000,
+    ):
+        self._update = update
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="dds"
+        )
+        # calls run on their own threads so a worker can give up on a slow one
+        self._calls = None
+        self._running = set()
+        if timeout is not None:
+            self._calls = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="dds-call"
+            )
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker("dds")
+        self.replay_limit = replay_limit
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = {}
+        self._skipped = {}
+        self.skipped = 0
+        self.coalesced = 0
+
+    def enqueue(self, event, state, error=None):
+        name = event["name"]
+        with self._lock:
+            queue = self._pending.get(name)
+            if queue is None:
+                queue = self._pending[name] = deque()
+                self._executor.submit(self._drain, name)
+            # DDS keeps the history of every state a file passes through, so
+            # only an identical transition that has not been sent yet is dropped
+            elif queue and queue[-1][1:] == (state, error):
+                self.coalesced += 1
+                return
+            queue.append((event, state, error))
+
+    def enqueue_all(self, events, state):
+        for event in events:
+            self.enqueue(event, state)
+
+    def flush(self, timeout=None):
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def shutdown(self, timeout=None):
+        flushed = self.flush(timeout)
+        self._executor.shutdown(wait=flushed)
+        if self._calls is not None:
+            # cancel_futures needs Python 3.9, so queued calls are cancelled here
+            with self._lock:
+                running = list(self._running)
+            for future in running:
+                future.cancel()
+            self._calls.shutdown(wait=False)
+        if self.skipped:
+            logger.warning(
+                "dds transitions were skipped and not replayed",
+                skipped=self.skipped,
+                files=len(self._skipped),
+            )
+        return flushed
+
+    def _drain(self, name):
+        while True:
+            update = self._next_update(name)
+            if update is None:
+                return
+            self._send(name, *update)
+
+    def _next_update(self, name):
+        with self._lock:
+            while True:
+                queue = self._pending[name]
+                if not queue:
+                    del self._pending[name]
+                    self._idle.notify_all()
+                    return None
+                event, state, error = queue.popleft()
+                # later transitions of a file wait behind its skipped ones so
+                # DDS still receives them in order
+                if name in self._skipped or not self.breaker.allow():
+                    self._skip(event, state, error)
+                    continue
+                return event, state, error
+
+    def _send(self, name, event, state, error):
+        try:
+            self._call(event, state, error)
+        except Exception as err:
+            self.breaker.record_failure()
+            logger.warning(
+                "failed to update dds state",
+                file_name=name,
+                state=state,
+                error=str(err),
+            )
+        else:
+            if self.breaker.record_success():
+                self._replay()
+
+    def _call(self, event, state, error):
+        if self._calls is None:
+            return self._update(event, state, error)
+        future = self._calls.submit(self._update, event, state, error)
+        with self._lock:
+            self._running.add(future)
+        future.add_done_callback(self._finished)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(
+                f"dds update took longer than {self.timeout} seconds"
+            ) from None
+
+    def _finished(self, future):
+        with self._lock:
+            self._running.discard(future)
+
+    def _skip(self, event, state, error):
+        if self.skipped >= self.replay_limit:
+            metrics.increment("dds_dropped_total", state=state)
+            return
+        self._skipped.setdefault(event["name"], []).append((event, state, error))
+        self.skipped += 1
+        metrics.increment("dds_skipped_total", state=state)
+
+    def _replay(self):
+        with self._lock:
+            skipped, self._skipped = self._skipped, {}
+            replayed, self.skipped = self.skipped, 0
+            for name, transitions in skipped.items():
+                queue = self._pending.get(name)
+                if queue is None:
+                    queue = self._pending[name] = deque()
+                    self._executor.submit(self._drain, name)
+                queue.extendleft(reversed(transitions))
+        if replayed:
+            metrics.increment("dds_replayed_total", replayed)
+            logger.info("Replaying skipped dds transitions", transitions=replayed)
+
+
+def get_updater(config):
+    global _updater
+    if _updater is None:
+        with _lock:
+            if _updater is None:
+                _updater = DeliveryStateUpdater(
+                    workers=config.dds_workers,
+                    timeout=config.dds_timeout,
+                    breaker=CircuitBreaker(
+                        "dds",
+                        failure_threshold=config.dds_breaker_threshold,
+                        reset_timeout=config.dds_breaker_reset,
+                    ),
+                    replay_limit=config.dds_replay_limit,
+                )
+    return _updater
+
+
+def flush_updates(updater, config):
+    if not updater.flush(config.dds_flush_timeout):
+        logger.warning(
+            "timed out waiting for dds state updates",
+            timeout_seconds=config.dds_flush_timeout,
+        )
+
+
+def shutdown(timeout=None):
+    global _updater
+    with _lock:
+        updater, _updater = _updater, None
+    if updater is not None:
+        updater.shutdown(timeout)
+
+
+atexit.register(shutdown)
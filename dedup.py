@@ -0,0 +1,202 @@
+import atexit
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from logger import logger
+from metrics import metrics
+
+_lock = threading.Lock()
+_deduplicator = None
+
+
+def dedup_key(event):
+    return (
+        event.get("bucket"),
+        event.get("name"),
+        event.get("generation"),
+        event.get("md5Hash"),
+    )
+
+
+def key_digest(key):
+    return hashlib.sha256("\0".join(str(part) for part in key).encode()).hexdigest()
+
+
+class MemoryDedupCache:
+    def __init__(self, max_entries=10000, ttl=86400.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def contains(self, key):
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def add(self, key):
+        with self._lock:
+            self._entries[key] = self.clock() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteDedupStore:
+    def __init__(self, path, ttl=86400.0, clock=time.time):
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS processed "
+                "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+            )
+
+    def contains(self, key):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT expires_at FROM processed WHERE key = ?", (key_digest(key),)
+            ).fetchone()
+        return row is not None and row[0] > self.clock()
+
+    def add(self, key):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO processed (key, expires_at) VALUES (?, ?)",
+                (key_digest(key), self.clock() + self.ttl),
+            )
+
+    def purge_expired(self):
+        with self._lock, self._connection:
+            return self._connection.execute(
+                "DELETE FROM processed WHERE expires_at <= ?", (self.clock(),)
+            ).rowcount
+
+    def close(self):
+        self._connection.close()
+
+
+class FirestoreDedupStore:
+    def __init__(self, collection, ttl=86400.0, client=None, clock=time.time):
+        if client is None:
+            from google.cloud import firestore
+
+            client = firestore.Client()
+        self.collection = client.collection(collection)
+        self.ttl = ttl
+        self.clock = clock
+
+    def contains(self, key):
+        snapshot = self.collection.document(key_digest(key)).get()
+        return snapshot.exists and snapshot.get("expires_at") > self.clock()
+
+    def add(self, key):
+        bucket, name, generation, md5_hash = key
+        self.collection.document(key_digest(key)).set(
+            {
+                "bucket": bucket,
+                "name": name,
+                "generation": generation,
+                "md5Hash": md5_hash,
+                "expires_at": self.clock() + self.ttl,
+            }
+        )
+
+    def close(self):
+        pass
+
+
+def create_store(spec, ttl):
+    if not spec:
+        return None
+    scheme, _, location = spec.partition(":")
+    if scheme == "sqlite":
+        return SQLiteDedupStore(location, ttl)
+    if scheme == "firestore":
+        return FirestoreDedupStore(location, ttl)
+    raise ValueError(f"unknown dedup store '{spec}'")
+
+
+class Deduplicator:
+    def __init__(self, cache, store=None):
+        self.cache = cache
+        self.store = store
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            MemoryDedupCache(config.dedup_cache_size, config.dedup_ttl),
+            create_store(config.dedup_store, config.dedup_ttl),
+        )
+
+    def is_duplicate(self, event):
+        key = dedup_key(event)
+        if self.cache.contains(key):
+            metrics.increment("duplicates_total", tier="memory")
+            return True
+        if self.store is None:
+            return False
+        try:
+            found = self.store.contains(key)
+        except Exception as error:
+            logger.warning(
+                "dedup store lookup failed", file_name=event["name"], error=str(error)
+            )
+            return False
+        if found:
+            self.cache.add(key)
+            metrics.increment("duplicates_total", tier="store")
+        return found
+
+    def record(self, event):
+        key = dedup_key(event)
+        self.cache.add(key)
+        if self.store is None:
+            return
+        try:
+            self.store.add(key)
+        except Exception as error:
+            logger.warning(
+                "dedup store write failed", file_name=event["name"], error=str(error)
+            )
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+
+def get_deduplicator(config):
+    global _deduplicator
+    if not config.dedup_enabled:
+        return None
+    if _deduplicator is None:
+        with _lock:
+            if _deduplicator is None:
+                _deduplicator = Deduplicator.from_config(config)
+    return _deduplicator
+
+
+def shutdown():
+    global _deduplicator
+    with _lock:
+        deduplicator, _deduplicator = _deduplicator, None
+    if deduplicator is not None:
+        deduplicator.close()
+
+
+atexit.register(shutdown)
@@ -0,0 +1,62 @@
+import argparse
+import dataclasses
+
+from dds import flush_updates, get_updater
+from dedup import get_deduplicator
+from logger import logger
+from models.config import get_config
+from spool import DrainStats, create_spool, drain
+from utils import InvalidConfig
+
+
+def drain_all(spool, config, batch_size=None):
+    dds_updater = get_updater(config)
+    deduplicator = get_deduplicator(config)
+    total = DrainStats()
+    try:
+        while True:
+            stats = drain(
+                spool, config, dds_updater, batch_size, deduplicator=deduplicator
+            )
+            total.published += stats.published
+            total.failed += stats.failed
+            total.elapsed_seconds += stats.elapsed_seconds
+            # entries that failed stay at the head of the spool, so stop rather
+            # than fetch the same batch again
+            if stats.failed or not stats.published:
+                break
+    finally:
+        flush_updates(dds_updater, config)
+    logger.info(
+        f"Drained {total.published} spooled manifests, {total.failed} failed",
+        published=total.published,
+        failed=total.failed,
+        elapsed_seconds=round(total.elapsed_seconds, 3),
+        per_second=round(total.rate(), 1),
+    )
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish manifests from the spool")
+    parser.add_argument("--spool", help="spool to drain, defaults to SPOOL")
+    parser.add_argument(
+        "--batch-size", type=int, help="manifests published concurrently per batch"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        config = get_config()
+    except InvalidConfig as error:
+        parser.error(str(error))
+    if args.spool:
+        config = dataclasses.replace(config, spool=args.spool)
+    if not config.spool:
+        parser.error("no spool configured, set SPOOL or pass --spool")
+
+    stats = drain_all(create_spool(config.spool), config, args.batch_size)
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
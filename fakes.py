@@ -0,0 +1,254 @@
+import collections
+import functools
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeError(Exception):
+    pass
+
+
+class PublishToPausedOrderingKeyException(FakeError):
+    pass
+
+
+@dataclass
+class Behaviour:
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+
+    def delay(self):
+        if not self.jitter:
+            return self.latency
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def fails(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class _Scheduler:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def call_later(self, delay, callback):
+        self.call_at(time.perf_counter() + delay, callback)
+
+    def call_at(self, deadline, callback):
+        with self._condition:
+            heapq.heappush(self._queue, (deadline, next(self._sequence), callback))
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            callback = self._next()
+            if callback is None:
+                return
+            callback()
+
+    def _next(self):
+        with self._condition:
+            while not self._due():
+                self._condition.wait(self._wait_time())
+            if self._stopped and not self._queue:
+                return None
+            _, _, callback = heapq.heappop(self._queue)
+            return callback
+
+    def _due(self):
+        # once stopped, whatever is left runs straight away
+        return self._stopped or (
+            bool(self._queue) and self._queue[0][0] <= time.perf_counter()
+        )
+
+    def _wait_time(self):
+        if not self._queue:
+            return None
+        return self._queue[0][0] - time.perf_counter()
+
+
+class FakePublisherClient:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.behaviour = Behaviour(latency, jitter, error_rate)
+        self.published = []
+        self.delivered = collections.defaultdict(list)
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._message_ids = itertools.count(1)
+        self._scheduler = _Scheduler()
+        self._sending_until = {}
+        self._pauses = collections.Counter()
+        self._paused = set()
+
+    @staticmethod
+    def topic_path(project, topic):
+        return f"projects/{project}/topics/{topic}"
+
+    def publish(self, topic, data, ordering_key="", **attributes):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        delay = self.behaviour.delay()
+        fails = self.behaviour.fails()
+        with self._lock:
+            message_id = str(next(self._message_ids))
+            self.published.append((topic, data, attributes))
+            if ordering_key in self._paused:
+                self.failed += 1
+                future.set_exception(PublishToPausedOrderingKeyException(ordering_key))
+                return future
+            pauses = self._pauses[ordering_key]
+            self._scheduler.call_at(
+                self._sent_at(ordering_key, delay),
+                functools.partial(
+                    self._complete,
+                    future,
+                    data,
+                    ordering_key,
+                    message_id,
+                    pauses,
+                    fails,
+                ),
+            )
+        return future
+
+    def _sent_at(self, ordering_key, delay):
+        now = time.perf_counter()
+        if not ordering_key:
+            return now + delay
+        # like the Pub/Sub client, messages with an ordering key are sent one
+        # after another, while other keys are sent alongside. Scheduling at an
+        # absolute time under the lock keeps messages with one key completing
+        # in the order they were published
+        sent_at = max(now, self._sending_until.get(ordering_key, now)) + delay
+        self._sending_until[ordering_key] = sent_at
+        return sent_at
+
+    def _complete(self, future, data, ordering_key, message_id, pauses, fails):
+        with self._lock:
+            error = self._delivery_error(ordering_key, message_id, pauses, fails)
+            if error is None:
+                self.delivered[ordering_key].append(data)
+            else:
+                self.failed += 1
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(message_id)
+
+    def _delivery_error(self, ordering_key, message_id, pauses, fails):
+        if ordering_key and pauses != self._pauses[ordering_key]:
+            # an earlier message with this key failed after it was sent
+            return PublishToPausedOrderingKeyException(ordering_key)
+        if not fails:
+            return None
+        if ordering_key:
+            self._pauses[ordering_key] += 1
+            self._paused.add(ordering_key)
+        return FakeError(f"publish of message {message_id} failed")
+
+    def resume_publish(self, topic, ordering_key):
+        with self._lock:
+            if ordering_key not in self._paused:
+                raise RuntimeError("Ordering key is not paused.")
+            self._paused.discard(ordering_key)
+
+    def stop(self):
+        self._scheduler.stop()
+
+
+class FakeDDSClient:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.behaviour = Behaviour(latency, jitter, error_rate)
+        self.states = {}
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def update_state(self, filename, state, error_info=None):
+        time.sleep(self.behaviour.delay())
+        if self.behaviour.fails():
+            with self._lock:
+                self.failed += 1
+            raise FakeError(f"dds update of {filename} to {state} failed")
+        with self._lock:
+            self.states.setdefault(filename, []).append(state)
+
+
+class FakeDDSServer:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, port=0):
+        self.behaviour = Behaviour(latency, jitter, error_rate)
+        self.requests = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_exc_info):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._respond()
+
+            def do_POST(self):
+                self._respond()
+
+            def do_PATCH(self):
+                self._respond()
+
+            def do_PUT(self):
+                self._respond()
+
+            def log_message(self, *_args):
+                pass
+
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                server.requests.append((self.command, self.path, body))
+                time.sleep(server.behaviour.delay())
+                status = 500 if server.behaviour.fails() else 200
+                payload = json.dumps({"status": status}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
@@ -0,0 +1,76 @@
+import json
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+
+SEVERITIES = {
+    "DEBUG": 100,
+    "INFO": 200,
+    "NOTICE": 300,
+    "WARNING": 400,
+    "ERROR": 500,
+    "CRITICAL": 600,
+}
+
+
+class StructuredLogger:
+    def __init__(self, level="INFO", sample_rate=1.0, stream=None):
+        self.level = SEVERITIES[level.upper()]
+        self.sample_rate = sample_rate
+        self.stream = stream
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            level=os.getenv("LOG_LEVEL", "INFO"),
+            sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1")),
+        )
+
+    def enabled(self, severity, sampled=False):
+        if SEVERITIES[severity] < self.level:
+            return False
+        return (
+            not sampled or self.sample_rate >= 1 or random.random() < self.sample_rate
+        )
+
+    def log(self, severity, message, sampled=False, **fields):
+        if not self.enabled(severity, sampled):
+            return
+        record = {"severity": severity, "message": message}
+        for name, value in fields.items():
+            record[name] = value() if callable(value) else value
+        stream = self.stream or sys.stdout
+        stream.write(json.dumps(record, default=str) + "\n")
+
+    def debug(self, message, **fields):
+        self.log("DEBUG", message, **fields)
+
+    def info(self, message, **fields):
+        self.log("INFO", message, **fields)
+
+    def warning(self, message, **fields):
+        self.log("WARNING", message, **fields)
+
+    def error(self, message, **fields):
+        self.log("ERROR", message, **fields)
+
+
+class StageTimer:
+    def __init__(self):
+        self.elapsed_ms = {}
+        self.current = None
+
+    @contextmanager
+    def stage(self, name):
+        self.current = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.elapsed_ms[name] = round(self.elapsed_ms.get(name, 0) + elapsed_ms, 3)
+
+
+logger = StructuredLogger.from_env()
@@ -1,25 +1,194 @@
-from models.config import Config
-from models.message import create_message, send_pub_sub_message
-from utils import log_event, update_data_delivery_state
+from aggregate import get_aggregator
+from batch import publish_batch, reject
+from dds import flush_updates, get_updater
+from dedup import get_deduplicator
+from logger import StageTimer, logger
+from metrics import metrics, record_publish_lag
+from models.config import get_config
+from models.message import create_message, publish_with_retry
+from models.preflight import preflight
+from spool import drain, drain_due, get_spool, spool_failed_publish
+from utils import EventRejected, InvalidConfig, log_event
+from verify import verify_content
 
 
 def publishMsg(event, _context):
-    config = Config.from_env()
-    config.log()
+    timer = StageTimer()
+    try:
+        with timer.stage("config"):
+            config = get_config()
+    except InvalidConfig as error:
+        logger.error(f"{error}, publish failed")
+        return
+
+    # a function instance handling one event at a time would only ever wait
+    # out the window to publish a manifest of one file
+    process_event(event, config, timer, aggregate=config.aggregate_in_function)
+
+
+def process_event(event, config, timer, flush_dds=True, aggregate=True):
+    try:
+        accepted = accept_event(event, config, timer)
+    except EventRejected:
+        return "rejected", "preflight"
+    deduplicator = get_deduplicator(config)
+    if deduplicator is not None and is_duplicate(event, deduplicator, timer):
+        return "duplicate", None
+    spool = spool_to_drain(config)
+    if spool is not None:
+        drain_spool(spool, config, deduplicator, timer)
+
+    dds_updater = get_updater(config)
+    event_arrived(event, dds_updater, timer)
+    message = None
+    failed_stage = None
+    try:
+        if config.verify_enabled:
+            verify_event(event, config, timer)
+        message = build_message(accepted, config, timer)
+        with timer.stage("publish"):
+            publish(config, message, aggregate)
+        outcome = event_published(event, deduplicator, dds_updater)
+    except Exception as error:
+        failed_stage = timer.current
+        outcome = event_failed(event, message, error, failed_stage, config, dds_updater)
+    finally:
+        # a function instance may be frozen once it returns, so updates are
+        # flushed here, while a long-running worker flushes at shutdown
+        if flush_dds:
+            with timer.stage("dds_update"):
+                flush_updates(dds_updater, config)
+    report_event(event, message, outcome, timer)
+    return outcome, failed_stage
+
+
+def accept_event(event, config, timer):
+    try:
+        with timer.stage("preflight"):
+            accepted = preflight(event, config)
+    except EventRejected as error:
+        reject_event(event, error, timer)
+        raise
     log_event(event)
-    update_data_delivery_state(event, "in_nifi_bucket")
+    return accepted
+
+
+def reject_event(event, error, timer):
+    reject(event, error)
+    report_event(event, None, "rejected", timer)
+
+
+def is_duplicate(event, deduplicator, timer):
+    with timer.stage("dedup"):
+        duplicate = deduplicator.is_duplicate(event)
+    if duplicate:
+        report_event(event, None, "duplicate", timer)
+    return duplicate
+
+
+def spool_to_drain(config):
+    spool = get_spool(config)
+    if spool is None or not drain_due(config):
+        return None
+    return spool
+
+
+def drain_spool(spool, config, deduplicator, timer):
+    with timer.stage("drain"):
+        try:
+            drain(spool, config, get_updater(config), deduplicator=deduplicator)
+        except Exception as error:
+            logger.warning("failed to drain spool", error=repr(error))
 
-    if config.project_id is None:
-        print("project_id not set, publish failed")
+
+def event_arrived(event, dds_updater, timer):
+    with timer.stage("dds_update"):
+        dds_updater.enqueue(event, "in_nifi_bucket")
+
+
+def verify_event(event, config, timer):
+    with timer.stage("verify"):
+        verify_content(event, config)
+
+
+def build_message(accepted, config, timer):
+    with timer.stage("build"):
+        message = create_message(accepted, config)
+    logger.debug("Message built", manifest=message.json)
+    return message
+
+
+def publish(config, message, aggregate=True):
+    aggregator = get_aggregator(config) if aggregate else None
+    if aggregator is None:
+        return publish_with_retry(config, message)
+    # the aggregator settles every future once its manifest's publish and
+    # retries are done, so waiting less could report a failure for a
+    # manifest that is still published later
+    return aggregator.add(message).result()
+
+
+def event_published(event, deduplicator, dds_updater):
+    record_publish_lag(event)
+    if deduplicator is not None:
+        deduplicator.record(event)
+    dds_updater.enqueue(event, "nifi_notified")
+    return "published"
+
+
+def event_failed(event, message, error, failed_stage, config, dds_updater):
+    metrics.increment("errors_total", stage=failed_stage, error=type(error).__name__)
+    if failed_stage == "publish" and spool_failed_publish(
+        config, event, message, error
+    ):
+        return "spooled"
+    logger.error("Publish failed", file_name=event["name"], error=repr(error))
+    dds_updater.enqueue(event, "errored", repr(error))
+    return "errored"
+
+
+def report_event(event, message, outcome, timer):
+    log_summary(event, message, outcome, timer)
+    record_metrics(message, outcome, timer)
+
+
+def log_summary(event, message, outcome, timer):
+    routing = {}
+    if message is not None:
+        routing = {
+            "dataset": message.dataset,
+            "route": message.route_name,
+        }
+    logger.info(
+        "Event processed",
+        file_name=event.get("name") if isinstance(event, dict) else None,
+        outcome=outcome,
+        elapsed_ms=timer.elapsed_ms,
+        **routing,
+    )
+
+
+def record_metrics(message, outcome, timer):
+    if not metrics.enabled:
         return
+    for stage, elapsed_ms in timer.elapsed_ms.items():
+        metrics.observe("stage_latency_ms", elapsed_ms, stage=stage)
+    route = message.route_name() if message is not None else "none"
+    metrics.increment("events_total", outcome=outcome, route=route)
 
-    try:
-        message = create_message(event, config)
-        print(f"Message {message}")
 
-        send_pub_sub_message(config, message)
-        update_data_delivery_state(event, "nifi_notified")
+def publishBatch(events, _context):
+    try:
+        config = get_config()
+    except InvalidConfig as error:
+        logger.error(f"{error}, publish failed")
+        return []
 
-    except Exception as error:
-        print(repr(error))
-        update_data_delivery_state(event, "errored", repr(error))
+    results = list(publish_batch(events, config))
+    published = sum(1 for result in results if result.status == "published")
+    logger.info(
+        f"Batch published {published} of {len(results)} messages",
+        published=published,
+        errored=len(results) - published,
+    )
+    return results
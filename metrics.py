@@ -0,0 +1,386 @@
+import bisect
+import datetime
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+NAMESPACE = "bucket_metadata"
+
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+LAG_BUCKETS_SECONDS = (1, 5, 10, 30, 60, 300, 900, 3600, 21600, 86400)
+FILE_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@dataclass
+class Histogram:
+    buckets: tuple
+    counts: list = field(default=None)
+    sum: float = 0.0
+    count: int = 0
+
+    def __post_init__(self):
+        if self.counts is None:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+
+@dataclass(frozen=True)
+class Instrument:
+    name: str
+    kind: str
+    description: str
+    unit: str = ""
+    buckets: tuple = None
+
+
+INSTRUMENTS = {
+    instrument.name: instrument
+    for instrument in [
+        Instrument(
+            "stage_latency_ms",
+            "histogram",
+            "Time spent in each stage of publishMsg",
+            "ms",
+            LATENCY_BUCKETS_MS,
+        ),
+        Instrument(
+            "dds_update_latency_ms",
+            "histogram",
+            "Time taken by each data delivery status update",
+            "ms",
+            LATENCY_BUCKETS_MS,
+        ),
+        Instrument(
+            "publish_lag_seconds",
+            "histogram",
+            "Time from the object's timeCreated to its manifest being published",
+            "s",
+            LAG_BUCKETS_SECONDS,
+        ),
+        Instrument(
+            "manifest_files",
+            "histogram",
+            "Files listed in each published manifest",
+            "",
+            FILE_COUNT_BUCKETS,
+        ),
+        Instrument("events_total", "counter", "Events processed by outcome and route"),
+        Instrument("errors_total", "counter", "Errors by stage and exception class"),
+        Instrument(
+            "rejections_total", "counter", "Events rejected by pre-flight by reason"
+        ),
+        Instrument("retries_total", "counter", "Publish attempts retried"),
+        Instrument("spooled_total", "counter", "Manifests written to the spool"),
+        Instrument("spool_drained_total", "counter", "Spooled manifests published"),
+        Instrument(
+            "duplicates_total", "counter", "Duplicate events skipped by dedup tier"
+        ),
+        Instrument(
+            "breaker_state",
+            "gauge",
+            "Circuit breaker state, 0 closed, 1 half open and 2 open",
+        ),
+        Instrument(
+            "breaker_transitions_total",
+            "counter",
+            "Circuit breaker transitions by breaker and new state",
+        ),
+        Instrument(
+            "dds_skipped_total",
+            "counter",
+            "Data delivery status transitions skipped while the breaker was open",
+        ),
+        Instrument(
+            "dds_replayed_total", "counter", "Skipped transitions sent after recovery"
+        ),
+        Instrument(
+            "dds_dropped_total",
+            "counter",
+            "Skipped transitions dropped because the replay buffer was full",
+        ),
+    ]
+}
+
+
+class MetricsRegistry:
+    def __init__(self, enabled=False, exporters=None):
+        self.enabled = enabled
+        self.exporters = list(exporters or [])
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._configured_exporter = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(enabled=os.getenv("METRICS_ENABLED", "false").lower() == "true")
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    def configure(self, config):
+        # the configuration can be reloaded, but its exporter is only added once
+        with self._lock:
+            if not self.enabled or config.metrics_exporter != "otel":
+                return
+            if self._configured_exporter is None:
+                self._configured_exporter = OpenTelemetryExporter()
+                self.exporters.append(self._configured_exporter)
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(INSTRUMENTS[name].buckets)
+                self._histograms[key] = histogram
+            histogram.observe(value)
+        for exporter in self.exporters:
+            exporter.record(INSTRUMENTS[name], value, labels)
+
+    def increment(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+        for exporter in self.exporters:
+            exporter.record(INSTRUMENTS[name], amount, labels)
+
+    def set(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+        for exporter in self.exporters:
+            exporter.record(INSTRUMENTS[name], value, labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000, **labels)
+
+    def counter_value(self, name, **labels):
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def gauge_value(self, name, **labels):
+        return self._gauges.get((name, tuple(sorted(labels.items()))))
+
+    def histogram(self, name, **labels):
+        return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            histograms = {
+                key: Histogram(
+                    value.buckets, list(value.counts), value.sum, value.count
+                )
+                for key, value in self._histograms.items()
+            }
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        return histograms, counters, gauges
+
+    def prometheus_text(self):
+        histograms, counters, gauges = self._snapshot()
+        values = {"histogram": histograms, "counter": counters, "gauge": gauges}
+        lines = []
+        for instrument in INSTRUMENTS.values():
+            render = (
+                _histogram_lines if instrument.kind == "histogram" else _value_lines
+            )
+            lines.extend(render(instrument, values[instrument.kind]))
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+class OpenTelemetryExporter:
+    def __init__(self, meter=None):
+        if meter is None:
+            from opentelemetry import metrics as otel_metrics
+
+            meter = otel_metrics.get_meter("blaise_publish_bucket_metadata")
+        self.meter = meter
+        self._instruments = {}
+        self._lock = threading.Lock()
+
+    def record(self, instrument, value, labels):
+        otel_instrument = self._instruments.get(instrument.name)
+        if otel_instrument is None:
+            with self._lock:
+                otel_instrument = self._instruments.get(instrument.name)
+                if otel_instrument is None:
+                    otel_instrument = self._create(instrument)
+                    self._instruments[instrument.name] = otel_instrument
+        if instrument.kind == "histogram":
+            otel_instrument.record(value, attributes=labels)
+        elif instrument.kind == "gauge":
+            otel_instrument.set(value, attributes=labels)
+        else:
+            otel_instrument.add(value, attributes=labels)
+
+    def _create(self, instrument):
+        name = f"{NAMESPACE}.{instrument.name}"
+        if instrument.kind == "histogram":
+            return self.meter.create_histogram(
+                name, unit=instrument.unit, description=instrument.description
+            )
+        if instrument.kind == "gauge":
+            return self.meter.create_gauge(
+                name, unit=instrument.unit, description=instrument.description
+            )
+        return self.meter.create_counter(
+            name, unit=instrument.unit, description=instrument.description
+        )
+
+
+class MetricsServer:
+    def __init__(self, registry, port, host=""):
+        from http.server import ThreadingHTTPServer
+
+        self.registry = registry
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        from http.server import BaseHTTPRequestHandler
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_args):
+                pass
+
+        return Handler
+
+
+def parse_time_created(value):
+    for time_format in ("%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z"):
+        try:
+            return datetime.datetime.strptime(value, time_format)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def record_publish_lag(event, published_at=None):
+    if not metrics.enabled:
+        return
+    created = parse_time_created(event.get("timeCreated"))
+    if created is None:
+        return
+    published_at = published_at or datetime.datetime.now(datetime.timezone.utc)
+    metrics.observe(
+        "publish_lag_seconds", max(0.0, (published_at - created).total_seconds())
+    )
+
+
+def _histogram_lines(instrument, histograms):
+    series = _series(histograms, instrument.name)
+    if not series:
+        return []
+    name = f"{NAMESPACE}_{instrument.name}"
+    lines = [
+        f"# HELP {name} {instrument.description}",
+        f"# TYPE {name} histogram",
+    ]
+    for labels, histogram in series:
+        bounds = [_format_value(bound) for bound in histogram.buckets] + ["+Inf"]
+        for bound, total in zip(bounds, histogram.cumulative_counts()):
+            lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {total}")
+        lines.append(f"{name}_sum{_labels(labels)} {_format_value(histogram.sum)}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return lines
+
+
+def _value_lines(instrument, values):
+    series = _series(values, instrument.name)
+    if not series:
+        return []
+    name = f"{NAMESPACE}_{instrument.name}"
+    lines = [
+        f"# HELP {name} {instrument.description}",
+        f"# TYPE {name} {instrument.kind}",
+    ]
+    for labels, value in series:
+        lines.append(f"{name}{_labels(labels)} {_format_value(value)}")
+    return lines
+
+
+def _series(values, name):
+    return sorted(
+        (labels, value) for (key, labels), value in values.items() if key == name
+    )
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+metrics = MetricsRegistry.from_env()
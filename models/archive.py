@@ -0,0 +1,164 @@
+import struct
+from dataclasses import dataclass
+
+from utils import InvalidArchive
+
+EOCD = struct.Struct("<4s4H2LH")
+ZIP64_LOCATOR = struct.Struct("<4sLQL")
+ZIP64_EOCD = struct.Struct("<4sQ2H2L4Q")
+CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+
+EOCD_SIGNATURE = b"PK\x05\x06"
+ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+ZIP64_EOCD_SIGNATURE = b"PK\x06\x06"
+CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+ZIP64_EXTRA_ID = 0x0001
+UTF8_FLAG = 0x800
+
+# the end of central directory record is followed by a comment of up to 64KB,
+# which is rare, so the first read only covers a short comment
+TAIL_BYTES = 1024
+MAX_TAIL_BYTES = EOCD.size + 0xFFFF
+
+
+@dataclass
+class ZipMember:
+    name: str
+    sizeBytes: str
+    compressedSizeBytes: str
+    crc32: str
+
+
+@dataclass
+class CentralDirectory:
+    offset: int
+    size: int
+    entries: int
+
+
+def locate_central_directory(read_range, size):
+    tail, tail_start, position = _find_eocd(read_range, size)
+    _, _, _, _, entries, directory_size, directory_offset, _ = EOCD.unpack_from(
+        tail, position
+    )
+    if entries != 0xFFFF and 0xFFFFFFFF not in (directory_size, directory_offset):
+        return CentralDirectory(directory_offset, directory_size, entries)
+    return _zip64_directory(read_range, tail, tail_start, position)
+
+
+def _find_eocd(read_range, size):
+    tail_bytes = min(size, TAIL_BYTES)
+    tail = read_range(size - tail_bytes, size)
+    position = tail.rfind(EOCD_SIGNATURE)
+    if position < 0 and tail_bytes < min(size, MAX_TAIL_BYTES):
+        tail_bytes = min(size, MAX_TAIL_BYTES)
+        tail = read_range(size - tail_bytes, size)
+        position = tail.rfind(EOCD_SIGNATURE)
+    if position < 0 or len(tail) - position < EOCD.size:
+        raise InvalidArchive("end of central directory record not found")
+    return tail, size - tail_bytes, position
+
+
+def _zip64_directory(read_range, tail, tail_start, position):
+    eocd_offset = tail_start + position
+    locator_offset = eocd_offset - ZIP64_LOCATOR.size
+    if position >= ZIP64_LOCATOR.size:
+        locator_start = position - ZIP64_LOCATOR.size
+        locator = tail[locator_start:position]
+    else:
+        locator = read_range(locator_offset, eocd_offset)
+    signature, _, zip64_offset, _ = ZIP64_LOCATOR.unpack(locator)
+    if signature != ZIP64_LOCATOR_SIGNATURE:
+        raise InvalidArchive("zip64 end of central directory locator not found")
+    record = read_range(zip64_offset, zip64_offset + ZIP64_EOCD.size)
+    fields = ZIP64_EOCD.unpack(record)
+    if fields[0] != ZIP64_EOCD_SIGNATURE:
+        raise InvalidArchive("zip64 end of central directory record not found")
+    return CentralDirectory(offset=fields[9], size=fields[8], entries=fields[7])
+
+
+def iter_members(read_range, size, max_directory_bytes=65536, chunk_size=8192):
+    directory = locate_central_directory(read_range, size)
+    if directory.size > max_directory_bytes:
+        raise InvalidArchive(
+            f"central directory of {directory.size} bytes exceeds the "
+            f"{max_directory_bytes} byte limit"
+        )
+    if directory.offset + directory.size > size:
+        raise InvalidArchive("central directory extends past the end of the object")
+
+    buffer = b""
+    position = directory.offset
+    end = directory.offset + directory.size
+    for _ in range(directory.entries):
+        buffer, position, member_size = _read_entry(
+            read_range, buffer, position, end, chunk_size
+        )
+        yield _parse_entry(buffer)
+        buffer = buffer[member_size:]
+
+
+def _read_entry(read_range, buffer, position, end, chunk_size):
+    # reads on until the buffer holds the whole of the next entry
+    while True:
+        member_size = _entry_size(buffer)
+        if member_size is not None and len(buffer) >= member_size:
+            return buffer, position, member_size
+        if position >= end:
+            raise InvalidArchive("central directory is truncated")
+        next_position = min(end, position + chunk_size)
+        buffer += read_range(position, next_position)
+        position = next_position
+
+
+def _entry_size(buffer):
+    if len(buffer) < CENTRAL_HEADER.size:
+        return None
+    if buffer[:4] != CENTRAL_HEADER_SIGNATURE:
+        raise InvalidArchive("bad central directory entry signature")
+    name_length, extra_length, comment_length = struct.unpack_from("<3H", buffer, 28)
+    return CENTRAL_HEADER.size + name_length + extra_length + comment_length
+
+
+def _parse_entry(buffer):
+    header = CENTRAL_HEADER.unpack_from(buffer)
+    flags, crc, compressed_size, size = header[3], header[7], header[8], header[9]
+    name_length, extra_length = header[10], header[11]
+    name_start = CENTRAL_HEADER.size
+    extra_start = name_start + name_length
+    raw_name = buffer[name_start:extra_start]
+    name = raw_name.decode("utf-8" if flags & UTF8_FLAG else "cp437")
+
+    if 0xFFFFFFFF in (size, compressed_size):
+        extra_end = extra_start + extra_length
+        size, compressed_size = _zip64_sizes(
+            buffer[extra_start:extra_end], size, compressed_size
+        )
+
+    return ZipMember(
+        name=name,
+        sizeBytes=str(size),
+        compressedSizeBytes=str(compressed_size),
+        crc32=f"{crc:08x}",
+    )
+
+
+def _zip64_sizes(extra, size, compressed_size):
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, length = struct.unpack_from("<2H", extra, offset)
+        offset += 4
+        if header_id == ZIP64_EXTRA_ID:
+            return _zip64_values(extra, offset, length, size, compressed_size)
+        offset += length
+    raise InvalidArchive("zip64 sizes missing from central directory entry")
+
+
+def _zip64_values(extra, offset, length, size, compressed_size):
+    # the extra field only holds the sizes that overflowed, in this order
+    values = iter(struct.unpack_from(f"<{length // 8}Q", extra, offset))
+    if size == 0xFFFFFFFF:
+        size = next(values)
+    if compressed_size == 0xFFFFFFFF:
+        compressed_size = next(values)
+    return size, compressed_size
@@ -1,25 +1,238 @@
+import importlib.util
 import os
-from dataclasses import dataclass
+import sys
+import threading
+from dataclasses import dataclass, fields
 
+from logger import logger
+from metrics import metrics
+from utils import InvalidConfig
 
-@dataclass
+_lock = threading.Lock()
+_config = None
+_config_error = None
+
+_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+REQUIRED_FIELDS = ("project_id", "topic_name")
+DEDUP_STORE_SCHEMES = ("sqlite:", "firestore:")
+SPOOL_SCHEMES = ("file:", "sqlite:", "gcs:")
+# module of each optional backend, with the package and extra that install it
+BACKEND_PACKAGES = {
+    "google.cloud.storage": ("google-cloud-storage", "gcs"),
+    "google.cloud.firestore": ("google-cloud-firestore", "firestore"),
+    "opentelemetry.metrics": ("opentelemetry-api", "otel"),
+}
+
+
+@dataclass(frozen=True, **_DATACLASS_OPTIONS)
 class Config:
     on_prem_subfolder: str
     project_id: str
     topic_name: str
     env: str
+    publish_max_messages: int = 100
+    publish_max_bytes: int = 1000000
+    publish_max_latency: float = 0.01
+    publish_flow_control_max_messages: int = 1000
+    publish_flow_control_max_bytes: int = 10000000
+    publish_timeout: float = 30.0
+    batch_size: int = 1000
+    dds_workers: int = 4
+    dds_flush_timeout: float = 10.0
+    dds_timeout: float = 5.0
+    dds_breaker_threshold: int = 5
+    dds_breaker_reset: float = 30.0
+    dds_replay_limit: int = 10000
+    dedup_enabled: bool = False
+    dedup_cache_size: int = 10000
+    dedup_ttl: float = 86400.0
+    dedup_store: str = ""
+    aggregate_enabled: bool = False
+    aggregate_in_function: bool = False
+    aggregate_window: float = 2.0
+    aggregate_max_files: int = 100
+    aggregate_max_bytes: int = 5000000000
+    zip_listing_enabled: bool = False
+    zip_listing_max_bytes: int = 65536
+    storage_root: str = ""
+    verify_enabled: bool = False
+    verify_max_bytes: int = 1073741824
+    verify_chunk_size: int = 1048576
+    verify_workers: int = 4
+    publish_retry_attempts: int = 4
+    publish_retry_initial: float = 0.1
+    publish_retry_maximum: float = 5.0
+    publish_retry_deadline: float = 30.0
+    spool: str = ""
+    spool_drain_limit: int = 500
+    spool_drain_interval: float = 60.0
+    subscription: str = ""
+    worker_concurrency: int = 8
+    worker_max_messages: int = 100
+    worker_max_bytes: int = 104857600
+    worker_shutdown_timeout: float = 30.0
+    async_concurrency: int = 64
+    ignore_patterns: tuple = ()
+    ordering_enabled: bool = False
+    metrics_exporter: str = ""
+    metrics_port: int = 9464
 
     @classmethod
     def from_env(cls):
-        return cls(
-            on_prem_subfolder=os.getenv("ON-PREM-SUBFOLDER"),
-            project_id=os.getenv("PROJECT_ID"),
-            topic_name=os.getenv("TOPIC_NAME"),
-            env=os.getenv("ENV"),
+        try:
+            return cls(
+                on_prem_subfolder=os.getenv("ON-PREM-SUBFOLDER"),
+                project_id=os.getenv("PROJECT_ID"),
+                topic_name=os.getenv("TOPIC_NAME"),
+                env=os.getenv("ENV"),
+                publish_max_messages=int(os.getenv("PUBLISH_MAX_MESSAGES", "100")),
+                publish_max_bytes=int(os.getenv("PUBLISH_MAX_BYTES", "1000000")),
+                publish_max_latency=float(os.getenv("PUBLISH_MAX_LATENCY", "0.01")),
+                publish_flow_control_max_messages=int(
+                    os.getenv("PUBLISH_FLOW_CONTROL_MAX_MESSAGES", "1000")
+                ),
+                publish_flow_control_max_bytes=int(
+                    os.getenv("PUBLISH_FLOW_CONTROL_MAX_BYTES", "10000000")
+                ),
+                publish_timeout=float(os.getenv("PUBLISH_TIMEOUT", "30")),
+                batch_size=int(os.getenv("BATCH_SIZE", "1000")),
+                dds_workers=int(os.getenv("DDS_WORKERS", "4")),
+                dds_flush_timeout=float(os.getenv("DDS_FLUSH_TIMEOUT", "10")),
+                dds_timeout=float(os.getenv("DDS_TIMEOUT", "5")),
+                dds_breaker_threshold=int(os.getenv("DDS_BREAKER_THRESHOLD", "5")),
+                dds_breaker_reset=float(os.getenv("DDS_BREAKER_RESET", "30")),
+                dds_replay_limit=int(os.getenv("DDS_REPLAY_LIMIT", "10000")),
+                dedup_enabled=os.getenv("DEDUP_ENABLED", "false").lower() == "true",
+                dedup_cache_size=int(os.getenv("DEDUP_CACHE_SIZE", "10000")),
+                dedup_ttl=float(os.getenv("DEDUP_TTL", "86400")),
+                dedup_store=os.getenv("DEDUP_STORE", ""),
+                aggregate_enabled=os.getenv("AGGREGATE_ENABLED", "false").lower()
+                == "true",
+                aggregate_in_function=os.getenv(
+                    "AGGREGATE_IN_FUNCTION", "false"
+                ).lower()
+                == "true",
+                aggregate_window=float(os.getenv("AGGREGATE_WINDOW", "2")),
+                aggregate_max_files=int(os.getenv("AGGREGATE_MAX_FILES", "100")),
+                aggregate_max_bytes=int(os.getenv("AGGREGATE_MAX_BYTES", "5000000000")),
+                zip_listing_enabled=os.getenv("ZIP_LISTING_ENABLED", "false").lower()
+                == "true",
+                zip_listing_max_bytes=int(os.getenv("ZIP_LISTING_MAX_BYTES", "65536")),
+                storage_root=os.getenv("STORAGE_ROOT", ""),
+                verify_enabled=os.getenv("VERIFY_ENABLED", "false").lower() == "true",
+                verify_max_bytes=int(os.getenv("VERIFY_MAX_BYTES", "1073741824")),
+                verify_chunk_size=int(os.getenv("VERIFY_CHUNK_SIZE", "1048576")),
+                verify_workers=int(os.getenv("VERIFY_WORKERS", "4")),
+                publish_retry_attempts=int(os.getenv("PUBLISH_RETRY_ATTEMPTS", "4")),
+                publish_retry_initial=float(os.getenv("PUBLISH_RETRY_INITIAL", "0.1")),
+                publish_retry_maximum=float(os.getenv("PUBLISH_RETRY_MAXIMUM", "5")),
+                publish_retry_deadline=float(os.getenv("PUBLISH_RETRY_DEADLINE", "30")),
+                spool=os.getenv("SPOOL", ""),
+                spool_drain_limit=int(os.getenv("SPOOL_DRAIN_LIMIT", "500")),
+                spool_drain_interval=float(os.getenv("SPOOL_DRAIN_INTERVAL", "60")),
+                subscription=os.getenv("SUBSCRIPTION", ""),
+                worker_concurrency=int(os.getenv("WORKER_CONCURRENCY", "8")),
+                worker_max_messages=int(os.getenv("WORKER_MAX_MESSAGES", "100")),
+                worker_max_bytes=int(os.getenv("WORKER_MAX_BYTES", "104857600")),
+                worker_shutdown_timeout=float(
+                    os.getenv("WORKER_SHUTDOWN_TIMEOUT", "30")
+                ),
+                async_concurrency=int(os.getenv("ASYNC_CONCURRENCY", "64")),
+                ignore_patterns=tuple(
+                    pattern.strip()
+                    for pattern in os.getenv("IGNORE_PATTERNS", "").split(",")
+                    if pattern.strip()
+                ),
+                ordering_enabled=os.getenv("ORDERING_ENABLED", "false").lower()
+                == "true",
+                metrics_exporter=os.getenv("METRICS_EXPORTER", ""),
+                metrics_port=int(os.getenv("METRICS_PORT", "9464")),
+            )
+        except ValueError as error:
+            raise InvalidConfig(f"invalid configuration value: {error}") from error
+
+    def validate(self):
+        problems = [
+            f"{name} not set" for name in REQUIRED_FIELDS if not getattr(self, name)
+        ]
+        problems.extend(
+            f"{field.name} must be greater than 0"
+            for field in fields(self)
+            if field.type in (int, float) and getattr(self, field.name) <= 0
         )
+        if self.dedup_store and not self.dedup_store.startswith(DEDUP_STORE_SCHEMES):
+            problems.append("dedup_store must start with sqlite: or firestore:")
+        if self.spool and not self.spool.startswith(SPOOL_SCHEMES):
+            problems.append("spool must start with file:, sqlite: or gcs:")
+        problems.extend(self.missing_backends())
+        if problems:
+            raise InvalidConfig(", ".join(problems))
+        return self
+
+    def backends(self):
+        if (self.verify_enabled or self.zip_listing_enabled) and not self.storage_root:
+            yield "reading objects from GCS", "google.cloud.storage"
+        if self.spool.startswith("gcs:"):
+            yield "spool", "google.cloud.storage"
+        if self.dedup_store.startswith("firestore:"):
+            yield "dedup_store", "google.cloud.firestore"
+        if self.metrics_exporter == "otel":
+            yield "metrics_exporter", "opentelemetry.metrics"
+
+    def missing_backends(self):
+        for setting, module in self.backends():
+            if not is_installed(module):
+                package, extra = BACKEND_PACKAGES[module]
+                yield f"{setting} needs {package}, install the {extra} extra"
 
     def log(self):
-        print(f"Configuration: Project ID: {self.project_id}")
-        print(f"Configuration: Topic Name: {self.topic_name}")
-        print(f"Configuration: ON-PREM-SUBFOLDER: {self.on_prem_subfolder}")
-        print(f"Configuration: Env: {self.env}")
+        logger.info(
+            "Configuration",
+            project_id=self.project_id,
+            topic_name=self.topic_name,
+            on_prem_subfolder=self.on_prem_subfolder,
+            env=self.env,
+        )
+
+
+def is_installed(module):
+    try:
+        return importlib.util.find_spec(module) is not None
+    except ImportError:
+        return False
+
+
+def get_config():
+    if _config is None:
+        with _lock:
+            if _config is None and _config_error is None:
+                _load_config()
+        if _config_error is not None:
+            raise _config_error.with_traceback(None)
+    return _config
+
+
+def _load_config():
+    global _config, _config_error
+    try:
+        config = Config.from_env()
+        config.log()
+        _config = config.validate()
+        metrics.configure(_config)
+    except InvalidConfig as error:
+        # an invalid deployment stays invalid, so every invocation fails at
+        # once rather than reading and checking it again
+        _config_error = error
+
+
+def reload_config():
+    reset_config()
+    return get_config()
+
+
+def reset_config():
+    global _config, _config_error
+    with _lock:
+        _config = None
+        _config_error = None
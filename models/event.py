@@ -0,0 +1,100 @@
+import binascii
+import operator
+from dataclasses import dataclass
+
+from models.filename import parse_name
+from utils import InvalidEvent
+
+EVENT_FIELDS = ("name", "bucket", "size", "md5Hash", "timeCreated")
+
+_event_fields = operator.itemgetter(*EVENT_FIELDS)
+
+
+# not frozen, as frozen dataclasses set each field through object.__setattr__
+@dataclass
+class Event:
+    __slots__ = ("name", "bucket", "size", "md5_hash", "md5sum", "time_created")
+
+    name: str
+    bucket: str
+    size: int
+    md5_hash: str
+    md5sum: str
+    time_created: str
+
+    def parsed(self):
+        return parse_name(f"{self.name}:{self.bucket}")
+
+
+def parse_event(event):
+    if type(event) is Event:
+        return event
+    # valid events take the fast path, the problems are only collected to
+    # report an event that fails it
+    try:
+        name, bucket, size, md5_hash, time_created = _event_fields(event)
+        if (
+            isinstance(name, str)
+            and isinstance(bucket, str)
+            and isinstance(size, str)
+            and isinstance(md5_hash, str)
+            and isinstance(time_created, str)
+            and name
+            and bucket
+            and md5_hash
+            and time_created
+            and size.isdigit()
+        ):
+            return Event(
+                name,
+                bucket,
+                int(size),
+                md5_hash,
+                binascii.a2b_base64(md5_hash).hex(),
+                time_created,
+            )
+    except (KeyError, TypeError, ValueError):
+        pass
+    raise InvalidEvent(event_problems(event))
+
+
+def event_problems(event):
+    if not isinstance(event, dict):
+        return [f"event is a {type(event).__name__}, not an object"]
+    problems = [_field_problem(key, event.get(key)) for key in EVENT_FIELDS]
+    problems.extend(_format_problems(event))
+    return [problem for problem in problems if problem is not None]
+
+
+def _field_problem(key, value):
+    if value is None:
+        return f"{key} is missing"
+    if not isinstance(value, str):
+        return f"{key} is a {type(value).__name__}, not a string"
+    if not value:
+        return f"{key} is empty"
+    return None
+
+
+def _format_problems(event):
+    size = event.get("size")
+    if isinstance(size, str) and size and not _is_size(size):
+        yield f"size '{size}' is not a whole number"
+    md5_hash = event.get("md5Hash")
+    if isinstance(md5_hash, str) and md5_hash and not _is_base64(md5_hash):
+        yield f"md5Hash '{md5_hash}' is not base64"
+
+
+def _is_size(size):
+    try:
+        return size.isdigit() and int(size) >= 0
+    except ValueError:
+        return False
+
+
+def _is_base64(value):
+    try:
+        binascii.a2b_base64(value)
+    except ValueError:
+        return False
+    return True
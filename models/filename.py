@@ -0,0 +1,70 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from utils import InvalidFileName
+
+_NAME_PATTERN = re.compile(
+    r"(?P<filename>(?:[^:]*/)?(?P<basename>[^:/]+))(?::(?P<bucket>.*))?", re.DOTALL
+)
+
+
+@dataclass(frozen=True)
+class ParsedName:
+    __slots__ = (
+        "filename",
+        "bucket",
+        "type",
+        "tla",
+        "instrument_name",
+        "extension",
+        "timestamp",
+    )
+
+    filename: str
+    bucket: Optional[str]
+    type: str
+    tla: Optional[str]
+    instrument_name: str
+    extension: str
+    timestamp: Tuple[str, ...]
+
+    def survey_tla(self):
+        if self.tla is None:
+            raise InvalidFileName(
+                f"File name '{self.filename}' has no survey after the file type"
+            )
+        return self.tla
+
+
+@lru_cache(maxsize=4096)
+def parse_name(name):
+    match = _NAME_PATTERN.fullmatch(name)
+    if match is None:
+        raise InvalidFileName(
+            f"File name '{name}' is invalid, expected '<type>_<instrument>_<timestamp>.zip:<bucket>'"  # noqa:E501
+        )
+
+    filename, basename = match.group("filename", "basename")
+    file_type, separator, remainder = filename.partition("_")
+    tla = remainder.split("_", 1)[0][0:3].upper() if separator else None
+
+    dot = basename.rfind(".")
+    if 0 < dot < len(basename) - 1:
+        stem, extension = basename[:dot], basename[dot:]
+    else:
+        stem, extension = basename, ""
+    parts = stem.split("_")[1:]
+
+    return ParsedName(
+        filename=filename,
+        bucket=match["bucket"],
+        type=file_type,
+        tla=tla,
+        instrument_name="_".join(
+            part for part in parts if not part.isnumeric()
+        ).upper(),
+        extension=extension,
+        timestamp=tuple(part for part in parts if part.isnumeric()),
+    )
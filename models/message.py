@@ -1,21 +1,21 @@
-import json
-import pathlib
-from dataclasses import asdict, dataclass
+import time
+from dataclasses import dataclass, field
+from functools import partial
 from typing import List
 
-from google.cloud import pubsub_v1
-
-from utils import (
-    InvalidFileExtension,
-    InvalidFileType,
-    md5hash_to_md5sum,
-    size_in_megabytes,
-)
+from clients import get_publisher_client, is_client_broken, reset_publisher_client
+from logger import logger
+from models.archive import ZipMember, iter_members
+from models.event import parse_event
+from models.filename import parse_name
+from models.routing import get_router
+from models.serializer import serialize
+from retry import Backoff, call_with_retry
+from storage import get_storage
+from utils import InvalidFileExtension, size_in_megabytes
 
 SUPPORTED_FILE_EXTENSIONS = [".zip"]
 
-SUPPORTED_FILE_TYPES = ["dd", "mi"]
-
 
 @dataclass
 class File:
@@ -24,40 +24,55 @@ class File:
     md5sum: str
     relativePath: str = ".\\"
 
+    def parsed(self):
+        return parse_name(self.name)
+
     def extension(self):
-        return pathlib.Path(self.filename()).suffix
+        return self.parsed().extension
 
     def filename(self):
-        return self.name.split(":")[0]
+        return self.parsed().filename
 
     def type(self):
-        return self.name.split("_")[0]
+        return self.parsed().type
 
     def survey_tla(self):
-        return self.filename().split("_")[1][0:3].upper()
+        return self.parsed().survey_tla()
 
     def instrument_name(self):
-        file_prefix = pathlib.Path(self.filename()).stem
-        parsed_prefix = file_prefix.split("_")[1:]
-        instrument_name = [
-            instrument_name_part
-            for instrument_name_part in parsed_prefix
-            if not instrument_name_part.isnumeric()
-        ]
-        return "_".join(instrument_name).upper()
+        return self.parsed().instrument_name
+
+    def ordering_key(self):
+        return f"{self.survey_tla()}/{self.instrument_name()}"
 
     def is_lms(self):
         return self.survey_tla().startswith("LM")
-    
+
     def is_frs(self):
         return self.survey_tla().startswith("FRS")
 
     @classmethod
     def from_event(cls, event):
+        event = parse_event(event)
+        return cls(
+            name=f"{event.name}:{event.bucket}",
+            sizeBytes=str(event.size),
+            md5sum=event.md5sum,
+        )
+
+
+@dataclass
+class ArchiveFile(File):
+    members: List[ZipMember] = field(default_factory=list)
+
+    @classmethod
+    def from_file(cls, file, members):
         return cls(
-            name=f"{event['name']}:{event['bucket']}",
-            sizeBytes=event["size"],
-            md5sum=md5hash_to_md5sum(event["md5Hash"]),
+            name=file.name,
+            sizeBytes=file.sizeBytes,
+            md5sum=file.md5sum,
+            relativePath=file.relativePath,
+            members=members,
         )
 
 
@@ -78,95 +93,144 @@ class Message:
     iterationL4: str = ""
 
     def json(self):
-        return json.dumps(asdict(self))
+        return self.json_bytes().decode("utf-8")
+
+    def json_bytes(self):
+        return serialize(self)
 
     def first_file(self):
         return self.files[0]
 
-    def management_information(self, config):
-        file = self.first_file()
-        self.description = (
-            "Management Information files uploaded to GCP bucket from Blaise5"
-        )
-        self.dataset = "blaise_mi"
-        self.iterationL1 = f"BL5-{config.env}"
-        self.iterationL2 = file.survey_tla()
-        self.iterationL3 = file.instrument_name()
-        return self
-
-    def data_delivery_default(self, config):
-        file = self.first_file()
-        survey_tla = file.survey_tla()
-        self.description = (
-            f"Data Delivery files for {survey_tla} uploaded to GCP bucket from Blaise5"
-        )
-        self.dataset = "blaise_dde"
-        self.iterationL1 = "SYSTEMS"
-        self.iterationL2 = config.on_prem_subfolder
-        self.iterationL3 = survey_tla
-        self.iterationL4 = file.instrument_name()
-        return self
-
-    def data_delivery_lms(self, config):
-        file = self.first_file()
-        survey_tla = file.survey_tla()
-        environment = config.env
-        self.description = (
-            f"Data Delivery files for {survey_tla} uploaded to GCP bucket from Blaise5"
-        )
-        self.dataset = "blaise_dde_lms"
-        self.iterationL1 = "CLOUD"
-        self.iterationL2 = environment
-        self.iterationL3 = file.instrument_name()
-        return self
-    
-    def data_delivery_frs(self, config):
-        file = self.first_file()
-        survey_tla = file.survey_tla()
-        environment = config.env
-        self.description = (
-            f"Data Delivery files for {survey_tla} uploaded to GCP bucket from Blaise5"
-        )
-        self.dataset = "blaise_dde_frs"
-        self.iterationL1 = "ingress"
-        self.iterationL2 = "survey_data"
-        self.iterationL3 = f"bl5-{environment}"
-        self.iterationL4 = file.instrument_name()
-        return self
+    def ordering_key(self):
+        return self.first_file().ordering_key()
+
+    def route_name(self):
+        return get_router().route(self.first_file().parsed()).name
 
 
 def create_message(event, config):
+    event = parse_event(event)
     file = File.from_event(event)
 
     msg = Message(
         sourceName=f"gcp_blaise_{config.env}",
-        manifestCreated=event["timeCreated"],
-        fullSizeMegabytes=size_in_megabytes(event["size"]),
+        manifestCreated=event.time_created,
+        fullSizeMegabytes=size_in_megabytes(event.size),
         files=[file],
     )
 
-    if file.extension() not in SUPPORTED_FILE_EXTENSIONS:
+    parsed = event.parsed()
+    if parsed.extension not in SUPPORTED_FILE_EXTENSIONS:
         raise InvalidFileExtension(
-            f"File extension '{file.extension()}' is invalid, supported extensions: {SUPPORTED_FILE_EXTENSIONS}"  # noqa:E501
+            f"File extension '{parsed.extension}' is invalid, supported extensions: {SUPPORTED_FILE_EXTENSIONS}"  # noqa:E501
         )
 
-    if file.type() == "mi":
-        return msg.management_information(config)
-    if file.type() == "dd" and file.is_lms():
-        return msg.data_delivery_lms(config)
-    if file.type() == "dd" and file.is_frs():
-        return msg.data_delivery_frs(config)
-    if file.type() == "dd":
-        return msg.data_delivery_default(config)
-
-    raise InvalidFileType(
-        f"File type '{file.type()}' is invalid, supported extensions: {SUPPORTED_FILE_TYPES}"  # noqa:E501
+    msg = get_router().route(parsed).apply(msg, config)
+    if config.zip_listing_enabled:
+        msg.files = [list_archive_members(file, event, config)]
+    return msg
+
+
+def list_archive_members(file, event, config):
+    try:
+        storage = get_storage(config, event.bucket)
+        members = list(
+            iter_members(
+                partial(storage.read_range, event.name),
+                event.size,
+                config.zip_listing_max_bytes,
+            )
+        )
+    except Exception as error:
+        logger.warning(
+            "failed to list zip members", file_name=event.name, error=str(error)
+        )
+        return file
+    return ArchiveFile.from_file(file, members)
+
+
+def create_messages(events, config, accepted=None):
+    for event, typed_event in zip(events, accepted or events):
+        try:
+            yield event, create_message(typed_event, config), None
+        except Exception as error:
+            yield event, None, error
+
+
+@dataclass
+class PublishResult:
+    message_id: str
+    ack_latency_ms: float
+
+
+def message_ordering_key(config, message):
+    return message.ordering_key() if config.ordering_enabled else ""
+
+
+def publish_message(config, message):
+    return publish_data(
+        config, message.json_bytes(), message_ordering_key(config, message)
     )
 
 
-def send_pub_sub_message(config, message):
-    client = pubsub_v1.PublisherClient()
+def publish_data(config, data, ordering_key=""):
+    published_at = time.perf_counter()
+    client = get_publisher_client(config)
     topic_path = client.topic_path(config.project_id, config.topic_name)
-    msg_bytes = bytes(message.json(), encoding="utf-8")
-    client.publish(topic_path, data=msg_bytes)
-    print("Message published")
+    options = {"ordering_key": ordering_key} if ordering_key else {}
+    try:
+        return client.publish(topic_path, data=data, **options)
+    except Exception as error:
+        if is_client_broken(error):
+            reset_publisher_client(published_at)
+        raise
+
+
+def wait_for_publish(config, future, published_at, ordering_key=""):
+    try:
+        message_id = future.result(timeout=config.publish_timeout)
+    except Exception as error:
+        publish_failed(config, error, published_at, ordering_key)
+        raise
+    ack_latency_ms = (time.perf_counter() - published_at) * 1000
+    return PublishResult(message_id=message_id, ack_latency_ms=ack_latency_ms)
+
+
+def publish_failed(config, error, published_at, ordering_key=""):
+    if is_client_broken(error):
+        reset_publisher_client(published_at)
+        return
+    if not ordering_key:
+        return
+    # a failed publish pauses only its ordering key, so the client is kept and
+    # publishes for other keys carry on while this one is resumed
+    client = get_publisher_client(config)
+    topic_path = client.topic_path(config.project_id, config.topic_name)
+    try:
+        client.resume_publish(topic_path, ordering_key)
+    except RuntimeError:
+        # another failed publish already resumed the key
+        pass
+
+
+def send_pub_sub_message(config, message):
+    published_at = time.perf_counter()
+    future = publish_message(config, message)
+    result = wait_for_publish(
+        config, future, published_at, message_ordering_key(config, message)
+    )
+    logger.info(
+        "Message published",
+        sampled=True,
+        message_id=result.message_id,
+        ack_latency_ms=round(result.ack_latency_ms, 3),
+    )
+    return result
+
+
+def publish_with_retry(config, message):
+    return call_with_retry(
+        lambda: send_pub_sub_message(config, message),
+        Backoff.from_config(config),
+        config.publish_retry_attempts,
+    )
@@ -0,0 +1,48 @@
+import fnmatch
+import re
+from functools import lru_cache
+
+from models.event import parse_event
+from models.message import SUPPORTED_FILE_EXTENSIONS
+from models.routing import get_router
+from utils import EventRejected, InvalidEvent, InvalidFileName
+
+
+@lru_cache(maxsize=32)
+def ignore_pattern(patterns):
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns))
+
+
+def preflight(event, config):
+    try:
+        accepted = parse_event(event)
+    except InvalidEvent as error:
+        raise EventRejected("malformed", str(error)) from error
+
+    pattern = ignore_pattern(config.ignore_patterns)
+    if pattern is not None and pattern.match(accepted.name):
+        raise EventRejected(
+            "ignored", f"File '{accepted.name}' matches an ignore pattern"
+        )
+
+    try:
+        parsed = accepted.parsed()
+    except InvalidFileName as error:
+        raise EventRejected("invalid_name", str(error)) from error
+    if parsed.extension not in SUPPORTED_FILE_EXTENSIONS:
+        raise EventRejected(
+            "unsupported_extension",
+            f"File extension '{parsed.extension}' is invalid, "
+            f"supported extensions: {SUPPORTED_FILE_EXTENSIONS}",
+        )
+    # the routing table decides which file types are published, so a type
+    # added to it is accepted without another list to keep in step
+    router = get_router()
+    if not router.supports(parsed.type):
+        raise EventRejected(
+            "unsupported_type",
+            f"File type '{parsed.type}' is invalid, supported types: {router.types}",
+        )
+    return accepted
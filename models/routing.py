@@ -0,0 +1,143 @@
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional, Pattern, Tuple
+
+from utils import InvalidFileType
+
+ROUTES_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "routes.json")
+
+ITERATION_FIELDS = ("iterationL1", "iterationL2", "iterationL3", "iterationL4")
+
+_PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+
+_lock = threading.Lock()
+_router = None
+
+
+def compile_template(template):
+    placeholder = _PLACEHOLDER_PATTERN.fullmatch(template)
+    if placeholder is not None:
+        # a bare placeholder keeps the value as is, so an unset config value
+        # stays None in the manifest rather than becoming "None"
+        field = placeholder.group(1)
+        return lambda fields: fields[field]
+    if _PLACEHOLDER_PATTERN.search(template) is None:
+        return lambda _fields: template
+    return lambda fields: template.format(**fields)
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    type: str
+    tla_prefix: str
+    instrument_pattern: Optional[Pattern]
+    dataset: str
+    description: Callable
+    iterations: Tuple[Callable, ...]
+
+    @classmethod
+    def from_dict(cls, route):
+        instrument_pattern = route.get("instrument_pattern")
+        return cls(
+            name=route["name"],
+            type=route["type"],
+            tla_prefix=route.get("tla_prefix", "").upper(),
+            instrument_pattern=(
+                re.compile(instrument_pattern, re.IGNORECASE)
+                if instrument_pattern
+                else None
+            ),
+            dataset=route["dataset"],
+            description=compile_template(route["description"]),
+            iterations=tuple(
+                compile_template(route.get(field, "")) for field in ITERATION_FIELDS
+            ),
+        )
+
+    def matches(self, instrument_name):
+        return (
+            self.instrument_pattern is None
+            or self.instrument_pattern.fullmatch(instrument_name) is not None
+        )
+
+    def apply(self, message, config):
+        file = message.first_file()
+        fields = {
+            "env": config.env,
+            "on_prem_subfolder": config.on_prem_subfolder,
+            "survey_tla": file.survey_tla(),
+            "instrument_name": file.instrument_name(),
+        }
+        message.description = self.description(fields)
+        message.dataset = self.dataset
+        (
+            message.iterationL1,
+            message.iterationL2,
+            message.iterationL3,
+            message.iterationL4,
+        ) = (iteration(fields) for iteration in self.iterations)
+        return message
+
+
+class Router:
+    def __init__(self, routes):
+        self.routes = list(routes)
+        self._index = {}
+        prefix_lengths = {}
+        for route in self.routes:
+            self._index.setdefault((route.type, route.tla_prefix), []).append(route)
+            prefix_lengths.setdefault(route.type, set()).add(len(route.tla_prefix))
+        self._prefix_lengths = {
+            file_type: sorted(lengths, reverse=True)
+            for file_type, lengths in prefix_lengths.items()
+        }
+
+    @property
+    def types(self):
+        return list(self._prefix_lengths)
+
+    def supports(self, file_type):
+        return file_type in self._prefix_lengths
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as routes_file:
+            routes = json.load(routes_file)["routes"]
+        return cls(Route.from_dict(route) for route in routes)
+
+    def route(self, parsed):
+        prefix_lengths = self._prefix_lengths.get(parsed.type)
+        if prefix_lengths is None:
+            raise InvalidFileType(
+                f"File type '{parsed.type}' is invalid, supported extensions: {self.types}"  # noqa:E501
+            )
+
+        survey_tla = parsed.survey_tla()
+        for prefix_length in prefix_lengths:
+            routes = self._index.get((parsed.type, survey_tla[0:prefix_length]), ())
+            for route in routes:
+                if route.matches(parsed.instrument_name):
+                    return route
+
+        raise InvalidFileType(
+            f"No route for file type '{parsed.type}' and survey '{survey_tla}'"
+        )
+
+
+def get_router():
+    global _router
+    if _router is None:
+        with _lock:
+            if _router is None:
+                _router = Router.from_file(os.getenv("ROUTES_FILE", ROUTES_FILE))
+    return _router
+
+
+def reset_router():
+    global _router
+    with _lock:
+        _router = None
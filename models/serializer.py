@@ -0,0 +1,48 @@
+import json
+from dataclasses import fields
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+
+CONSTANT_FIELDS = frozenset(["version", "schemaVersion", "sensitivity", "sourceName"])
+
+
+def serialize(obj):
+    return _encode(obj).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def _field_prefixes(cls):
+    return tuple(
+        (
+            field.name,
+            f"{encode_basestring_ascii(field.name)}: ",
+            field.name in CONSTANT_FIELDS,
+        )
+        for field in fields(cls)
+    )
+
+
+@lru_cache(maxsize=1024, typed=True)
+def _encode_constant(value):
+    return _encode(value)
+
+
+def _encode(value):
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if hasattr(type(value), "__dataclass_fields__"):
+        return _encode_dataclass(value)
+    if isinstance(value, (list, tuple)):
+        return f"[{', '.join(_encode(item) for item in value)}]"
+    return json.dumps(value)
+
+
+def _encode_dataclass(obj):
+    parts = []
+    for name, prefix, constant in _field_prefixes(type(obj)):
+        value = getattr(obj, name)
+        if constant and value.__hash__ is not None:
+            parts.append(prefix + _encode_constant(value))
+        else:
+            parts.append(prefix + _encode(value))
+    return f"{{{', '.join(parts)}}}"
@@ -0,0 +1,94 @@
+import random
+import time
+
+from logger import logger
+from metrics import metrics
+
+# google.api_core exception classes for gRPC codes that are worth retrying,
+# matched by name so this module does not import the Pub/Sub client
+TRANSIENT_ERRORS = frozenset(
+    [
+        "Aborted",
+        "DeadlineExceeded",
+        "InternalServerError",
+        "ServiceUnavailable",
+        "TooManyRequests",
+        "ResourceExhausted",
+        "TimeoutError",
+        # published after a failed message with the same ordering key, and
+        # worth retrying once the key is resumed
+        "PublishToPausedOrderingKeyException",
+    ]
+)
+
+
+def is_transient(error):
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+class Backoff:
+    def __init__(self, initial=0.1, maximum=5.0, multiplier=2.0, deadline=30.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.deadline = deadline
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            initial=config.publish_retry_initial,
+            maximum=config.publish_retry_maximum,
+            deadline=config.publish_retry_deadline,
+        )
+
+    def delays(self):
+        ceiling = self.initial
+        while True:
+            yield random.uniform(0, ceiling)
+            ceiling = min(self.maximum, ceiling * self.multiplier)
+
+
+def call_with_retry(function, backoff, attempts, sleep=time.sleep):
+    started = time.monotonic()
+    delays = backoff.delays()
+    for attempt in range(1, attempts + 1):
+        try:
+            return function()
+        except Exception as error:
+            delay = retry_delay(error, attempt, attempts, backoff, started, delays)
+            if delay is None:
+                raise
+            sleep(delay)
+
+
+async def call_with_retry_async(function, backoff, attempts, sleep=None):
+    if sleep is None:
+        import asyncio
+
+        sleep = asyncio.sleep
+    started = time.monotonic()
+    delays = backoff.delays()
+    for attempt in range(1, attempts + 1):
+        try:
+            return await function()
+        except Exception as error:
+            delay = retry_delay(error, attempt, attempts, backoff, started, delays)
+            if delay is None:
+                raise
+            await sleep(delay)
+
+
+def retry_delay(error, attempt, attempts, backoff, started, delays):
+    if attempt == attempts or not is_transient(error):
+        return None
+    delay = next(delays)
+    if time.monotonic() - started + delay > backoff.deadline:
+        return None
+    metrics.increment("retries_total", error=type(error).__name__)
+    logger.warning(
+        "Publish failed, retrying",
+        attempt=attempt,
+        delay_seconds=round(delay, 3),
+        error=repr(error),
+    )
+    return delay
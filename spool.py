@@ -0,0 +1,320 @@
+import datetime
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+
+from logger import logger
+from metrics import metrics
+from models.message import File, publish_data, wait_for_publish
+from storage import rfc3339
+
+_lock = threading.Lock()
+_spool = None
+_last_drain = None
+
+
+@dataclass
+class SpoolEntry:
+    event: dict
+    manifest: str
+    error: str
+    attempts: int = 0
+    spooled_at: str = field(
+        default_factory=lambda: rfc3339(datetime.datetime.now(datetime.timezone.utc))
+    )
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    def to_json(self):
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(**json.loads(data))
+
+
+class FileSpool:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._read())
+
+    def add(self, entry):
+        with self._locked():
+            with open(self.path, "a", encoding="utf-8") as spool:
+                spool.write(entry.to_json() + "\n")
+                spool.flush()
+                os.fsync(spool.fileno())
+
+    def entries(self, limit):
+        return self._read()[:limit]
+
+    def settle(self, published, failed):
+        published = {entry.id for entry in published}
+        failed = {entry.id: entry for entry in failed}
+        with self._locked():
+            remaining = [
+                failed.get(entry.id, entry)
+                for entry in self._read()
+                if entry.id not in published
+            ]
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as spool:
+                spool.writelines(entry.to_json() + "\n" for entry in remaining)
+                spool.flush()
+                os.fsync(spool.fileno())
+            os.replace(temporary, self.path)
+
+    def close(self):
+        pass
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as spool:
+                return [SpoolEntry.from_json(line) for line in spool if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _locked(self):
+        return _FileLock(f"{self.path}.lock", self._lock)
+
+
+class _FileLock:
+    def __init__(self, path, thread_lock):
+        self.path = path
+        self.thread_lock = thread_lock
+        self.file = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        self.file = open(self.path, "a")
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *_exc_info):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+        self.thread_lock.release()
+
+
+class SQLiteSpool:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS spool "
+                "(sequence INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE, "
+                "entry TEXT NOT NULL)"
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def add(self, entry):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO spool (id, entry) VALUES (?, ?)",
+                (entry.id, entry.to_json()),
+            )
+
+    def entries(self, limit):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT entry FROM spool ORDER BY sequence LIMIT ?", (limit,)
+            ).fetchall()
+        return [SpoolEntry.from_json(row[0]) for row in rows]
+
+    def settle(self, published, failed):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM spool WHERE id = ?", [(entry.id,) for entry in published]
+            )
+            self._connection.executemany(
+                "UPDATE spool SET entry = ? WHERE id = ?",
+                [(entry.to_json(), entry.id) for entry in failed],
+            )
+
+    def close(self):
+        self._connection.close()
+
+
+class GCSSpool:
+    def __init__(self, bucket_name, prefix="spool/", client=None):
+        if client is None:
+            from google.cloud import storage
+
+            client = storage.Client()
+        self.bucket = client.bucket(bucket_name)
+        self.client = client
+        self.prefix = prefix
+
+    def add(self, entry):
+        blob = self.bucket.blob(self._object_name(entry))
+        blob.upload_from_string(entry.to_json(), content_type="application/json")
+
+    def entries(self, limit):
+        blobs = self.client.list_blobs(
+            self.bucket, prefix=self.prefix, max_results=limit
+        )
+        return [SpoolEntry.from_json(blob.download_as_bytes()) for blob in blobs]
+
+    def settle(self, published, failed):
+        for entry in published:
+            self.bucket.blob(self._object_name(entry)).delete()
+        for entry in failed:
+            self.add(entry)
+
+    def close(self):
+        pass
+
+    def _object_name(self, entry):
+        # names sort by spool time, so entries are drained oldest first
+        return f"{self.prefix}{entry.spooled_at}-{entry.id}.json"
+
+
+def create_spool(spec):
+    if not spec:
+        return None
+    scheme, _, location = spec.partition(":")
+    if scheme == "file":
+        return FileSpool(location)
+    if scheme == "sqlite":
+        return SQLiteSpool(location)
+    if scheme == "gcs":
+        bucket_name, _, prefix = location.partition("/")
+        return GCSSpool(bucket_name, prefix or "spool/")
+    raise ValueError(f"unknown spool '{spec}'")
+
+
+def get_spool(config):
+    global _spool
+    if not config.spool:
+        return None
+    if _spool is None:
+        with _lock:
+            if _spool is None:
+                _spool = create_spool(config.spool)
+    return _spool
+
+
+def spool_failed_publish(config, event, message, error):
+    spool = get_spool(config)
+    if spool is None or message is None:
+        return False
+    try:
+        spool.add(SpoolEntry(event=event, manifest=message.json(), error=repr(error)))
+    except Exception as spool_error:
+        logger.error(
+            "failed to spool manifest",
+            file_name=event["name"],
+            error=repr(spool_error),
+        )
+        return False
+    metrics.increment("spooled_total")
+    logger.warning("Manifest spooled", file_name=event["name"], error=repr(error))
+    return True
+
+
+@dataclass
+class DrainStats:
+    published: int = 0
+    failed: int = 0
+    elapsed_seconds: float = 0.0
+
+    def rate(self):
+        if self.elapsed_seconds <= 0:
+            return 0.0
+        return (self.published + self.failed) / self.elapsed_seconds
+
+
+def drain(spool, config, dds_updater, limit=None, deduplicator=None):
+    started = time.perf_counter()
+    stats = DrainStats()
+    entries = spool.entries(limit or config.spool_drain_limit)
+    # every entry is sent before any is waited on, so their publishes overlap
+    pending = [_start_drain(config, entry) for entry in entries]
+
+    published, failed = [], []
+    for entry, key, future, published_at in pending:
+        error = _finish_drain(config, key, future, published_at)
+        if error is None:
+            published.append(entry)
+            _drained(entry, dds_updater, deduplicator)
+            continue
+        entry.attempts += 1
+        entry.error = repr(error)
+        failed.append(entry)
+
+    if entries:
+        spool.settle(published, failed)
+    stats.published, stats.failed = len(published), len(failed)
+    stats.elapsed_seconds = time.perf_counter() - started
+    if entries:
+        _report_drain(stats)
+    return stats
+
+
+def _start_drain(config, entry):
+    try:
+        key = ""
+        if config.ordering_enabled:
+            key = File.from_event(entry.event).ordering_key()
+        published_at = time.perf_counter()
+        future = publish_data(config, entry.manifest.encode("utf-8"), key)
+        return entry, key, future, published_at
+    except Exception as error:
+        return entry, "", error, None
+
+
+def _finish_drain(config, key, future, published_at):
+    if isinstance(future, Exception):
+        return future
+    try:
+        wait_for_publish(config, future, published_at, key)
+    except Exception as error:
+        return error
+    return None
+
+
+def _drained(entry, dds_updater, deduplicator):
+    dds_updater.enqueue(entry.event, "nifi_notified")
+    if deduplicator is not None:
+        deduplicator.record(entry.event)
+
+
+def _report_drain(stats):
+    metrics.increment("spool_drained_total", stats.published)
+    logger.info(
+        "Spool drained",
+        published=stats.published,
+        failed=stats.failed,
+        elapsed_ms=round(stats.elapsed_seconds * 1000, 3),
+        per_second=round(stats.rate(), 1),
+    )
+
+
+def drain_due(config, clock=time.monotonic):
+    global _last_drain
+    now = clock()
+    with _lock:
+        if _last_drain is not None and now - _last_drain < config.spool_drain_interval:
+            return False
+        _last_drain = now
+    return True
+
+
+def shutdown():
+    global _spool, _last_drain
+    with _lock:
+        spool, _spool = _spool, None
+        _last_drain = None
+    if spool is not None:
+        spool.close()
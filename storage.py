@@ -0,0 +1,127 @@
+import base64
+import datetime
+import hashlib
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+@dataclass
+class ObjectInfo:
+    bucket: str
+    name: str
+    size: int
+    md5_hash: str
+    time_created: str
+    generation: str = None
+
+    def to_event(self):
+        event = {
+            "name": self.name,
+            "bucket": self.bucket,
+            "md5Hash": self.md5_hash,
+            "size": str(self.size),
+            "timeCreated": self.time_created,
+        }
+        # dedup keys on the generation, so a backfilled event has to carry it
+        # to match the finalize notification the function already handled
+        if self.generation is not None:
+            event["generation"] = self.generation
+        return event
+
+
+def get_storage(config, bucket_name):
+    if config.storage_root:
+        return LocalStorage(os.path.join(config.storage_root, bucket_name), bucket_name)
+    return _gcs_storage(bucket_name)
+
+
+@lru_cache(maxsize=16)
+def _gcs_storage(bucket_name):
+    return GCSStorage(bucket_name)
+
+
+def rfc3339(timestamp):
+    return timestamp.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+class GCSStorage:
+    def __init__(self, bucket_name, client=None):
+        if client is None:
+            from google.cloud import storage
+
+            client = storage.Client()
+        self.bucket_name = bucket_name
+        self.client = client
+
+    def list_objects(self, prefix=None):
+        for blob in self.client.list_blobs(self.bucket_name, prefix=prefix):
+            yield ObjectInfo(
+                bucket=self.bucket_name,
+                name=blob.name,
+                size=blob.size,
+                md5_hash=blob.md5_hash,
+                time_created=rfc3339(blob.time_created),
+                generation=str(blob.generation),
+            )
+
+    def read_range(self, name, start, end):
+        blob = self.client.bucket(self.bucket_name).blob(name)
+        return blob.download_as_bytes(start=start, end=end - 1)
+
+    def open(self, name, chunk_size=8388608):
+        blob = self.client.bucket(self.bucket_name).blob(name)
+        return blob.open("rb", chunk_size=chunk_size)
+
+
+class LocalStorage:
+    def __init__(self, root, bucket_name=None):
+        self.root = os.path.abspath(root)
+        self.bucket_name = bucket_name or os.path.basename(self.root)
+
+    def path(self, name):
+        return os.path.join(self.root, *name.split("/"))
+
+    def list_objects(self, prefix=None):
+        for name in self._walk(self.root, ""):
+            if prefix and not name.startswith(prefix):
+                continue
+            path = self.path(name)
+            stat = os.stat(path)
+            yield ObjectInfo(
+                bucket=self.bucket_name,
+                name=name,
+                size=stat.st_size,
+                md5_hash=_file_md5_hash(path),
+                time_created=rfc3339(
+                    datetime.datetime.fromtimestamp(
+                        stat.st_mtime, tz=datetime.timezone.utc
+                    )
+                ),
+                # GCS generations are the microseconds at which it was written
+                generation=str(stat.st_mtime_ns // 1000),
+            )
+
+    def open(self, name):
+        return open(self.path(name), "rb")
+
+    def read_range(self, name, start, end):
+        with open(self.path(name), "rb") as file:
+            file.seek(start)
+            return file.read(end - start)
+
+    def _walk(self, directory, prefix):
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.is_dir():
+                    yield from self._walk(entry.path, f"{prefix}{entry.name}/")
+                else:
+                    yield f"{prefix}{entry.name}"
+
+
+def _file_md5_hash(path):
+    md5 = hashlib.md5()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            md5.update(chunk)
+    return str(base64.b64encode(md5.digest()), "utf-8")
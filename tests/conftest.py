@@ -1,9 +1,35 @@
 import pytest
 
-from models.config import Config
+import aggregate
+import clients
+import dds
+import dedup
+import spool
+from metrics import metrics
+from models.config import Config, reset_config
 from models.message import File, Message
 
 
+@pytest.fixture(autouse=True)
+def reset_instance_state():
+    yield
+    reset_config()
+    aggregate.shutdown()
+    dds.shutdown()
+    dedup.shutdown()
+    spool.shutdown()
+    clients.reset_publisher_client()
+    clients.reset_dds_client()
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.enabled = True
+    yield metrics
+    metrics.enabled = False
+    metrics.reset()
+
+
 @pytest.fixture
 def md5hash():
     return "0a14db6e48b947b57988a2f61469f228"
@@ -0,0 +1,143 @@
+import io
+import struct
+import zipfile
+import zlib
+
+import pytest
+
+from models.archive import (
+    CENTRAL_HEADER,
+    EOCD,
+    TAIL_BYTES,
+    ZIP64_EOCD,
+    ZIP64_LOCATOR,
+    ZipMember,
+    iter_members,
+)
+from utils import InvalidArchive
+
+
+class Reader:
+    def __init__(self, data):
+        self.data = data
+        self.reads = []
+
+    def __call__(self, start, end):
+        self.reads.append((start, end))
+        return self.data[start:end]
+
+    def bytes_read(self):
+        return sum(end - start for start, end in self.reads)
+
+
+def build_zip(members, comment=b""):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+        archive.comment = comment
+    return buffer.getvalue()
+
+
+def test_iter_members_reads_only_the_central_directory():
+    data = build_zip(
+        [("OPN2101A.bdbx", b"a" * 100000), ("données/OPN2101A.bmix", b"b" * 10)]
+    )
+    reader = Reader(data)
+
+    members = list(iter_members(reader, len(data)))
+
+    assert members == [
+        ZipMember(
+            name="OPN2101A.bdbx",
+            sizeBytes="100000",
+            compressedSizeBytes=str(
+                zipfile.ZipFile(io.BytesIO(data)).getinfo("OPN2101A.bdbx").compress_size
+            ),
+            crc32=f"{zlib.crc32(b'a' * 100000):08x}",
+        ),
+        ZipMember(
+            name="données/OPN2101A.bmix",
+            sizeBytes="10",
+            compressedSizeBytes=members[1].compressedSizeBytes,
+            crc32=f"{zlib.crc32(b'b' * 10):08x}",
+        ),
+    ]
+    assert all(start >= len(data) - TAIL_BYTES for start, _ in reader.reads)
+    assert reader.bytes_read() < 2048
+
+
+def test_iter_members_streams_large_central_directories():
+    data = build_zip([(f"member_{n:04}.txt", b"x") for n in range(200)])
+    reader = Reader(data)
+
+    members = iter_members(reader, len(data), chunk_size=256)
+    assert next(members).name == "member_0000.txt"
+    assert len(reader.reads) == 2
+
+    assert len(list(members)) == 199
+    assert max(end - start for start, end in reader.reads[1:]) <= 256
+
+
+def test_iter_members_finds_record_behind_a_long_comment():
+    data = build_zip([("OPN2101A.bdbx", b"a")], comment=b"c" * 5000)
+
+    members = list(iter_members(Reader(data), len(data)))
+
+    assert [member.name for member in members] == ["OPN2101A.bdbx"]
+
+
+def test_iter_members_enforces_directory_limit():
+    data = build_zip([(f"member_{n:04}.txt", b"x") for n in range(10)])
+
+    with pytest.raises(InvalidArchive, match="exceeds the 100 byte limit"):
+        list(iter_members(Reader(data), len(data), max_directory_bytes=100))
+
+
+@pytest.mark.parametrize("data", [b"", b"not a zip file" * 10])
+def test_iter_members_rejects_non_zip_objects(data):
+    with pytest.raises(InvalidArchive, match="end of central directory"):
+        list(iter_members(Reader(data), len(data)))
+
+
+def test_iter_members_reads_zip64_records():
+    name = b"OPN2101A.bdbx"
+    size, compressed_size = 5 * 2**32, 2**32 + 7
+    extra = struct.pack("<2H2Q", 0x0001, 16, size, compressed_size)
+    header = CENTRAL_HEADER.pack(
+        b"PK\x01\x02",
+        45,
+        45,
+        0,
+        8,
+        0,
+        0,
+        0x1234ABCD,
+        0xFFFFFFFF,
+        0xFFFFFFFF,
+        len(name),
+        len(extra),
+        0,
+        0,
+        0,
+        0,
+        0,
+    )
+    directory = header + name + extra
+    local_data = b"\0" * 64
+    zip64_offset = len(local_data) + len(directory)
+    zip64_eocd = ZIP64_EOCD.pack(
+        b"PK\x06\x06", 44, 45, 45, 0, 0, 1, 1, len(directory), len(local_data)
+    )
+    locator = ZIP64_LOCATOR.pack(b"PK\x06\x07", 0, zip64_offset, 1)
+    eocd = EOCD.pack(b"PK\x05\x06", 0, 0, 0xFFFF, 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF, 0)
+    data = local_data + directory + zip64_eocd + locator + eocd
+
+    assert list(iter_members(Reader(data), len(data))) == [
+        ZipMember(
+            name="OPN2101A.bdbx",
+            sizeBytes=str(size),
+            compressedSizeBytes=str(compressed_size),
+            crc32="1234abcd",
+        )
+    ]
@@ -1,3 +1,5 @@
+import dataclasses
+import json
 import os
 from unittest import mock
 
@@ -5,7 +7,8 @@ import blaise_dds
 import pytest
 
 from main import publishMsg
-from models.config import Config
+from models.config import Config, get_config, is_installed, reload_config
+from utils import InvalidConfig
 
 
 def test_config():
@@ -48,16 +51,281 @@ def test_config_from_env():
         ("LMS2102R"),
     ],
 )
-def test_project_id_not_set(_mock_update_state, dd_event, capsys, instrument):
+def test_project_id_not_set(mock_update_state, dd_event, capsys, instrument):
     dd_event = dd_event(instrument)
     publishMsg(dd_event, None)
     captured = capsys.readouterr()
-    assert captured.out == (
-        "Configuration: Project ID: None\n"
-        + "Configuration: Topic Name: nifi-notify\n"
-        + "Configuration: ON-PREM-SUBFOLDER: None\n"
-        + "Configuration: Env: None\n"
-        + f"Configuration: File name: dd_{instrument}_0103202021_16428.zip\n"
-        + "Configuration: Bucket Name: ons-blaise-v2-nifi\n"
-        + "project_id not set, publish failed\n"
+    assert [json.loads(line) for line in captured.out.splitlines()] == [
+        {
+            "severity": "INFO",
+            "message": "Configuration",
+            "project_id": None,
+            "topic_name": "nifi-notify",
+            "on_prem_subfolder": None,
+            "env": None,
+        },
+        {"severity": "ERROR", "message": "project_id not set, publish failed"},
+    ]
+    assert mock_update_state.call_count == 0
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "PUBLISH_MAX_MESSAGES": "500",
+        "PUBLISH_MAX_BYTES": "2000000",
+        "PUBLISH_MAX_LATENCY": "0.5",
+        "PUBLISH_FLOW_CONTROL_MAX_MESSAGES": "5000",
+        "PUBLISH_FLOW_CONTROL_MAX_BYTES": "50000000",
+        "PUBLISH_TIMEOUT": "10",
+    },
+)
+def test_config_from_env_publish_settings():
+    config = Config.from_env()
+    assert config.publish_max_messages == 500
+    assert config.publish_max_bytes == 2000000
+    assert config.publish_max_latency == 0.5
+    assert config.publish_flow_control_max_messages == 5000
+    assert config.publish_flow_control_max_bytes == 50000000
+    assert config.publish_timeout == 10.0
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "DEDUP_ENABLED": "true",
+        "DEDUP_CACHE_SIZE": "50",
+        "DEDUP_TTL": "60",
+        "DEDUP_STORE": "sqlite:dedup.db",
+        "AGGREGATE_ENABLED": "true",
+        "AGGREGATE_IN_FUNCTION": "true",
+        "AGGREGATE_WINDOW": "0.5",
+        "AGGREGATE_MAX_FILES": "20",
+        "AGGREGATE_MAX_BYTES": "1000",
+    },
+)
+def test_config_from_env_dedup_and_aggregate_settings():
+    config = Config.from_env()
+    assert config.dedup_enabled is True
+    assert config.dedup_cache_size == 50
+    assert config.dedup_ttl == 60.0
+    assert config.dedup_store == "sqlite:dedup.db"
+    assert config.aggregate_enabled is True
+    assert config.aggregate_in_function is True
+    assert config.aggregate_window == 0.5
+    assert config.aggregate_max_files == 20
+    assert config.aggregate_max_bytes == 1000
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "PUBLISH_RETRY_ATTEMPTS": "6",
+        "PUBLISH_RETRY_INITIAL": "0.5",
+        "PUBLISH_RETRY_MAXIMUM": "8",
+        "PUBLISH_RETRY_DEADLINE": "45",
+        "SPOOL": "sqlite:spool.db",
+        "SPOOL_DRAIN_LIMIT": "50",
+        "SPOOL_DRAIN_INTERVAL": "10",
+    },
+)
+def test_config_from_env_retry_and_spool_settings():
+    config = Config.from_env()
+    assert config.publish_retry_attempts == 6
+    assert config.publish_retry_initial == 0.5
+    assert config.publish_retry_maximum == 8.0
+    assert config.publish_retry_deadline == 45.0
+    assert config.spool == "sqlite:spool.db"
+    assert config.spool_drain_limit == 50
+    assert config.spool_drain_interval == 10.0
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "DDS_TIMEOUT": "0.5",
+        "DDS_BREAKER_THRESHOLD": "3",
+        "DDS_BREAKER_RESET": "10",
+        "DDS_REPLAY_LIMIT": "100",
+    },
+)
+def test_config_from_env_dds_breaker_settings():
+    config = Config.from_env()
+    assert config.dds_timeout == 0.5
+    assert config.dds_breaker_threshold == 3
+    assert config.dds_breaker_reset == 10.0
+    assert config.dds_replay_limit == 100
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "SUBSCRIPTION": "gcs-events",
+        "WORKER_CONCURRENCY": "16",
+        "WORKER_MAX_MESSAGES": "32",
+        "WORKER_MAX_BYTES": "1000",
+        "WORKER_SHUTDOWN_TIMEOUT": "5",
+        "ASYNC_CONCURRENCY": "128",
+    },
+)
+def test_config_from_env_worker_and_async_settings():
+    config = Config.from_env()
+    assert config.subscription == "gcs-events"
+    assert config.worker_concurrency == 16
+    assert config.worker_max_messages == 32
+    assert config.worker_max_bytes == 1000
+    assert config.worker_shutdown_timeout == 5.0
+    assert config.async_concurrency == 128
+
+
+@mock.patch.dict(os.environ, {"METRICS_EXPORTER": "otel", "METRICS_PORT": "9100"})
+def test_config_from_env_metrics_settings():
+    config = Config.from_env()
+    assert config.metrics_exporter == "otel"
+    assert config.metrics_port == 9100
+
+
+@mock.patch.dict(os.environ, {"ORDERING_ENABLED": "true"})
+def test_config_from_env_ordering_enabled():
+    assert Config.from_env().ordering_enabled
+
+
+@mock.patch.dict(os.environ, {"IGNORE_PATTERNS": "*.tmp, archive/*,,"})
+def test_config_from_env_ignore_patterns():
+    assert Config.from_env().ignore_patterns == ("*.tmp", "archive/*")
+
+
+@mock.patch.dict(os.environ, {"PUBLISH_TIMEOUT": "soon"})
+def test_config_from_env_invalid_number():
+    with pytest.raises(InvalidConfig, match="invalid configuration value"):
+        Config.from_env()
+
+
+def test_config_publish_settings_defaults():
+    config = Config(
+        on_prem_subfolder="OPN", project_id="foobar", topic_name="barfoo", env="test"
     )
+    assert config.publish_max_messages == 100
+    assert config.publish_max_bytes == 1000000
+    assert config.publish_max_latency == 0.01
+    assert config.publish_timeout == 30.0
+
+
+def test_config_is_frozen(config):
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        config.project_id = "foobar"
+
+
+def test_config_validate(config):
+    assert config.validate() is config
+
+
+@pytest.mark.parametrize(
+    "changes, expected",
+    [
+        ({"project_id": None}, "project_id not set"),
+        (
+            {"project_id": None, "topic_name": ""},
+            "project_id not set, topic_name not set",
+        ),
+        ({"batch_size": 0}, "batch_size must be greater than 0"),
+        ({"publish_timeout": -1.0}, "publish_timeout must be greater than 0"),
+        (
+            {"dedup_store": "redis:dedup"},
+            "dedup_store must start with sqlite: or firestore:",
+        ),
+        ({"spool": "spool.jsonl"}, "spool must start with file:, sqlite: or gcs:"),
+    ],
+)
+def test_config_validate_invalid(config, changes, expected):
+    with pytest.raises(InvalidConfig) as error:
+        dataclasses.replace(config, **changes).validate()
+    assert str(error.value) == expected
+
+
+@pytest.mark.parametrize(
+    "changes, expected",
+    [
+        (
+            {"spool": "gcs:spool-bucket"},
+            "spool needs google-cloud-storage, install the gcs extra",
+        ),
+        (
+            {"verify_enabled": True},
+            "reading objects from GCS needs google-cloud-storage, "
+            "install the gcs extra",
+        ),
+        (
+            {"dedup_store": "firestore:dedup"},
+            "dedup_store needs google-cloud-firestore, install the firestore extra",
+        ),
+        (
+            {"metrics_exporter": "otel"},
+            "metrics_exporter needs opentelemetry-api, install the otel extra",
+        ),
+    ],
+)
+def test_config_validate_missing_backend_package(config, changes, expected):
+    with mock.patch("models.config.is_installed", return_value=False):
+        with pytest.raises(InvalidConfig) as error:
+            dataclasses.replace(config, **changes).validate()
+    assert str(error.value) == expected
+
+
+def test_config_validate_local_storage_needs_no_backend_package(config, tmp_path):
+    config = dataclasses.replace(
+        config,
+        verify_enabled=True,
+        zip_listing_enabled=True,
+        storage_root=str(tmp_path),
+    )
+    with mock.patch("models.config.is_installed", return_value=False):
+        assert config.validate() is config
+
+
+def test_is_installed():
+    assert is_installed("json")
+    assert not is_installed("google.cloud.not_a_module")
+    assert not is_installed("not_a_package.module")
+
+
+@mock.patch.dict(
+    os.environ,
+    {"PROJECT_ID": "test_project_id", "TOPIC_NAME": "nifi-notify"},
+)
+def test_get_config_is_loaded_once(capsys):
+    config = get_config()
+    os.environ["PROJECT_ID"] = "another_project_id"
+
+    assert get_config() is config
+    assert capsys.readouterr().out.count('"message": "Configuration"') == 1
+    assert reload_config().project_id == "another_project_id"
+
+
+@mock.patch.dict(
+    os.environ,
+    {"PROJECT_ID": "test_project_id", "TOPIC_NAME": "nifi-notify"},
+)
+@mock.patch("models.config.metrics")
+def test_get_config_configures_metrics(mock_metrics):
+    config = get_config()
+
+    mock_metrics.configure.assert_called_once_with(config)
+
+
+@mock.patch.dict(os.environ, {"TOPIC_NAME": "nifi-notify"})
+def test_get_config_invalid():
+    with pytest.raises(InvalidConfig, match="project_id not set"):
+        get_config()
+
+
+@mock.patch.dict(os.environ, {"TOPIC_NAME": "nifi-notify"})
+def test_get_config_invalid_is_not_read_again(capsys):
+    with pytest.raises(InvalidConfig):
+        get_config()
+    os.environ["PROJECT_ID"] = "test_project_id"
+
+    with pytest.raises(InvalidConfig, match="project_id not set"):
+        get_config()
+    assert capsys.readouterr().out.count('"message": "Configuration"') == 1
+    assert reload_config().project_id == "test_project_id"
@@ -0,0 +1,66 @@
+import pytest
+
+from models.event import Event, event_problems, parse_event
+from utils import InvalidEvent, md5hash_to_md5sum
+
+
+def test_parse_event(dd_event, md5hash):
+    event = dd_event("OPN2101A")
+
+    parsed = parse_event(event)
+
+    assert parsed == Event(
+        name="dd_OPN2101A_0103202021_16428.zip",
+        bucket="ons-blaise-v2-nifi",
+        size=20,
+        md5_hash=md5hash,
+        md5sum=md5hash_to_md5sum(md5hash),
+        time_created="0103202021_16428",
+    )
+    assert parsed.parsed().instrument_name == "OPN2101A"
+    assert parse_event(parsed) is parsed
+
+
+def test_parse_event_ignores_other_keys(dd_event):
+    event = {**dd_event("OPN2101A"), "generation": "1", "contentType": "zip"}
+
+    assert parse_event(event).size == 20
+
+
+@pytest.mark.parametrize(
+    "change, problems",
+    [
+        ({"name": None}, ["name is missing"]),
+        ({"bucket": ""}, ["bucket is empty"]),
+        ({"size": 20}, ["size is a int, not a string"]),
+        ({"size": "-20"}, ["size '-20' is not a whole number"]),
+        ({"size": "²"}, ["size '²' is not a whole number"]),
+        ({"md5Hash": "abcde"}, ["md5Hash 'abcde' is not base64"]),
+        ({"md5Hash": "é"}, ["md5Hash 'é' is not base64"]),
+        (
+            {"name": 1, "size": "1.5", "timeCreated": ""},
+            [
+                "name is a int, not a string",
+                "timeCreated is empty",
+                "size '1.5' is not a whole number",
+            ],
+        ),
+    ],
+)
+def test_parse_event_reports_every_problem(dd_event, change, problems):
+    event = {**dd_event("OPN2101A"), **change}
+
+    with pytest.raises(InvalidEvent) as error:
+        parse_event(event)
+
+    assert error.value.problems == problems
+    assert str(error.value) == f"event is invalid: {'; '.join(problems)}"
+
+
+def test_parse_event_rejects_events_that_are_not_objects():
+    with pytest.raises(InvalidEvent, match="event is a list, not an object"):
+        parse_event(["dd_OPN2101A.zip"])
+
+
+def test_event_problems_of_a_valid_event(dd_event):
+    assert event_problems(dd_event("OPN2101A")) == []
@@ -0,0 +1,62 @@
+import dataclasses
+
+import pytest
+
+from models.filename import parse_name
+from utils import InvalidFileName
+
+
+def test_parse_name():
+    parsed = parse_name("dd_LMS2102_BK1_0103202021_16428.zip:ons-blaise-v2-nifi")
+
+    assert parsed.filename == "dd_LMS2102_BK1_0103202021_16428.zip"
+    assert parsed.bucket == "ons-blaise-v2-nifi"
+    assert parsed.type == "dd"
+    assert parsed.survey_tla() == "LMS"
+    assert parsed.instrument_name == "LMS2102_BK1"
+    assert parsed.extension == ".zip"
+    assert parsed.timestamp == ("0103202021", "16428")
+
+
+@pytest.mark.parametrize(
+    "name, extension, instrument_name",
+    [
+        ("dd_opn2101a.zip", ".zip", "OPN2101A"),
+        ("dd_opn2101a", "", "OPN2101A"),
+        ("dd_opn2101a.", "", "OPN2101A."),
+        ("dd_opn2101a.tar.gz", ".gz", "OPN2101A.TAR"),
+        ("nested/mi_opn2101a.zip", ".zip", "OPN2101A"),
+    ],
+)
+def test_parse_name_extension_and_instrument_name(name, extension, instrument_name):
+    parsed = parse_name(name)
+
+    assert parsed.extension == extension
+    assert parsed.instrument_name == instrument_name
+    assert parsed.bucket is None
+
+
+def test_parse_name_is_cached():
+    name = "mi_OPN2101A_0103202021_16428.zip:ons-blaise-v2-nifi"
+    assert parse_name(name) is parse_name(name)
+
+
+def test_parsed_name_is_immutable():
+    parsed = parse_name("dd_opn2101a.zip:my-bucket-name")
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        parsed.type = "mi"
+
+
+@pytest.mark.parametrize("name", ["", ":my-bucket-name", "folder/:my-bucket-name"])
+def test_parse_name_invalid(name):
+    with pytest.raises(InvalidFileName, match="is invalid, expected"):
+        parse_name(name)
+
+
+def test_parse_name_without_survey():
+    parsed = parse_name("notMI.zip:my-bucket-name")
+
+    assert parsed.type == "notMI.zip"
+    with pytest.raises(InvalidFileName, match="has no survey after the file type"):
+        parsed.survey_tla()
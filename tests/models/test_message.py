@@ -1,4 +1,7 @@
+import dataclasses
 import json
+import zipfile
+import zlib
 from dataclasses import asdict
 from unittest import mock
 
@@ -6,7 +9,7 @@ import pytest
 from google.cloud.pubsub_v1 import PublisherClient
 
 from models.message import File, create_message, send_pub_sub_message
-from utils import InvalidFileExtension, InvalidFileType
+from utils import InvalidEvent, InvalidFileExtension, InvalidFileType
 
 
 def test_file_extension(file):
@@ -221,6 +224,20 @@ def test_create_message_with_an_invalid_file_type(spicy_file_types, event, confi
         create_message(event, config)
 
 
+def test_create_message_with_a_malformed_event(dd_event, config):
+    dd_event = dd_event("OPN2101A")
+    del dd_event["size"]
+    dd_event["md5Hash"] = "not base64"
+
+    with pytest.raises(InvalidEvent) as error:
+        create_message(dd_event, config)
+
+    assert error.value.problems == [
+        "size is missing",
+        "md5Hash 'not base64' is not base64",
+    ]
+
+
 @mock.patch.object(PublisherClient, "publish")
 def test_send_pub_sub_message(mock_pubsub, config, message):
     send_pub_sub_message(config, message)
@@ -232,3 +249,63 @@ def test_send_pub_sub_message(mock_pubsub, config, message):
     )
     pubsub_message = mock_pubsub.call_args_list[0][1]["data"]
     assert json.loads(pubsub_message) == asdict(message)
+
+
+@mock.patch.object(PublisherClient, "publish")
+def test_send_pub_sub_message_waits_for_the_publish_result(
+    mock_pubsub, config, message
+):
+    mock_pubsub.return_value.result.return_value = "message-id-1"
+    result = send_pub_sub_message(config, message)
+
+    mock_pubsub.return_value.result.assert_called_once_with(
+        timeout=config.publish_timeout
+    )
+    assert result.message_id == "message-id-1"
+    assert result.ack_latency_ms >= 0
+
+
+@mock.patch.object(PublisherClient, "publish")
+def test_send_pub_sub_message_raises_when_publish_is_not_confirmed(
+    mock_pubsub, config, message
+):
+    mock_pubsub.return_value.result.side_effect = TimeoutError("publish timed out")
+
+    with pytest.raises(TimeoutError):
+        send_pub_sub_message(config, message)
+
+
+def test_create_message_lists_zip_members(config, dd_event, tmp_path):
+    event = dd_event("OPN2101A")
+    bucket = tmp_path / event["bucket"]
+    bucket.mkdir()
+    with zipfile.ZipFile(bucket / event["name"], "w") as archive:
+        archive.writestr("OPN2101A.bdbx", b"data")
+    event["size"] = str((bucket / event["name"]).stat().st_size)
+    config = dataclasses.replace(
+        config, zip_listing_enabled=True, storage_root=str(tmp_path)
+    )
+
+    manifest = json.loads(create_message(event, config).json())
+
+    assert manifest["files"][0]["members"] == [
+        {
+            "name": "OPN2101A.bdbx",
+            "sizeBytes": "4",
+            "compressedSizeBytes": "4",
+            "crc32": f"{zlib.crc32(b'data'):08x}",
+        }
+    ]
+
+
+def test_create_message_without_zip_members_when_listing_fails(
+    config, dd_event, tmp_path, capsys
+):
+    config = dataclasses.replace(
+        config, zip_listing_enabled=True, storage_root=str(tmp_path)
+    )
+
+    manifest = json.loads(create_message(dd_event("OPN2101A"), config).json())
+
+    assert "members" not in manifest["files"][0]
+    assert "failed to list zip members" in capsys.readouterr().out
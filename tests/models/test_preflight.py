@@ -0,0 +1,114 @@
+import dataclasses
+import json
+
+import pytest
+
+from models.filename import parse_name
+from models.preflight import ignore_pattern, preflight
+from models.routing import reset_router
+from utils import EventRejected
+
+
+def test_preflight_returns_the_typed_event(config, dd_event):
+    event = dd_event("OPN2101A")
+
+    accepted = preflight(event, config)
+
+    assert accepted.name == event["name"]
+    assert accepted.size == 20
+    assert accepted.parsed() is parse_name(f"{event['name']}:{event['bucket']}")
+    assert accepted.parsed().instrument_name == "OPN2101A"
+
+
+@pytest.mark.parametrize(
+    "change, reason",
+    [
+        ({"name": None}, "malformed"),
+        ({"bucket": ""}, "malformed"),
+        ({"size": 20}, "malformed"),
+        ({"size": "-1"}, "malformed"),
+        ({"md5Hash": None}, "malformed"),
+        ({"name": "dd_OPN2101A.txt"}, "unsupported_extension"),
+        ({"name": "xx_OPN2101A.zip"}, "unsupported_type"),
+        ({"name": "OPN2101A.zip"}, "unsupported_type"),
+        ({"name": "archive/"}, "invalid_name"),
+    ],
+)
+def test_preflight_rejects(config, dd_event, change, reason):
+    event = {**dd_event("OPN2101A"), **change}
+
+    with pytest.raises(EventRejected) as error:
+        preflight(event, config)
+
+    assert error.value.reason == reason
+
+
+def test_preflight_takes_the_supported_types_from_the_routes(
+    config, dd_event, tmp_path, monkeypatch
+):
+    routes_file = tmp_path / "routes.json"
+    routes_file.write_text(
+        json.dumps(
+            {
+                "routes": [
+                    {
+                        "name": "management_information",
+                        "type": "mi",
+                        "tla_prefix": "",
+                        "dataset": "blaise_mi",
+                        "description": "Management Information files",
+                    }
+                ]
+            }
+        )
+    )
+    monkeypatch.setenv("ROUTES_FILE", str(routes_file))
+    reset_router()
+    try:
+        with pytest.raises(EventRejected) as error:
+            preflight(dd_event("OPN2101A"), config)
+    finally:
+        reset_router()
+
+    assert error.value.reason == "unsupported_type"
+    assert str(error.value) == "File type 'dd' is invalid, supported types: ['mi']"
+
+
+def test_preflight_reports_every_problem_with_a_malformed_event(config, dd_event):
+    event = {**dd_event("OPN2101A"), "size": "big", "md5Hash": "a"}
+    del event["bucket"]
+
+    with pytest.raises(EventRejected) as error:
+        preflight(event, config)
+
+    assert error.value.reason == "malformed"
+    assert str(error.value) == (
+        "event is invalid: bucket is missing; size 'big' is not a whole number; "
+        "md5Hash 'a' is not base64"
+    )
+
+
+def test_preflight_rejects_events_that_are_not_objects(config):
+    with pytest.raises(EventRejected, match="not an object") as error:
+        preflight(["dd_OPN2101A.zip"], config)
+
+    assert error.value.reason == "malformed"
+
+
+def test_preflight_rejects_ignored_names_before_parsing(config, event):
+    config = dataclasses.replace(
+        config, ignore_patterns=("*.tmp.zip", "archive/*", "xx_*")
+    )
+
+    for name in ["upload.tmp", "archive/dd_OPN2101A", "xx_OPN2101A"]:
+        with pytest.raises(EventRejected) as error:
+            preflight(event(name), config)
+        assert error.value.reason == "ignored"
+    assert preflight(event("dd_OPN2101A"), config).parsed().type == "dd"
+
+
+def test_ignore_pattern():
+    assert ignore_pattern(()) is None
+    assert ignore_pattern(("*.tmp",)) is ignore_pattern(("*.tmp",))
+    assert ignore_pattern(("*.tmp", "dd_LMS*")).match("dd_LMS2101A.zip")
+    assert not ignore_pattern(("*.tmp",)).match("dd_LMS2101A.zip")
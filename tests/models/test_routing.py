@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+from models.config import Config
+from models.filename import parse_name
+from models.message import create_message
+from models.routing import Route, Router, compile_template, get_router
+from utils import InvalidFileType
+
+GOLDEN_MANIFESTS = os.path.join(os.path.dirname(__file__), "golden_manifests.json")
+
+CONFIGS = {
+    "test": Config(
+        on_prem_subfolder="survey_on_prem_subfolder",
+        project_id="survey_project_id",
+        topic_name="topic_name",
+        env="test",
+    ),
+    "unset": Config(on_prem_subfolder=None, project_id=None, topic_name=None, env=None),
+}
+
+
+def golden_manifests():
+    with open(GOLDEN_MANIFESTS, encoding="utf-8") as golden:
+        return [
+            pytest.param(case, id=f"{case['config']}-{case['event']['name']}")
+            for case in json.load(golden)
+        ]
+
+
+@pytest.mark.parametrize("case", golden_manifests())
+def test_create_message_matches_golden_manifest(case):
+    message = create_message(case["event"], CONFIGS[case["config"]])
+    assert message.json() == json.dumps(case["manifest"])
+
+
+@pytest.mark.parametrize(
+    "name, expected_route",
+    [
+        ("mi_opn2101a.zip", "management_information"),
+        ("mi_lms2101a.zip", "management_information"),
+        ("dd_lms2101a.zip", "data_delivery_lms"),
+        ("dd_lmc2101a.zip", "data_delivery_lms"),
+        ("dd_frs2101a.zip", "data_delivery_frs"),
+        ("dd_opn2101a.zip", "data_delivery_default"),
+        ("dd_fr2101a.zip", "data_delivery_default"),
+    ],
+)
+def test_router_route(name, expected_route):
+    assert get_router().route(parse_name(name)).name == expected_route
+
+
+def test_router_invalid_file_type():
+    with pytest.raises(InvalidFileType):
+        get_router().route(parse_name("xx_opn2101a.zip"))
+
+
+def test_router_instrument_pattern():
+    router = Router(
+        Route.from_dict(route)
+        for route in [
+            {
+                "name": "opn_pilot",
+                "type": "dd",
+                "tla_prefix": "OPN",
+                "instrument_pattern": r"OPN\d{4}P",
+                "dataset": "blaise_dde_pilot",
+                "description": "Pilot files for {survey_tla}",
+            },
+            {
+                "name": "opn",
+                "type": "dd",
+                "tla_prefix": "OPN",
+                "dataset": "blaise_dde",
+                "description": "Files for {survey_tla}",
+            },
+        ]
+    )
+
+    assert router.route(parse_name("dd_opn2101p.zip")).name == "opn_pilot"
+    assert router.route(parse_name("dd_opn2101a.zip")).name == "opn"
+    with pytest.raises(InvalidFileType, match="No route"):
+        router.route(parse_name("dd_lms2101a.zip"))
+
+
+@pytest.mark.parametrize(
+    "template, expected",
+    [
+        ("CLOUD", "CLOUD"),
+        ("{env}", None),
+        ("BL5-{env}", "BL5-None"),
+        ("{survey_tla} files", "OPN files"),
+    ],
+)
+def test_compile_template(template, expected):
+    fields = {"env": None, "survey_tla": "OPN"}
+    assert compile_template(template)(fields) == expected
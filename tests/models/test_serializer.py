@@ -0,0 +1,50 @@
+import json
+from dataclasses import asdict
+
+import pytest
+
+from models.message import File, Message, create_message
+from models.serializer import serialize
+
+
+def legacy_serialize(message):
+    return bytes(json.dumps(asdict(message)), encoding="utf-8")
+
+
+def test_serialize_matches_json_dumps(message):
+    assert serialize(message) == legacy_serialize(message)
+
+
+@pytest.mark.parametrize("instrument", ["OPN2102R", "LMS2102_BK1", "FRS2411A"])
+def test_serialize_created_message_matches_json_dumps(dd_event, config, instrument):
+    message = create_message(dd_event(instrument), config)
+    assert serialize(message) == legacy_serialize(message)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [None, "", 'quote " and back\\slash', "tab\tnew\nline", "café ☃", "\x7f"],
+)
+def test_serialize_escapes_like_json_dumps(value):
+    message = Message(
+        files=[File(name=value, sizeBytes="20", md5sum="md5"), File("b", 3, None)],
+        sourceName=value,
+        manifestCreated=value,
+        fullSizeMegabytes="0.000020",
+        iterationL2=value,
+    )
+    assert serialize(message) == legacy_serialize(message)
+
+
+def test_serialize_caches_constants_by_type():
+    message = Message(
+        files=[], sourceName="gcp_blaise_test", manifestCreated="", fullSizeMegabytes=""
+    )
+    message.version = 1
+    serialize(message)
+    message.version = True
+    assert serialize(message) == legacy_serialize(message)
+
+
+def test_message_json(message):
+    assert message.json() == json.dumps(asdict(message))
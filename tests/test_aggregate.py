@@ -0,0 +1,249 @@
+import dataclasses
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+import blaise_dds
+import pytest
+from google.api_core import exceptions
+from google.cloud.pubsub_v1 import PublisherClient
+
+import aggregate
+from aggregate import Aggregator, aggregation_key, group_messages, merge_messages
+from batch import publish_batch
+from main import publishMsg
+from models.message import create_message
+
+
+@pytest.fixture
+def upload(dd_event, config):
+    def wrapper(instrument, sequence, size="20"):
+        event = dict(dd_event(instrument), size=size)
+        event["name"] = event["name"].replace(".zip", f"_{sequence}.zip")
+        return create_message(event, config)
+
+    return wrapper
+
+
+def test_aggregation_key(upload):
+    assert aggregation_key(upload("LMS2102_BK1", 1)) == ("dd", "LMS", "LMS2102_BK1")
+
+
+def test_merge_messages_lists_all_files_with_summed_size(upload):
+    messages = [upload("OPN2101A", 1, "1500000"), upload("OPN2101A", 2, "2500000")]
+
+    manifest = merge_messages(messages)
+
+    assert [file.name for file in manifest.files] == [
+        messages[0].files[0].name,
+        messages[1].files[0].name,
+    ]
+    assert manifest.fullSizeMegabytes == "4.000000"
+    assert manifest.dataset == messages[0].dataset
+    assert messages[0].files == [messages[0].first_file()]
+
+
+def test_group_messages_by_key_with_caps(upload):
+    items = [
+        ("a1", upload("OPN2101A", 1)),
+        ("b1", upload("OPN2102R", 1)),
+        ("a2", upload("OPN2101A", 2)),
+        ("a3", upload("OPN2101A", 3)),
+        ("b2", upload("OPN2102R", 2, "1000")),
+    ]
+
+    groups = group_messages(items, max_files=2, max_bytes=100)
+
+    assert [[tag for tag, _ in group] for group in groups] == [
+        ["a1", "a2"],
+        ["b1"],
+        ["a3"],
+        ["b2"],
+    ]
+
+
+def test_aggregator_publishes_when_count_cap_is_reached(upload):
+    publish = mock.Mock(return_value="result")
+    aggregator = Aggregator(publish, window=60, max_files=2)
+    try:
+        first = aggregator.add(upload("OPN2101A", 1))
+        assert not first.done()
+        second = aggregator.add(upload("OPN2101A", 2))
+
+        assert first.result(timeout=1) == second.result(timeout=1) == "result"
+        assert len(publish.call_args[0][0].files) == 2
+    finally:
+        aggregator.shutdown()
+
+
+def test_aggregator_splits_groups_at_size_cap(upload):
+    publish = mock.Mock(return_value="result")
+    aggregator = Aggregator(publish, window=60, max_bytes=30)
+    try:
+        first = aggregator.add(upload("OPN2101A", 1))
+        aggregator.add(upload("OPN2101A", 2))
+        assert first.result(timeout=1) == "result"
+        assert len(publish.call_args[0][0].files) == 1
+    finally:
+        aggregator.shutdown()
+
+
+def test_aggregator_publishes_when_window_closes(upload):
+    published = threading.Event()
+    publish = mock.Mock(side_effect=lambda _message: published.set())
+    aggregator = Aggregator(publish, window=0.05)
+    try:
+        future = aggregator.add(upload("OPN2101A", 1))
+        aggregator.add(upload("OPN2101A", 2))
+        aggregator.add(upload("OPN2102R", 1))
+
+        future.result(timeout=1)
+        assert published.is_set()
+    finally:
+        aggregator.shutdown()
+    assert sorted(len(call[0][0].files) for call in publish.call_args_list) == [1, 2]
+
+
+def test_aggregator_flushes_on_shutdown(upload):
+    publish = mock.Mock(return_value="result")
+    aggregator = Aggregator(publish, window=60)
+    future = aggregator.add(upload("OPN2101A", 1))
+
+    aggregator.shutdown()
+
+    assert future.result(timeout=0) == "result"
+    with pytest.raises(RuntimeError, match="shut down"):
+        aggregator.add(upload("OPN2101A", 2))
+
+
+def test_aggregator_fails_every_file_of_a_failed_manifest(upload):
+    publish = mock.Mock(side_effect=Exception("unavailable"))
+    aggregator = Aggregator(publish, window=60, max_files=2)
+    try:
+        futures = [aggregator.add(upload("OPN2101A", n)) for n in range(2)]
+        for future in futures:
+            with pytest.raises(Exception, match="unavailable"):
+                future.result(timeout=1)
+    finally:
+        aggregator.shutdown()
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_batch_aggregates_related_uploads(
+    mock_pubsub, mock_update_state, dd_event, mi_event, config
+):
+    mock_pubsub.return_value.result.return_value = "message-id"
+    config = dataclasses.replace(config, aggregate_enabled=True)
+    events = [dd_event("OPN2101A"), mi_event("OPN2101A"), dd_event("OPN2101A")]
+    events[2]["name"] = "dd_OPN2101A_0103202021_16429.zip"
+
+    results = list(publish_batch(events, config))
+
+    assert [result.status for result in results] == ["published"] * 3
+    assert mock_pubsub.call_count == 2
+    manifests = [json.loads(call[1]["data"]) for call in mock_pubsub.call_args_list]
+    assert [len(manifest["files"]) for manifest in manifests] == [2, 1]
+    assert manifests[0]["fullSizeMegabytes"] == "0.000040"
+    assert (
+        sum(call[0][1] == "nifi_notified" for call in mock_update_state.call_args_list)
+        == 3
+    )
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "PROJECT_ID": "test_project_id",
+        "ENV": "test",
+        "TOPIC_NAME": "nifi-notify",
+        "ON-PREM-SUBFOLDER": "DEV",
+        "AGGREGATE_ENABLED": "true",
+        "AGGREGATE_IN_FUNCTION": "true",
+        "AGGREGATE_WINDOW": "0.2",
+    },
+)
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publishMsg_aggregates_concurrent_invocations(
+    mock_pubsub, mock_update_state, dd_event
+):
+    events = [dd_event("OPN2101A") for _ in range(3)]
+    for sequence, event in enumerate(events):
+        event["name"] = f"dd_OPN2101A_0103202021_1642{sequence}.zip"
+    threads = [threading.Thread(target=publishMsg, args=(e, None)) for e in events]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert mock_pubsub.call_count == 1
+    assert len(json.loads(mock_pubsub.call_args[1]["data"])["files"]) == 3
+    assert (
+        sum(call[0][1] == "nifi_notified" for call in mock_update_state.call_args_list)
+        == 3
+    )
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "PROJECT_ID": "test_project_id",
+        "ENV": "test",
+        "TOPIC_NAME": "nifi-notify",
+        "ON-PREM-SUBFOLDER": "DEV",
+        "AGGREGATE_ENABLED": "true",
+        "AGGREGATE_WINDOW": "10",
+    },
+)
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publishMsg_does_not_aggregate_by_default(
+    mock_pubsub, _mock_update_state, dd_event
+):
+    start = time.perf_counter()
+    publishMsg(dd_event("OPN2101A"), None)
+
+    assert time.perf_counter() - start < 5
+    assert mock_pubsub.call_count == 1
+    assert aggregate._aggregator is None
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "PROJECT_ID": "test_project_id",
+        "ENV": "test",
+        "TOPIC_NAME": "nifi-notify",
+        "AGGREGATE_ENABLED": "true",
+        "AGGREGATE_IN_FUNCTION": "true",
+        "AGGREGATE_WINDOW": "0.05",
+        "PUBLISH_TIMEOUT": "0.2",
+        "PUBLISH_RETRY_INITIAL": "0.001",
+    },
+)
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publishMsg_waits_for_aggregated_retries(
+    mock_pubsub, mock_update_state, dd_event
+):
+    # each attempt takes longer than the window and less than the timeout, so
+    # the retried publish ends after the window plus one timeout
+    def slow_result(timeout=None):
+        time.sleep(0.15)
+        if mock_pubsub.call_count == 1:
+            raise exceptions.ServiceUnavailable("unavailable")
+        return "message-id"
+
+    mock_pubsub.return_value.result.side_effect = slow_result
+    event = dd_event("OPN2101A")
+
+    publishMsg(event, None)
+
+    assert mock_pubsub.call_count == 2
+    assert [call[0][1] for call in mock_update_state.call_args_list] == [
+        "in_nifi_bucket",
+        "nifi_notified",
+    ]
@@ -0,0 +1,123 @@
+import asyncio
+import dataclasses
+import json
+import threading
+import time
+from concurrent.futures import Future
+from unittest import mock
+
+import blaise_dds
+import pytest
+from google.api_core import exceptions
+from google.cloud.pubsub_v1 import PublisherClient
+
+import clients
+from aio import bridge_future, publish_events
+from fakes import FakePublisherClient
+
+
+@pytest.fixture
+def aio_config(config):
+    return dataclasses.replace(
+        config, env="test", on_prem_subfolder="DEV", publish_retry_attempts=1
+    )
+
+
+def resolved(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def test_bridge_future_resolves_from_another_thread():
+    async def bridge():
+        future = Future()
+        threading.Timer(0.01, future.set_result, ["message-id"]).start()
+        return await bridge_future(future)
+
+    assert asyncio.run(bridge()) == "message-id"
+
+
+def test_bridge_future_raises_the_future_exception():
+    async def bridge():
+        future = Future()
+        future.set_exception(exceptions.NotFound("topic"))
+        return await bridge_future(future)
+
+    with pytest.raises(exceptions.NotFound):
+        asyncio.run(bridge())
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_events_builds_the_same_manifests_as_publishMsg(
+    mock_pubsub,
+    mock_update_state,
+    aio_config,
+    dd_event,
+    mi_event,
+    expected_pubsub_message_dd_opn,
+    expected_pubsub_message_mi,
+):
+    mock_pubsub.return_value = resolved("message-id")
+    events = [dd_event("OPN2102R"), mi_event("OPN2101A")]
+
+    results = asyncio.run(publish_events(events, aio_config))
+
+    assert [(result.status, result.message_id) for result in results] == [
+        ("published", "message-id"),
+        ("published", "message-id"),
+    ]
+    manifests = [json.loads(call[1]["data"]) for call in mock_pubsub.call_args_list]
+    assert expected_pubsub_message_dd_opn in manifests
+    assert expected_pubsub_message_mi in manifests
+    assert sorted(call[0][:2] for call in mock_update_state.call_args_list) == sorted(
+        (event["name"], state)
+        for event in events
+        for state in ("in_nifi_bucket", "nifi_notified")
+    )
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_events_reports_failures(
+    mock_pubsub, mock_update_state, aio_config, event, dd_event
+):
+    mock_pubsub.return_value = Future()
+    mock_pubsub.return_value.set_exception(exceptions.PermissionDenied("denied"))
+
+    results = asyncio.run(
+        publish_events([event("xx_OPN2101A"), dd_event("OPN2102R")], aio_config)
+    )
+
+    assert [result.status for result in results] == ["rejected", "errored"]
+    assert results[0].reason == "unsupported_type"
+    assert "PermissionDenied" in results[1].error
+    assert (
+        mock.call(dd_event("OPN2102R")["name"], "errored", results[1].error)
+        in mock_update_state.call_args_list
+    )
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+def test_publish_events_overlaps_publishes_up_to_the_concurrency(
+    _mock_update_state, aio_config, dd_event
+):
+    publisher = FakePublisherClient(latency=0.1)
+    clients.set_client_factories(publisher_factory=lambda _config: publisher)
+    events = [dd_event(f"OPN21{month:02}A") for month in range(1, 11)]
+    try:
+        start = time.perf_counter()
+        results = asyncio.run(publish_events(events, aio_config, concurrency=10))
+        concurrent_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asyncio.run(publish_events(events[:4], aio_config, concurrency=2))
+        limited_elapsed = time.perf_counter() - start
+    finally:
+        clients.set_client_factories()
+        publisher.stop()
+
+    assert [result.status for result in results] == ["published"] * 10
+    assert concurrent_elapsed < 0.5
+    assert limited_elapsed >= 0.2
@@ -0,0 +1,211 @@
+import dataclasses
+import datetime
+import json
+import os
+from unittest import mock
+
+import blaise_dds
+import pytest
+from google.api_core import exceptions
+from google.cloud.pubsub_v1 import PublisherClient
+
+import dedup
+from backfill import NotifiedLedger, backfill, main
+from main import publishMsg
+from models.config import get_config
+from storage import GCSStorage, LocalStorage
+
+
+def write_objects(directory, names):
+    for name in names:
+        (directory / name).write_bytes(b"zip")
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_backfill(mock_pubsub, mock_update_state, tmp_path, config):
+    write_objects(
+        tmp_path,
+        [
+            "dd_OPN2102R_0103202021_16428.zip",
+            "mi_OPN2101A_0103202021_16428.zip",
+            "notes.txt",
+        ],
+    )
+
+    stats = backfill(LocalStorage(tmp_path, "ons-blaise-v2-nifi"), config, workers=2)
+
+    assert stats.listed == 3
+    assert stats.published == 2
+    assert stats.unsupported == 1
+    assert stats.failed == 0
+    names = sorted(
+        json.loads(call[1]["data"])["files"][0]["name"]
+        for call in mock_pubsub.call_args_list
+    )
+    assert names == [
+        "dd_OPN2102R_0103202021_16428.zip:ons-blaise-v2-nifi",
+        "mi_OPN2101A_0103202021_16428.zip:ons-blaise-v2-nifi",
+    ]
+    assert (
+        mock.call("dd_OPN2102R_0103202021_16428.zip", "nifi_notified", None)
+        in mock_update_state.call_args_list
+    )
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_backfill_skips_objects_in_ledger(
+    mock_pubsub, _mock_update_state, tmp_path, config
+):
+    objects = tmp_path / "objects"
+    objects.mkdir()
+    write_objects(
+        objects,
+        ["dd_OPN2102R_0103202021_16428.zip", "dd_OPN2103R_0103202021_16428.zip"],
+    )
+    ledger_path = tmp_path / "ledger.txt"
+    ledger_path.write_text("ons-blaise-v2-nifi/dd_OPN2102R_0103202021_16428.zip\n")
+    ledger = NotifiedLedger(str(ledger_path))
+
+    stats = backfill(LocalStorage(objects, "ons-blaise-v2-nifi"), config, ledger=ledger)
+
+    assert stats.skipped == 1
+    assert stats.published == 1
+    assert mock_pubsub.call_count == 1
+    assert ledger_path.read_text().splitlines() == [
+        "ons-blaise-v2-nifi/dd_OPN2102R_0103202021_16428.zip",
+        "ons-blaise-v2-nifi/dd_OPN2103R_0103202021_16428.zip",
+    ]
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_backfill_counts_failed_publishes(
+    mock_pubsub, mock_update_state, tmp_path, config
+):
+    mock_pubsub.side_effect = Exception("publish failed")
+    write_objects(tmp_path, ["dd_OPN2102R_0103202021_16428.zip"])
+
+    stats = backfill(LocalStorage(tmp_path, "ons-blaise-v2-nifi"), config)
+
+    assert stats.failed == 1
+    assert stats.published == 0
+    assert (
+        mock.call(
+            "dd_OPN2102R_0103202021_16428.zip", "errored", "Exception('publish failed')"
+        )
+        in mock_update_state.call_args_list
+    )
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_backfill_counts_invalid_names_as_unsupported(
+    mock_pubsub, _mock_update_state, tmp_path, config
+):
+    write_objects(tmp_path, ["dd_OPN2102R_0103202021_16428.zip", "dd.zip"])
+
+    stats = backfill(
+        LocalStorage(tmp_path, "ons-blaise-v2-nifi"), config, progress_every=0
+    )
+
+    assert stats.listed == 2
+    assert stats.published == 1
+    assert stats.unsupported == 1
+    assert stats.failed == 0
+
+
+def test_backfill_rejects_negative_progress_every(capsys):
+    with pytest.raises(SystemExit):
+        main(["--bucket", "ons-blaise-v2-nifi", "--progress-every", "-1"])
+
+    assert "-1 is negative" in capsys.readouterr().err
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_backfill_counts_ignored_objects_as_unsupported(
+    mock_pubsub, mock_update_state, tmp_path, config
+):
+    config = dataclasses.replace(config, ignore_patterns=("*.tmp.zip",))
+    write_objects(
+        tmp_path,
+        ["dd_OPN2102R_0103202021_16428.zip", "dd_OPN2102R_0103202021_16428.tmp.zip"],
+    )
+
+    stats = backfill(LocalStorage(tmp_path, "ons-blaise-v2-nifi"), config)
+
+    assert stats.published == 1
+    assert stats.unsupported == 1
+    assert mock_pubsub.call_count == 1
+    assert all(
+        call[0][0] == "dd_OPN2102R_0103202021_16428.zip"
+        for call in mock_update_state.call_args_list
+    )
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_backfill_spools_failed_publishes(
+    mock_pubsub, _mock_update_state, tmp_path, config
+):
+    config = dataclasses.replace(
+        config,
+        spool=f"sqlite:{tmp_path}/spool.db",
+        publish_retry_attempts=2,
+        publish_retry_initial=0.001,
+    )
+    failed_future = mock.Mock()
+    failed_future.result.side_effect = exceptions.ServiceUnavailable("unavailable")
+    mock_pubsub.return_value = failed_future
+    objects = tmp_path / "objects"
+    objects.mkdir()
+    write_objects(objects, ["dd_OPN2102R_0103202021_16428.zip"])
+    ledger_path = tmp_path / "ledger.txt"
+
+    stats = backfill(
+        LocalStorage(objects, "ons-blaise-v2-nifi"),
+        config,
+        ledger=NotifiedLedger(str(ledger_path)),
+    )
+
+    assert stats.spooled == 1
+    assert stats.failed == 0
+    assert mock_pubsub.call_count == 2
+    assert not ledger_path.exists()
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_backfill_skips_objects_the_function_already_published(
+    mock_pubsub, _mock_update_state, tmp_path, dd_event
+):
+    event = {**dd_event("OPN2102R"), "generation": "1614616928000000"}
+    blob = mock.Mock(
+        size=int(event["size"]),
+        md5_hash=event["md5Hash"],
+        time_created=datetime.datetime(2021, 3, 1, 16, 42, 8),
+        generation=int(event["generation"]),
+    )
+    blob.name = event["name"]
+    client = mock.Mock()
+    client.list_blobs.return_value = iter([blob])
+    environ = {
+        "PROJECT_ID": "test_project_id",
+        "ENV": "test",
+        "TOPIC_NAME": "nifi-notify",
+        "DEDUP_ENABLED": "true",
+        "DEDUP_STORE": f"sqlite:{tmp_path}/dedup.db",
+    }
+    with mock.patch.dict(os.environ, environ):
+        publishMsg(event, None)
+        config = get_config()
+    # a later run only shares the store, not the instance's memory
+    dedup.shutdown()
+
+    stats = backfill(GCSStorage(event["bucket"], client), config)
+
+    assert stats.skipped == 1
+    assert stats.published == 0
+    assert mock_pubsub.call_count == 1
@@ -0,0 +1,197 @@
+import dataclasses
+import json
+from unittest import mock
+
+import blaise_dds
+from google.cloud.pubsub_v1 import PublisherClient
+
+import clients
+from batch import chunked, publish_batch
+from fakes import FakePublisherClient
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_chunked_consumes_lazily():
+    events = iter(range(10))
+    chunks = chunked(events, 3)
+    assert next(chunks) == [0, 1, 2]
+    assert next(events) == 3
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_batch(mock_pubsub, mock_update_state, dd_event, mi_event, config):
+    mock_pubsub.return_value.result.return_value = "message-id"
+    events = [dd_event("OPN2102R"), mi_event("OPN2101A"), dd_event("LMS2102R")]
+
+    results = list(publish_batch(events, config))
+
+    assert [result.status for result in results] == ["published"] * 3
+    assert [result.message_id for result in results] == ["message-id"] * 3
+    assert mock_pubsub.call_count == 3
+    for event in events:
+        assert [
+            call
+            for call in mock_update_state.call_args_list
+            if call[0][0] == event["name"]
+        ] == [
+            mock.call(event["name"], "in_nifi_bucket", None),
+            mock.call(event["name"], "nifi_notified", None),
+        ]
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_batch_reports_invalid_events(
+    mock_pubsub, mock_update_state, dd_event, event, config
+):
+    mock_pubsub.return_value.result.return_value = "message-id"
+    invalid_event = event("notDD")
+    events = [invalid_event, dd_event("OPN2102R")]
+
+    results = list(publish_batch(events, config))
+
+    assert results[0].status == "rejected"
+    assert results[0].reason == "unsupported_type"
+    assert results[1].status == "published"
+    assert mock_pubsub.call_count == 1
+    assert invalid_event["name"] not in [
+        call.args[0] for call in mock_update_state.call_args_list
+    ]
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_batch_logs_and_counts_rejected_events(
+    _mock_pubsub, _mock_update_state, event, config, enabled_metrics, capsys
+):
+    list(publish_batch([event("notDD")], config))
+
+    assert enabled_metrics.counter_value("rejections_total", reason="unsupported_type")
+    assert enabled_metrics.counter_value(
+        "events_total", outcome="rejected", route="none"
+    )
+    assert '"message": "Event rejected"' in capsys.readouterr().out
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_batch_returns_results_in_the_order_of_the_events(
+    mock_pubsub, _mock_update_state, dd_event, event, config
+):
+    mock_pubsub.return_value.result.return_value = "message-id"
+    events = [dd_event("OPN2101A"), event("notDD"), dd_event("OPN2102A")]
+
+    results = list(publish_batch(events, config))
+
+    assert [result.name for result in results] == [e["name"] for e in events]
+    assert [result.status for result in results] == [
+        "published",
+        "rejected",
+        "published",
+    ]
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_batch_reports_manifests_that_cannot_be_merged(
+    mock_pubsub, _mock_update_state, dd_event, config
+):
+    mock_pubsub.return_value.result.return_value = "message-id"
+    events = [dd_event("OPN2101A"), dd_event("OPN2102A"), dd_event("OPN2103A")]
+
+    merge_calls = iter([ValueError("bad manifest"), None, ValueError("bad manifest")])
+
+    def merge(messages):
+        error = next(merge_calls)
+        if error is not None:
+            raise error
+        return messages[0]
+
+    with mock.patch("batch.merge_messages", side_effect=merge):
+        results = list(publish_batch(events, config))
+
+    assert [result.status for result in results] == [
+        "errored",
+        "published",
+        "errored",
+    ]
+    assert mock_pubsub.call_count == 1
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_batch_reports_unconfirmed_publishes(
+    mock_pubsub, mock_update_state, dd_event, config
+):
+    mock_pubsub.return_value.result.side_effect = Exception("publish failed")
+    batch_event = dd_event("OPN2102R")
+
+    results = list(publish_batch([batch_event], config))
+
+    assert results[0].status == "errored"
+    assert results[0].error == "Exception('publish failed')"
+    assert mock.call(batch_event["name"], "nifi_notified", None) not in (
+        mock_update_state.call_args_list
+    )
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_batch_streams_in_chunks(
+    mock_pubsub, _mock_update_state, dd_event, config
+):
+    config = dataclasses.replace(config, batch_size=2)
+    consumed = []
+
+    def events():
+        for instrument in ["OPN2101A", "OPN2102A", "OPN2103A", "OPN2104A"]:
+            consumed.append(instrument)
+            yield dd_event(instrument)
+
+    results = publish_batch(events(), config)
+    next(results)
+    assert consumed == ["OPN2101A", "OPN2102A"]
+    assert len(list(results)) == 3
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+def test_publish_batch_keeps_the_order_of_each_instrument(
+    _mock_update_state, event, config
+):
+    config = dataclasses.replace(config, ordering_enabled=True)
+    publisher = FakePublisherClient()
+    # the first LMS manifest fails for good, pausing its ordering key
+    publisher.behaviour = mock.Mock(
+        **{"delay.return_value": 0.01, "fails.side_effect": [True] + [False] * 9}
+    )
+    clients.set_client_factories(publisher_factory=lambda _config: publisher)
+    names = [
+        "dd_LMS2101_A_0103202021_1",
+        "dd_OPN2101A_0103202021_1",
+        "dd_LMS2101_A_0103202021_2",
+        "dd_LMS2101_A_0103202021_3",
+    ]
+    try:
+        results = list(publish_batch([event(name) for name in names], config))
+    finally:
+        clients.set_client_factories()
+        publisher.stop()
+
+    assert [result.status for result in results] == [
+        "errored",
+        "published",
+        "published",
+        "published",
+    ]
+    delivered = {
+        key: [json.loads(data)["files"][0]["name"].split(":")[0] for data in values]
+        for key, values in publisher.delivered.items()
+    }
+    assert delivered == {
+        "LMS/LMS2101_A": [f"{names[2]}.zip", f"{names[3]}.zip"],
+        "OPN/OPN2101A": [f"{names[1]}.zip"],
+    }
@@ -0,0 +1,68 @@
+from unittest import mock
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("dds", failure_threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_probes_once_after_the_reset_timeout():
+    clock = mock.Mock(return_value=0)
+    breaker = CircuitBreaker("dds", failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+
+    clock.return_value = 9
+    assert not breaker.allow()
+    clock.return_value = 10
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    assert breaker.record_success() is True
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_reopens_when_the_probe_fails():
+    clock = mock.Mock(return_value=0)
+    breaker = CircuitBreaker("dds", failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.return_value = 10
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.return_value = 19
+    assert not breaker.allow()
+    clock.return_value = 20
+    assert breaker.allow()
+
+
+def test_breaker_records_state_metrics(enabled_metrics):
+    breaker = CircuitBreaker("dds", failure_threshold=1, reset_timeout=0)
+    assert enabled_metrics.gauge_value("breaker_state", breaker="dds") == 0
+
+    breaker.record_failure()
+    assert enabled_metrics.gauge_value("breaker_state", breaker="dds") == 2
+    breaker.allow()
+    assert enabled_metrics.gauge_value("breaker_state", breaker="dds") == 1
+    breaker.record_success()
+    assert enabled_metrics.gauge_value("breaker_state", breaker="dds") == 0
+    for state in (OPEN, HALF_OPEN, CLOSED):
+        assert (
+            enabled_metrics.counter_value(
+                "breaker_transitions_total", breaker="dds", state=state
+            )
+            == 1
+        )
@@ -0,0 +1,203 @@
+import dataclasses
+import json
+import os
+import subprocess
+import sys
+import time
+from unittest import mock
+
+import blaise_dds
+import pytest
+from google.api_core import exceptions
+from google.cloud.pubsub_v1 import PublisherClient
+
+import clients
+from fakes import FakeError, FakePublisherClient
+from models.message import create_message, send_pub_sub_message
+from utils import update_data_delivery_state
+
+
+@mock.patch.object(PublisherClient, "__init__", return_value=None)
+def test_get_publisher_client_is_created_once(mock_init):
+    first = clients.get_publisher_client()
+    second = clients.get_publisher_client()
+    assert first is second
+    assert mock_init.call_count == 1
+
+
+@mock.patch.object(blaise_dds, "Client")
+def test_get_dds_client_is_created_once(mock_client):
+    first = clients.get_dds_client()
+    second = clients.get_dds_client()
+    assert first is second
+    assert mock_client.call_count == 1
+
+
+@mock.patch.object(blaise_dds, "Client")
+def test_reset_dds_client_creates_a_new_client(mock_client):
+    mock_client.side_effect = [mock.Mock(), mock.Mock()]
+    first = clients.get_dds_client()
+    clients.reset_dds_client()
+    assert clients.get_dds_client() is not first
+    assert mock_client.call_count == 2
+
+
+@mock.patch.object(PublisherClient, "publish")
+def test_send_pub_sub_message_reuses_client(mock_pubsub, config, message):
+    send_pub_sub_message(config, message)
+    client = clients.get_publisher_client()
+    send_pub_sub_message(config, message)
+    assert clients.get_publisher_client() is client
+    assert mock_pubsub.call_count == 2
+
+
+@mock.patch.object(PublisherClient, "publish")
+def test_send_pub_sub_message_keeps_client_on_failure(mock_pubsub, config, message):
+    mock_pubsub.side_effect = exceptions.ServiceUnavailable("unavailable")
+    client = clients.get_publisher_client()
+    with pytest.raises(exceptions.ServiceUnavailable):
+        send_pub_sub_message(config, message)
+    assert clients.get_publisher_client() is client
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        exceptions.Unauthenticated("credentials expired"),
+        ValueError("Cannot invoke RPC on closed channel!"),
+    ],
+)
+def test_send_pub_sub_message_replaces_a_broken_client(config, message, error):
+    broken = mock.Mock()
+    broken.publish.return_value.result.side_effect = error
+    replacement = mock.Mock()
+    clients.set_client_factories(
+        publisher_factory=mock.Mock(side_effect=[broken, replacement])
+    )
+    try:
+        with pytest.raises(type(error)):
+            send_pub_sub_message(config, message)
+        broken.stop.assert_called_once()
+        assert clients.get_publisher_client(config) is replacement
+    finally:
+        clients.set_client_factories()
+
+
+def test_reset_publisher_client_keeps_a_client_created_after_the_publish():
+    published_at = time.perf_counter()
+    clients.reset_publisher_client()
+    client = clients.get_publisher_client()
+    clients.reset_publisher_client(published_at)
+    assert clients.get_publisher_client() is client
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+def test_update_data_delivery_state_resets_client_on_failure(
+    mock_update_state, dd_event
+):
+    mock_update_state.side_effect = Exception("session expired")
+    client = clients.get_dds_client()
+    update_data_delivery_state(dd_event("OPN2102R"), "in_nifi_bucket")
+    assert clients.get_dds_client() is not client
+
+
+def test_shutdown_stops_publisher_client():
+    publisher_client = mock.Mock()
+    clients._publisher_client = publisher_client
+    clients.shutdown()
+    publisher_client.stop.assert_called_once()
+    assert clients._publisher_client is None
+
+
+@mock.patch.object(PublisherClient, "__init__", return_value=None)
+def test_get_publisher_client_uses_config_batch_settings(mock_init, config):
+    config = dataclasses.replace(
+        config, publish_max_messages=500, publish_flow_control_max_messages=5000
+    )
+    clients.get_publisher_client(config)
+
+    kwargs = mock_init.call_args[1]
+    assert kwargs["batch_settings"].max_messages == 500
+    assert kwargs["publisher_options"].flow_control.message_limit == 5000
+    assert not kwargs["publisher_options"].enable_message_ordering
+
+
+@mock.patch.object(PublisherClient, "__init__", return_value=None)
+def test_get_publisher_client_enables_message_ordering(mock_init, config):
+    clients.get_publisher_client(dataclasses.replace(config, ordering_enabled=True))
+
+    assert mock_init.call_args[1]["publisher_options"].enable_message_ordering
+
+
+@mock.patch.object(PublisherClient, "publish")
+def test_send_pub_sub_message_sets_the_ordering_key(mock_pubsub, config, dd_event):
+    config = dataclasses.replace(config, ordering_enabled=True)
+    message = create_message(dd_event("LMS2102_BK1"), config)
+
+    send_pub_sub_message(config, message)
+
+    assert mock_pubsub.call_args[1]["ordering_key"] == "LMS/LMS2102_BK1"
+
+
+def test_send_pub_sub_message_resumes_the_ordering_key_on_failure(config, dd_event):
+    config = dataclasses.replace(config, ordering_enabled=True)
+    message = create_message(dd_event("LMS2102_BK1"), config)
+    publisher = FakePublisherClient(error_rate=1.0)
+    clients.set_client_factories(publisher_factory=lambda _config: publisher)
+    try:
+        with pytest.raises(FakeError):
+            send_pub_sub_message(config, message)
+        # the client is kept for other keys, and this key publishes again
+        assert clients.get_publisher_client(config) is publisher
+        publisher.behaviour.error_rate = 0.0
+        assert send_pub_sub_message(config, message).message_id
+    finally:
+        clients.set_client_factories()
+        publisher.stop()
+
+
+HEAVY_MODULES = ("grpc", "google.cloud.pubsub_v1", "google.protobuf")
+
+LOADED_MODULES = """
+import json, sys
+{setup}
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def loaded_modules(setup):
+    environ = dict(
+        os.environ,
+        PROJECT_ID="test_project_id",
+        TOPIC_NAME="nifi-notify",
+        ENV="test",
+        LOG_LEVEL="ERROR",
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", LOADED_MODULES.format(setup=setup)],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=environ,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def heavy(modules):
+    return [
+        name
+        for name in modules
+        if any(name == heavy or name.startswith(f"{heavy}.") for heavy in HEAVY_MODULES)
+    ]
+
+
+def test_importing_the_entry_points_loads_no_clients():
+    modules = loaded_modules("import main, worker")
+    assert heavy(modules) == []
+    assert "blaise_dds" not in modules
+
+
+def test_rejected_events_never_load_grpc(event):
+    setup = f"import main; main.publishMsg({event('xx_OPN2101A')!r}, None)"
+    assert heavy(loaded_modules(setup)) == []
@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+import blaise_dds
+from google.cloud.pubsub_v1 import PublisherClient
+
+import clients
+from breaker import OPEN, CircuitBreaker
+from dds import DeliveryStateUpdater, get_updater
+from fakes import Behaviour, FakeDDSClient
+from main import publishMsg
+
+
+def test_updater_sends_transitions_for_a_file_in_order(dd_event):
+    update = mock.Mock()
+    updater = DeliveryStateUpdater(update=update)
+    event = dd_event("OPN2102R")
+
+    updater.enqueue(event, "in_nifi_bucket")
+    updater.enqueue(event, "nifi_notified")
+    assert updater.flush(timeout=5)
+
+    assert update.call_args_list == [
+        mock.call(event, "in_nifi_bucket", None),
+        mock.call(event, "nifi_notified", None),
+    ]
+
+
+def test_updater_coalesces_identical_unsent_transitions(dd_event):
+    release = threading.Event()
+    update = mock.Mock(side_effect=lambda *_: release.wait(5))
+    updater = DeliveryStateUpdater(update=update)
+    event = dd_event("OPN2102R")
+
+    updater.enqueue(event, "in_nifi_bucket")
+    updater.enqueue(event, "nifi_notified")
+    updater.enqueue(event, "nifi_notified")
+    release.set()
+    assert updater.flush(timeout=5)
+
+    assert updater.coalesced == 1
+    assert update.call_args_list == [
+        mock.call(event, "in_nifi_bucket", None),
+        mock.call(event, "nifi_notified", None),
+    ]
+
+
+def test_updater_sends_different_files_concurrently(dd_event):
+    updater = DeliveryStateUpdater(workers=4, update=lambda *_: time.sleep(0.1))
+
+    start = time.perf_counter()
+    for instrument in ["OPN2101A", "OPN2102A", "OPN2103A", "OPN2104A"]:
+        updater.enqueue(dd_event(instrument), "in_nifi_bucket")
+    assert updater.flush(timeout=5)
+
+    assert time.perf_counter() - start < 0.35
+
+
+def test_updater_flush_times_out(dd_event):
+    release = threading.Event()
+    updater = DeliveryStateUpdater(update=lambda *_: release.wait(5))
+
+    updater.enqueue(dd_event("OPN2102R"), "in_nifi_bucket")
+
+    assert updater.flush(timeout=0.01) is False
+    release.set()
+    assert updater.flush(timeout=5) is True
+
+
+def test_updater_survives_update_failures(dd_event, capsys):
+    updater = DeliveryStateUpdater(update=mock.Mock(side_effect=Exception("boom")))
+
+    updater.enqueue(dd_event("OPN2102R"), "in_nifi_bucket")
+
+    assert updater.flush(timeout=5)
+    record = json.loads(capsys.readouterr().out)
+    assert record["severity"] == "WARNING"
+    assert record["message"] == "failed to update dds state"
+    assert record["error"] == "boom"
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+def test_get_updater_uses_the_dds_client(mock_update_state, dd_event, config):
+    event = dd_event("OPN2102R")
+    updater = get_updater(config)
+
+    updater.enqueue(event, "in_nifi_bucket")
+    assert updater.flush(timeout=5)
+
+    assert get_updater(config) is updater
+    mock_update_state.assert_called_once_with(event["name"], "in_nifi_bucket", None)
+
+
+def test_updater_gives_up_on_slow_updates(dd_event, capsys):
+    release = threading.Event()
+    updater = DeliveryStateUpdater(update=lambda *_: release.wait(5), timeout=0.05)
+
+    start = time.perf_counter()
+    updater.enqueue(dd_event("OPN2102R"), "in_nifi_bucket")
+    assert updater.flush(timeout=5)
+
+    assert time.perf_counter() - start < 1
+    record = json.loads(capsys.readouterr().out)
+    assert record["error"] == "dds update took longer than 0.05 seconds"
+    assert updater.breaker.failures == 1
+    release.set()
+
+
+def test_updater_shutdown_cancels_queued_updates(dd_event):
+    release = threading.Event()
+    update = mock.Mock(side_effect=lambda *_: release.wait(5))
+    updater = DeliveryStateUpdater(workers=1, update=update, timeout=0.1)
+    event = dd_event("OPN2102R")
+
+    # the first update times out but keeps the only call thread busy, so the
+    # second one is queued behind it
+    updater.enqueue(event, "in_staging")
+    updater.enqueue(event, "in_nifi_bucket")
+    time.sleep(0.15)
+    assert updater.shutdown(timeout=0) is False
+    release.set()
+    time.sleep(0.1)
+
+    assert update.call_count == 1
+
+
+def test_updater_skips_updates_while_the_breaker_is_open(dd_event, enabled_metrics):
+    update = mock.Mock(side_effect=Exception("boom"))
+    updater = DeliveryStateUpdater(
+        update=update, breaker=CircuitBreaker("dds", failure_threshold=2)
+    )
+
+    for instrument in ["OPN2101A", "OPN2102A", "OPN2103A", "OPN2104A"]:
+        updater.enqueue(dd_event(instrument), "in_nifi_bucket")
+        assert updater.flush(timeout=5)
+
+    assert update.call_count == 2
+    assert updater.breaker.state == OPEN
+    assert updater.skipped == 2
+    assert (
+        enabled_metrics.counter_value("dds_skipped_total", state="in_nifi_bucket") == 2
+    )
+
+
+def test_updater_replays_skipped_transitions_in_order_after_recovery(
+    dd_event, enabled_metrics
+):
+    clock = mock.Mock(return_value=0)
+    update = mock.Mock(side_effect=Exception("boom"))
+    updater = DeliveryStateUpdater(
+        update=update,
+        breaker=CircuitBreaker(
+            "dds", failure_threshold=1, reset_timeout=10, clock=clock
+        ),
+    )
+    first, second = dd_event("OPN2101A"), dd_event("OPN2102A")
+
+    updater.enqueue(first, "in_nifi_bucket")
+    assert updater.flush(timeout=5)
+    update.reset_mock(side_effect=True)
+    updater.enqueue(second, "in_nifi_bucket")
+    updater.enqueue(second, "nifi_notified")
+    assert updater.flush(timeout=5)
+    assert update.call_count == 0
+
+    clock.return_value = 10
+    updater.enqueue(first, "nifi_notified")
+    assert updater.flush(timeout=5)
+
+    assert update.call_args_list == [
+        mock.call(first, "nifi_notified", None),
+        mock.call(second, "in_nifi_bucket", None),
+        mock.call(second, "nifi_notified", None),
+    ]
+    assert updater.skipped == 0
+    assert enabled_metrics.counter_value("dds_replayed_total") == 2
+
+
+def test_updater_drops_skipped_transitions_beyond_the_replay_limit(
+    dd_event, enabled_metrics
+):
+    updater = DeliveryStateUpdater(
+        update=mock.Mock(side_effect=Exception("boom")),
+        breaker=CircuitBreaker("dds", failure_threshold=1),
+        replay_limit=1,
+    )
+    for instrument in ["OPN2101A", "OPN2102A", "OPN2103A"]:
+        updater.enqueue(dd_event(instrument), "in_nifi_bucket")
+        assert updater.flush(timeout=5)
+
+    assert updater.skipped == 1
+    assert (
+        enabled_metrics.counter_value("dds_dropped_total", state="in_nifi_bucket") == 1
+    )
+
+
+@mock.patch.object(PublisherClient, "publish")
+def test_publishMsg_latency_stays_flat_when_dds_is_slow(_mock_pubsub, dd_event):
+    dds_client = FakeDDSClient(latency=1.0)
+    clients.set_client_factories(dds_factory=lambda: dds_client)
+    environ = {
+        "PROJECT_ID": "test_project_id",
+        "TOPIC_NAME": "nifi-notify",
+        "ENV": "test",
+        "ON-PREM-SUBFOLDER": "DEV",
+        "DDS_TIMEOUT": "0.05",
+        "DDS_BREAKER_THRESHOLD": "2",
+        "DDS_BREAKER_RESET": "0.3",
+    }
+    events = [dd_event(f"OPN21{month:02}A") for month in range(1, 11)]
+    try:
+        with mock.patch.dict(os.environ, environ):
+            timings = []
+            for event in events:
+                start = time.perf_counter()
+                publishMsg(event, None)
+                timings.append(time.perf_counter() - start)
+
+            assert get_updater(None).breaker.state == OPEN
+            assert max(timings) < 0.5
+            assert max(timings[1:]) < 0.1
+
+            dds_client.behaviour = Behaviour()
+            time.sleep(0.3)
+            publishMsg(dd_event("OPN2111A"), None)
+    finally:
+        clients.set_client_factories()
+
+    assert get_updater(None).skipped == 0
+    assert dds_client.states[events[-1]["name"]] == ["in_nifi_bucket", "nifi_notified"]
@@ -0,0 +1,200 @@
+import os
+import time
+from unittest import mock
+
+import blaise_dds
+import pytest
+from google.cloud.pubsub_v1 import PublisherClient
+
+from dedup import (
+    Deduplicator,
+    FirestoreDedupStore,
+    MemoryDedupCache,
+    SQLiteDedupStore,
+    create_store,
+    dedup_key,
+    key_digest,
+)
+from main import publishBatch, publishMsg
+
+KEY = ("ons-blaise-v2-nifi", "dd_OPN2101A.zip", "1614616928123", "md5")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_dedup_key_uses_bucket_name_generation_and_md5(dd_event):
+    event = dict(dd_event("OPN2101A"), generation="1614616928123")
+    assert dedup_key(event) == (
+        "ons-blaise-v2-nifi",
+        "dd_OPN2101A_0103202021_16428.zip",
+        "1614616928123",
+        "0a14db6e48b947b57988a2f61469f228",
+    )
+    assert dedup_key(dict(event, generation="2")) != dedup_key(event)
+
+
+def test_memory_cache_expires_entries():
+    clock = Clock()
+    cache = MemoryDedupCache(ttl=60, clock=clock)
+    cache.add(KEY)
+    assert cache.contains(KEY)
+
+    clock.now += 60
+    assert not cache.contains(KEY)
+    assert len(cache) == 0
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryDedupCache(max_entries=2)
+    cache.add("a")
+    cache.add("b")
+    assert cache.contains("a")
+    cache.add("c")
+
+    assert cache.contains("a")
+    assert not cache.contains("b")
+    assert cache.contains("c")
+
+
+def test_sqlite_store_persists_across_instances(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "dedup.db")
+    store = SQLiteDedupStore(path, ttl=60, clock=clock)
+    store.add(KEY)
+    store.close()
+
+    store = SQLiteDedupStore(path, ttl=60, clock=clock)
+    assert store.contains(KEY)
+    clock.now += 60
+    assert not store.contains(KEY)
+    assert store.purge_expired() == 1
+
+
+def test_firestore_store_uses_documents_keyed_by_digest():
+    client = mock.Mock()
+    collection = client.collection.return_value
+    store = FirestoreDedupStore("publish-dedup", ttl=60, client=client, clock=Clock())
+
+    store.add(KEY)
+    collection.document.assert_called_with(key_digest(KEY))
+    assert collection.document.return_value.set.call_args[0][0] == {
+        "bucket": "ons-blaise-v2-nifi",
+        "name": "dd_OPN2101A.zip",
+        "generation": "1614616928123",
+        "md5Hash": "md5",
+        "expires_at": 1060.0,
+    }
+
+    snapshot = collection.document.return_value.get.return_value
+    snapshot.exists = True
+    snapshot.get.return_value = 1060.0
+    assert store.contains(KEY)
+    snapshot.exists = False
+    assert not store.contains(KEY)
+
+
+def test_create_store(tmp_path):
+    assert create_store("", 60) is None
+    assert isinstance(create_store(f"sqlite:{tmp_path}/dedup.db", 60), SQLiteDedupStore)
+    with pytest.raises(ValueError, match="unknown dedup store"):
+        create_store("redis:dedup", 60)
+
+
+def test_deduplicator_warms_cache_from_store(dd_event):
+    store = mock.Mock()
+    store.contains.return_value = True
+    deduplicator = Deduplicator(MemoryDedupCache(), store)
+    event = dd_event("OPN2101A")
+
+    assert deduplicator.is_duplicate(event)
+    assert deduplicator.is_duplicate(event)
+    assert store.contains.call_count == 1
+
+
+def test_deduplicator_treats_store_failures_as_new_events(dd_event):
+    store = mock.Mock()
+    store.contains.side_effect = Exception("unavailable")
+    store.add.side_effect = Exception("unavailable")
+    deduplicator = Deduplicator(MemoryDedupCache(), store)
+    event = dd_event("OPN2101A")
+
+    assert not deduplicator.is_duplicate(event)
+    deduplicator.record(event)
+    assert deduplicator.is_duplicate(event)
+
+
+def test_warm_lookup_takes_less_than_a_millisecond(dd_event, tmp_path):
+    deduplicator = Deduplicator(
+        MemoryDedupCache(), SQLiteDedupStore(str(tmp_path / "dedup.db"))
+    )
+    event = dd_event("OPN2101A")
+    deduplicator.record(event)
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        deduplicator.is_duplicate(event)
+    assert (time.perf_counter() - start) / 1000 < 0.001
+
+
+DEDUP_ENVIRON = {
+    "PROJECT_ID": "test_project_id",
+    "ENV": "test",
+    "TOPIC_NAME": "nifi-notify",
+    "ON-PREM-SUBFOLDER": "DEV",
+    "DEDUP_ENABLED": "true",
+}
+
+
+@mock.patch.dict(os.environ, DEDUP_ENVIRON)
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publishMsg_skips_duplicates(mock_pubsub, mock_update_state, dd_event):
+    event = dd_event("OPN2101A")
+    publishMsg(event, None)
+    publishMsg(dict(event), None)
+
+    assert mock_pubsub.call_count == 1
+    assert [call.args[1] for call in mock_update_state.call_args_list] == [
+        "in_nifi_bucket",
+        "nifi_notified",
+    ]
+
+
+@mock.patch.dict(os.environ, DEDUP_ENVIRON)
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publishMsg_does_not_record_failed_publishes(
+    mock_pubsub, _mock_update_state, dd_event
+):
+    mock_pubsub.side_effect = [Exception("unavailable"), mock.Mock()]
+    event = dd_event("OPN2101A")
+    publishMsg(event, None)
+    publishMsg(event, None)
+
+    assert mock_pubsub.call_count == 2
+
+
+@mock.patch.dict(os.environ, DEDUP_ENVIRON)
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publishBatch_skips_duplicates(mock_pubsub, _mock_update_state, dd_event):
+    mock_pubsub.return_value.result.return_value = "message-id"
+    first, second = dd_event("OPN2101A"), dd_event("OPN2102R")
+
+    results = publishBatch([first, second, dict(first)], None)
+    assert [result.status for result in results] == [
+        "published",
+        "published",
+        "duplicate",
+    ]
+    assert results[2].name == first["name"]
+
+    results = publishBatch([second], None)
+    assert [result.status for result in results] == ["duplicate"]
+    assert mock_pubsub.call_count == 2
@@ -0,0 +1,141 @@
+import json
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import clients
+from fakes import (
+    FakeDDSClient,
+    FakeDDSServer,
+    FakeError,
+    FakePublisherClient,
+    PublishToPausedOrderingKeyException,
+)
+from models.message import send_pub_sub_message
+from utils import update_data_delivery_state
+
+
+@pytest.fixture
+def fake_clients():
+    publisher = FakePublisherClient()
+    dds_client = FakeDDSClient()
+    clients.set_client_factories(lambda _config: publisher, lambda: dds_client)
+    yield publisher, dds_client
+    clients.set_client_factories()
+
+
+def test_fake_publisher_resolves_futures_after_latency():
+    publisher = FakePublisherClient(latency=0.05)
+    try:
+        start = time.perf_counter()
+        future = publisher.publish("projects/p/topics/t", b"data")
+        assert not future.done()
+        assert future.result(timeout=1) == "1"
+        assert time.perf_counter() - start >= 0.05
+        assert publisher.published == [("projects/p/topics/t", b"data", {})]
+    finally:
+        publisher.stop()
+
+
+def test_fake_publisher_fails_at_error_rate():
+    publisher = FakePublisherClient(error_rate=1.0)
+    try:
+        future = publisher.publish("projects/p/topics/t", b"data")
+        with pytest.raises(FakeError):
+            future.result(timeout=1)
+        assert publisher.failed == 1
+    finally:
+        publisher.stop()
+
+
+def test_fake_publisher_sends_messages_with_a_key_one_after_another():
+    publisher = FakePublisherClient(latency=0.05)
+    try:
+        start = time.perf_counter()
+        futures = [
+            publisher.publish("projects/p/topics/t", data, ordering_key=key)
+            for data, key in [(b"a1", "a"), (b"b1", "b"), (b"a2", "a")]
+        ]
+        futures[1].result(timeout=1)
+        assert time.perf_counter() - start < 0.1
+        futures[2].result(timeout=1)
+        assert time.perf_counter() - start >= 0.1
+        assert publisher.delivered == {"a": [b"a1", b"a2"], "b": [b"b1"]}
+    finally:
+        publisher.stop()
+
+
+def test_fake_publisher_pauses_a_key_until_it_is_resumed():
+    publisher = FakePublisherClient(error_rate=1.0)
+    topic = "projects/p/topics/t"
+    try:
+        first = publisher.publish(topic, b"a1", ordering_key="a")
+        second = publisher.publish(topic, b"a2", ordering_key="a")
+        with pytest.raises(FakeError):
+            first.result(timeout=1)
+        with pytest.raises(PublishToPausedOrderingKeyException):
+            second.result(timeout=1)
+        with pytest.raises(PublishToPausedOrderingKeyException):
+            publisher.publish(topic, b"a3", ordering_key="a").result(timeout=1)
+
+        publisher.resume_publish(topic, "a")
+        publisher.behaviour.error_rate = 0.0
+        assert publisher.publish(topic, b"a4", ordering_key="a").result(timeout=1)
+        assert publisher.delivered == {"a": [b"a4"]}
+        with pytest.raises(RuntimeError, match="not paused"):
+            publisher.resume_publish(topic, "a")
+    finally:
+        publisher.stop()
+
+
+def test_fake_dds_client_records_states_per_file():
+    dds_client = FakeDDSClient()
+    dds_client.update_state("a.zip", "in_nifi_bucket")
+    dds_client.update_state("a.zip", "nifi_notified")
+    assert dds_client.states == {"a.zip": ["in_nifi_bucket", "nifi_notified"]}
+
+
+def test_fake_dds_client_fails_at_error_rate():
+    dds_client = FakeDDSClient(error_rate=1.0)
+    with pytest.raises(FakeError):
+        dds_client.update_state("a.zip", "errored", "boom")
+    assert dds_client.failed == 1
+    assert dds_client.states == {}
+
+
+def test_fake_dds_server_records_requests():
+    with FakeDDSServer() as server:
+        request = urllib.request.Request(
+            f"{server.url}/v1/state/a.zip",
+            data=b'{"state": "nifi_notified"}',
+            method="PATCH",
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            assert json.load(response) == {"status": 200}
+    assert server.requests == [
+        ("PATCH", "/v1/state/a.zip", b'{"state": "nifi_notified"}')
+    ]
+
+
+def test_fake_dds_server_returns_errors_at_error_rate():
+    with FakeDDSServer(error_rate=1.0) as server:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{server.url}/v1/state/a.zip", timeout=5)
+    assert error.value.code == 500
+
+
+def test_set_client_factories_injects_fakes(fake_clients, config, message, dd_event):
+    publisher, dds_client = fake_clients
+    result = send_pub_sub_message(config, message)
+    update_data_delivery_state(dd_event("OPN2101A"), "nifi_notified")
+    assert result.message_id == "1"
+    assert len(publisher.published) == 1
+    assert dds_client.states == {"dd_OPN2101A_0103202021_16428.zip": ["nifi_notified"]}
+
+
+def test_set_client_factories_restores_defaults(fake_clients):
+    clients.set_client_factories()
+    assert clients._publisher_factory is clients.create_publisher_client
+    assert clients._dds_factory is clients.create_dds_client
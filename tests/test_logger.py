@@ -0,0 +1,80 @@
+import io
+import json
+from unittest import mock
+
+import pytest
+
+from logger import StageTimer, StructuredLogger
+
+
+def records(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_log_writes_cloud_logging_json():
+    stream = io.StringIO()
+    StructuredLogger(stream=stream).info("Event received", file_name="dd_file.zip")
+
+    assert records(stream) == [
+        {"severity": "INFO", "message": "Event received", "file_name": "dd_file.zip"}
+    ]
+
+
+def test_log_filters_by_severity():
+    stream = io.StringIO()
+    logger = StructuredLogger(level="WARNING", stream=stream)
+
+    logger.info("skipped")
+    logger.warning("kept")
+    logger.error("kept")
+
+    assert [record["severity"] for record in records(stream)] == ["WARNING", "ERROR"]
+
+
+def test_log_evaluates_callable_fields_lazily():
+    stream = io.StringIO()
+    logger = StructuredLogger(stream=stream)
+    manifest = mock.Mock(return_value="{}")
+
+    logger.debug("Message built", manifest=manifest)
+    manifest.assert_not_called()
+
+    logger.info("Message built", manifest=manifest)
+    assert records(stream)[0]["manifest"] == "{}"
+
+
+@pytest.mark.parametrize("random_value, expected", [(0.05, 1), (0.5, 0)])
+def test_log_samples_success_path_records(random_value, expected):
+    stream = io.StringIO()
+    logger = StructuredLogger(sample_rate=0.1, stream=stream)
+
+    with mock.patch("random.random", return_value=random_value):
+        logger.info("Message published", sampled=True)
+    logger.info("Event processed")
+
+    assert [record["message"] for record in records(stream)].count(
+        "Message published"
+    ) == expected
+    assert records(stream)[-1]["message"] == "Event processed"
+
+
+def test_stage_timer_accumulates_stages():
+    timer = StageTimer()
+
+    with mock.patch("time.perf_counter", side_effect=[0, 0.002, 1, 1.0005]):
+        with timer.stage("dds_update"):
+            pass
+        with timer.stage("dds_update"):
+            pass
+
+    assert timer.elapsed_ms == {"dds_update": 2.5}
+
+
+def test_stage_timer_records_failed_stages():
+    timer = StageTimer()
+
+    with pytest.raises(ValueError):
+        with timer.stage("build"):
+            raise ValueError()
+
+    assert "build" in timer.elapsed_ms
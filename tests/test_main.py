@@ -6,7 +6,7 @@ import blaise_dds
 import pytest
 from google.cloud.pubsub_v1 import PublisherClient
 
-from main import publishMsg
+from main import publishBatch, publishMsg
 
 
 @mock.patch.dict(
@@ -83,3 +83,108 @@ def test_publishMsg_error(mock_pubsub, mock_update_state, dd_event, instrument):
         "errored",
         "Exception('Explosions occurred when sending message to pubsub')",
     )
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "PROJECT_ID": "test_project_id",
+        "ENV": "test",
+        "TOPIC_NAME": "nifi-notify",
+        "ON-PREM-SUBFOLDER": "DEV",
+        "IGNORE_PATTERNS": "*.tmp.zip",
+    },
+)
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+@pytest.mark.parametrize(
+    "filename, reason",
+    [
+        ("xx_OPN2101A", "unsupported_type"),
+        ("dd_OPN2101A.tmp", "ignored"),
+    ],
+)
+def test_publishMsg_rejects_events_before_any_network_io(
+    mock_pubsub, mock_update_state, event, filename, reason, capsys
+):
+    publishMsg(event(filename), None)
+
+    mock_update_state.assert_not_called()
+    mock_pubsub.assert_not_called()
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    rejected = [record for record in records if record["message"] == "Event rejected"]
+    assert rejected[0]["reason"] == reason
+    assert records[-1]["outcome"] == "rejected"
+    assert set(records[-1]["elapsed_ms"]) == {"config", "preflight"}
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "PROJECT_ID": "test_project_id",
+        "ENV": "test",
+        "TOPIC_NAME": "nifi-notify",
+        "ON-PREM-SUBFOLDER": "DEV",
+    },
+)
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publishBatch(
+    mock_pubsub,
+    _mock_update_state,
+    dd_event,
+    mi_event,
+    expected_pubsub_message_dd_opn,
+    expected_pubsub_message_mi,
+):
+    mock_pubsub.return_value.result.return_value = "message-id"
+    results = publishBatch([dd_event("OPN2102R"), mi_event("OPN2101A")], None)
+
+    assert [result.status for result in results] == ["published", "published"]
+    assert json.loads(mock_pubsub.call_args_list[0][1]["data"]) == (
+        expected_pubsub_message_dd_opn
+    )
+    assert json.loads(mock_pubsub.call_args_list[1][1]["data"]) == (
+        expected_pubsub_message_mi
+    )
+
+
+@mock.patch.dict(os.environ, {"TOPIC_NAME": "nifi-notify"})
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publishBatch_project_id_not_set(mock_pubsub, mock_update_state, dd_event):
+    assert publishBatch([dd_event("OPN2102R")], None) == []
+    assert mock_pubsub.call_count == 0
+    assert mock_update_state.call_count == 0
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "PROJECT_ID": "test_project_id",
+        "ENV": "test",
+        "TOPIC_NAME": "nifi-notify",
+        "ON-PREM-SUBFOLDER": "DEV",
+    },
+)
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publishMsg_logs_one_summary(
+    _mock_pubsub, _mock_update_state, dd_event, capsys
+):
+    publishMsg(dd_event("LMS2102R"), None)
+
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    summaries = [record for record in records if record["message"] == "Event processed"]
+    assert len(summaries) == 1
+    assert summaries[0]["file_name"] == "dd_LMS2102R_0103202021_16428.zip"
+    assert summaries[0]["dataset"] == "blaise_dde_lms"
+    assert summaries[0]["route"] == "data_delivery_lms"
+    assert summaries[0]["outcome"] == "published"
+    assert set(summaries[0]["elapsed_ms"]) == {
+        "config",
+        "preflight",
+        "dds_update",
+        "build",
+        "publish",
+    }
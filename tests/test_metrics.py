@@ -0,0 +1,211 @@
+import dataclasses
+import datetime
+import os
+import urllib.request
+from unittest import mock
+
+import blaise_dds
+import pytest
+from google.cloud.pubsub_v1 import PublisherClient
+
+from main import publishMsg
+from metrics import (
+    INSTRUMENTS,
+    MetricsRegistry,
+    MetricsServer,
+    OpenTelemetryExporter,
+    metrics,
+    parse_time_created,
+    record_publish_lag,
+)
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry()
+    registry.observe("stage_latency_ms", 3, stage="build")
+    registry.increment("events_total", outcome="published", route="x")
+    with registry.timer("dds_update_latency_ms", state="errored"):
+        pass
+
+    assert registry.prometheus_text() == ""
+
+
+def test_histogram_counts_values_into_buckets():
+    registry = MetricsRegistry(enabled=True)
+    for value in [0.5, 1, 7, 20000]:
+        registry.observe("stage_latency_ms", value, stage="build")
+
+    histogram = registry.histogram("stage_latency_ms", stage="build")
+    assert histogram.count == 4
+    assert histogram.sum == 20008.5
+    assert histogram.counts[0] == 2
+    assert histogram.counts[3] == 1
+    assert histogram.counts[-1] == 1
+
+
+def test_prometheus_text():
+    registry = MetricsRegistry(enabled=True)
+    registry.observe("publish_lag_seconds", 4)
+    registry.increment("events_total", outcome="published", route="data_delivery_lms")
+    registry.increment("events_total", outcome="published", route="data_delivery_lms")
+
+    text = registry.prometheus_text()
+
+    assert "# TYPE bucket_metadata_publish_lag_seconds histogram\n" in text
+    assert 'bucket_metadata_publish_lag_seconds_bucket{le="1"} 0\n' in text
+    assert 'bucket_metadata_publish_lag_seconds_bucket{le="5"} 1\n' in text
+    assert 'bucket_metadata_publish_lag_seconds_bucket{le="+Inf"} 1\n' in text
+    assert "bucket_metadata_publish_lag_seconds_sum 4\n" in text
+    assert "bucket_metadata_publish_lag_seconds_count 1\n" in text
+    assert "# TYPE bucket_metadata_events_total counter\n" in text
+    assert (
+        'bucket_metadata_events_total{outcome="published",route="data_delivery_lms"} 2'
+        in text
+    )
+
+
+def test_gauges_keep_the_last_value():
+    registry = MetricsRegistry(enabled=True)
+    registry.set("breaker_state", 2, breaker="dds")
+    registry.set("breaker_state", 0, breaker="dds")
+
+    assert registry.gauge_value("breaker_state", breaker="dds") == 0
+    text = registry.prometheus_text()
+    assert "# TYPE bucket_metadata_breaker_state gauge\n" in text
+    assert 'bucket_metadata_breaker_state{breaker="dds"} 0\n' in text
+
+
+def test_opentelemetry_exporter_forwards_records():
+    meter = mock.Mock()
+    registry = MetricsRegistry(enabled=True, exporters=[OpenTelemetryExporter(meter)])
+
+    registry.observe("stage_latency_ms", 2, stage="publish")
+    registry.observe("stage_latency_ms", 3, stage="build")
+    registry.increment("errors_total", stage="build", error="InvalidFileType")
+
+    meter.create_histogram.assert_called_once_with(
+        "bucket_metadata.stage_latency_ms",
+        unit="ms",
+        description=INSTRUMENTS["stage_latency_ms"].description,
+    )
+    meter.create_histogram.return_value.record.assert_has_calls(
+        [
+            mock.call(2, attributes={"stage": "publish"}),
+            mock.call(3, attributes={"stage": "build"}),
+        ]
+    )
+    meter.create_counter.return_value.add.assert_called_once_with(
+        1, attributes={"stage": "build", "error": "InvalidFileType"}
+    )
+
+
+def test_configure_adds_the_configured_exporter_once(config):
+    registry = MetricsRegistry(enabled=True)
+    otel_config = dataclasses.replace(config, metrics_exporter="otel")
+
+    with mock.patch("metrics.OpenTelemetryExporter") as mock_exporter:
+        registry.configure(config)
+        assert registry.exporters == []
+        registry.configure(otel_config)
+        registry.configure(otel_config)
+
+    assert registry.exporters == [mock_exporter.return_value]
+
+
+@mock.patch("metrics.OpenTelemetryExporter")
+def test_configure_adds_no_exporter_when_disabled(mock_exporter, config):
+    registry = MetricsRegistry()
+    registry.configure(dataclasses.replace(config, metrics_exporter="otel"))
+
+    assert registry.exporters == []
+    mock_exporter.assert_not_called()
+
+
+def test_metrics_server_serves_prometheus_text():
+    registry = MetricsRegistry(enabled=True)
+    registry.increment("retries_total")
+    server = MetricsServer(registry, 0, host="127.0.0.1").start()
+    try:
+        url = f"http://127.0.0.1:{server.port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            status = response.status
+            content_type = response.headers["Content-Type"]
+            text = response.read().decode("utf-8")
+    finally:
+        server.stop()
+
+    assert status == 200
+    assert content_type.startswith("text/plain")
+    assert "bucket_metadata_retries_total 1\n" in text
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (
+            "2021-03-01T16:42:08.123Z",
+            datetime.datetime(
+                2021, 3, 1, 16, 42, 8, 123000, tzinfo=datetime.timezone.utc
+            ),
+        ),
+        (
+            "2021-03-01T16:42:08+00:00",
+            datetime.datetime(2021, 3, 1, 16, 42, 8, tzinfo=datetime.timezone.utc),
+        ),
+        ("0103202021_16428", None),
+        (None, None),
+    ],
+)
+def test_parse_time_created(value, expected):
+    assert parse_time_created(value) == expected
+
+
+def test_record_publish_lag(enabled_metrics):
+    published_at = datetime.datetime(
+        2021, 3, 1, 16, 43, 8, tzinfo=datetime.timezone.utc
+    )
+    record_publish_lag({"timeCreated": "2021-03-01T16:42:08Z"}, published_at)
+
+    assert enabled_metrics.histogram("publish_lag_seconds").sum == 60
+
+
+@mock.patch.dict(
+    os.environ,
+    {
+        "PROJECT_ID": "test_project_id",
+        "ENV": "test",
+        "TOPIC_NAME": "nifi-notify",
+        "ON-PREM-SUBFOLDER": "DEV",
+    },
+)
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publishMsg_records_metrics(
+    _mock_pubsub, mock_update_state, enabled_metrics, dd_event, event
+):
+    mock_update_state.side_effect = [None, Exception("dds down")]
+    publishMsg(dd_event("LMS2102R"), None)
+    publishMsg(event("xx_OPN2101A"), None)
+
+    assert enabled_metrics.counter_value(
+        "events_total", outcome="published", route="data_delivery_lms"
+    )
+    assert enabled_metrics.counter_value(
+        "events_total", outcome="rejected", route="none"
+    )
+    assert enabled_metrics.counter_value("rejections_total", reason="unsupported_type")
+    assert enabled_metrics.counter_value(
+        "errors_total", stage="dds_update", error="Exception"
+    )
+    for stage in ["config", "preflight"]:
+        assert enabled_metrics.histogram("stage_latency_ms", stage=stage).count == 2
+    for stage in ["dds_update", "build", "publish"]:
+        assert enabled_metrics.histogram("stage_latency_ms", stage=stage).count == 1
+    assert (
+        enabled_metrics.histogram("dds_update_latency_ms", state="in_nifi_bucket").count
+        == 1
+    )
+
+    assert (
+        "bucket_metadata_stage_latency_ms_bucket" in enabled_metrics.prometheus_text()
+    )
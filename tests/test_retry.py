@@ -0,0 +1,84 @@
+import asyncio
+from unittest import mock
+
+import pytest
+from google.api_core import exceptions
+
+from retry import Backoff, call_with_retry, call_with_retry_async, is_transient
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (exceptions.ServiceUnavailable("unavailable"), True),
+        (exceptions.DeadlineExceeded("deadline"), True),
+        (TimeoutError(), True),
+        (exceptions.PermissionDenied("denied"), False),
+        (ValueError("bad"), False),
+    ],
+)
+def test_is_transient(error, expected):
+    assert is_transient(error) is expected
+
+
+@mock.patch("retry.random.uniform", side_effect=lambda low, high: high)
+def test_backoff_delays_grow_exponentially_up_to_the_maximum(_mock_uniform):
+    delays = Backoff(initial=0.1, maximum=0.5).delays()
+    assert [round(next(delays), 3) for _ in range(5)] == [0.1, 0.2, 0.4, 0.5, 0.5]
+
+
+def test_backoff_delays_are_jittered():
+    delays = Backoff(initial=1, maximum=1).delays()
+    values = {next(delays) for _ in range(20)}
+    assert len(values) > 1
+    assert all(0 <= value <= 1 for value in values)
+
+
+def test_call_with_retry_retries_transient_errors():
+    function = mock.Mock(
+        side_effect=[exceptions.ServiceUnavailable("unavailable"), "result"]
+    )
+    sleep = mock.Mock()
+
+    assert call_with_retry(function, Backoff(), attempts=3, sleep=sleep) == "result"
+    assert function.call_count == 2
+    assert sleep.call_count == 1
+
+
+def test_call_with_retry_gives_up_after_attempts():
+    function = mock.Mock(side_effect=exceptions.ServiceUnavailable("unavailable"))
+
+    with pytest.raises(exceptions.ServiceUnavailable):
+        call_with_retry(function, Backoff(), attempts=3, sleep=mock.Mock())
+    assert function.call_count == 3
+
+
+def test_call_with_retry_does_not_retry_permanent_errors():
+    function = mock.Mock(side_effect=exceptions.PermissionDenied("denied"))
+
+    with pytest.raises(exceptions.PermissionDenied):
+        call_with_retry(function, Backoff(), attempts=3, sleep=mock.Mock())
+    assert function.call_count == 1
+
+
+@mock.patch("retry.random.uniform", side_effect=lambda low, high: high)
+def test_call_with_retry_stops_at_the_deadline(_mock_uniform):
+    function = mock.Mock(side_effect=exceptions.ServiceUnavailable("unavailable"))
+    backoff = Backoff(initial=10, maximum=10, deadline=5)
+
+    with pytest.raises(exceptions.ServiceUnavailable):
+        call_with_retry(function, backoff, attempts=3, sleep=mock.Mock())
+    assert function.call_count == 1
+
+
+def test_call_with_retry_async_retries_transient_errors():
+    function = mock.AsyncMock(
+        side_effect=[exceptions.ServiceUnavailable("unavailable"), "result"]
+    )
+    sleep = mock.AsyncMock()
+
+    result = asyncio.run(call_with_retry_async(function, Backoff(), 3, sleep=sleep))
+
+    assert result == "result"
+    assert function.await_count == 2
+    assert sleep.await_count == 1
@@ -0,0 +1,233 @@
+import dataclasses
+import json
+import os
+from unittest import mock
+
+import blaise_dds
+import pytest
+from google.api_core import exceptions
+from google.cloud.pubsub_v1 import PublisherClient
+
+import drain as drain_command
+from batch import publish_batch
+from dds import DeliveryStateUpdater
+from main import publishMsg
+from spool import (
+    FileSpool,
+    GCSSpool,
+    SpoolEntry,
+    SQLiteSpool,
+    create_spool,
+    drain,
+    drain_due,
+)
+
+
+def entry(name):
+    return SpoolEntry(
+        event={"name": name, "bucket": "ons-blaise-v2-nifi"},
+        manifest=json.dumps({"files": [{"name": name}]}),
+        error="ServiceUnavailable('unavailable')",
+    )
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def local_spool(request, tmp_path):
+    if request.param == "file":
+        spool = FileSpool(str(tmp_path / "spool.jsonl"))
+    else:
+        spool = SQLiteSpool(str(tmp_path / "spool.db"))
+    yield spool
+    spool.close()
+
+
+def test_spool_entry_round_trips_through_json():
+    original = entry("dd_OPN2101A.zip")
+    assert SpoolEntry.from_json(original.to_json()) == original
+
+
+def test_local_spools_keep_entries_in_order(local_spool):
+    entries = [entry(f"dd_OPN210{n}A.zip") for n in range(3)]
+    for spooled in entries:
+        local_spool.add(spooled)
+
+    assert local_spool.entries(2) == entries[:2]
+    assert len(local_spool) == 3
+
+
+def test_local_spools_settle_published_and_failed_entries(local_spool):
+    first, second, third = (entry(f"dd_OPN210{n}A.zip") for n in range(3))
+    for spooled in (first, second, third):
+        local_spool.add(spooled)
+
+    second.attempts = 1
+    local_spool.settle(published=[first], failed=[second])
+
+    assert local_spool.entries(10) == [second, third]
+    assert local_spool.entries(1)[0].attempts == 1
+
+
+def test_file_spool_survives_reopening(tmp_path):
+    path = str(tmp_path / "spool.jsonl")
+    spooled = entry("dd_OPN2101A.zip")
+    FileSpool(path).add(spooled)
+
+    assert FileSpool(path).entries(10) == [spooled]
+
+
+def test_gcs_spool_stores_one_object_per_entry():
+    client = mock.Mock()
+    bucket = client.bucket.return_value
+    spool = GCSSpool("spool-bucket", client=client)
+    spooled = entry("dd_OPN2101A.zip")
+
+    spool.add(spooled)
+    name = f"spool/{spooled.spooled_at}-{spooled.id}.json"
+    bucket.blob.assert_called_with(name)
+    bucket.blob.return_value.upload_from_string.assert_called_once_with(
+        spooled.to_json(), content_type="application/json"
+    )
+
+    blob = mock.Mock()
+    blob.download_as_bytes.return_value = spooled.to_json().encode()
+    client.list_blobs.return_value = [blob]
+    assert spool.entries(5) == [spooled]
+    client.list_blobs.assert_called_once_with(bucket, prefix="spool/", max_results=5)
+
+    spool.settle(published=[spooled], failed=[])
+    bucket.blob.return_value.delete.assert_called_once_with()
+
+
+def test_create_spool(tmp_path):
+    assert create_spool("") is None
+    assert isinstance(create_spool(f"file:{tmp_path}/spool.jsonl"), FileSpool)
+    assert isinstance(create_spool(f"sqlite:{tmp_path}/spool.db"), SQLiteSpool)
+    with pytest.raises(ValueError, match="unknown spool"):
+        create_spool("kafka:spool")
+
+
+def test_drain_due_limits_drains_per_interval(config):
+    config = dataclasses.replace(config, spool_drain_interval=60)
+    clock = mock.Mock(side_effect=[0, 30, 61])
+    assert drain_due(config, clock)
+    assert not drain_due(config, clock)
+    assert drain_due(config, clock)
+
+
+@mock.patch.object(PublisherClient, "publish")
+def test_drain_publishes_spooled_manifests(mock_pubsub, local_spool, config):
+    first, second = entry("dd_OPN2101A.zip"), entry("dd_OPN2102R.zip")
+    local_spool.add(first)
+    local_spool.add(second)
+    failed_future = mock.Mock()
+    failed_future.result.side_effect = exceptions.ServiceUnavailable("unavailable")
+    mock_pubsub.side_effect = [mock.Mock(), failed_future]
+    updater = mock.Mock()
+
+    stats = drain(local_spool, config, updater)
+
+    assert (stats.published, stats.failed) == (1, 1)
+    assert mock_pubsub.call_args_list[0][1]["data"] == first.manifest.encode()
+    updater.enqueue.assert_called_once_with(first.event, "nifi_notified")
+    remaining = local_spool.entries(10)
+    assert [spooled.id for spooled in remaining] == [second.id]
+    assert remaining[0].attempts == 1
+
+
+SPOOL_ENVIRON = {
+    "PROJECT_ID": "test_project_id",
+    "ENV": "test",
+    "TOPIC_NAME": "nifi-notify",
+    "ON-PREM-SUBFOLDER": "DEV",
+    "PUBLISH_RETRY_ATTEMPTS": "2",
+    "PUBLISH_RETRY_INITIAL": "0.001",
+    "SPOOL_DRAIN_INTERVAL": "0.001",
+}
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publishMsg_spools_and_later_drains_failed_publishes(
+    mock_pubsub, mock_update_state, dd_event, tmp_path
+):
+    environ = dict(SPOOL_ENVIRON, SPOOL=f"file:{tmp_path}/spool.jsonl")
+    first, second = dd_event("OPN2101A"), dd_event("OPN2102R")
+    mock_pubsub.side_effect = exceptions.ServiceUnavailable("unavailable")
+
+    with mock.patch.dict(os.environ, environ):
+        publishMsg(first, None)
+        assert mock_pubsub.call_count == 2
+        assert len(FileSpool(str(tmp_path / "spool.jsonl"))) == 1
+        assert [call[0][1] for call in mock_update_state.call_args_list] == [
+            "in_nifi_bucket"
+        ]
+
+        mock_pubsub.side_effect = None
+        publishMsg(second, None)
+
+    assert len(FileSpool(str(tmp_path / "spool.jsonl"))) == 0
+    published = [json.loads(call[1]["data"]) for call in mock_pubsub.call_args_list[2:]]
+    assert [manifest["files"][0]["name"] for manifest in published] == [
+        f"{first['name']}:{first['bucket']}",
+        f"{second['name']}:{second['bucket']}",
+    ]
+    assert mock.call(first["name"], "nifi_notified", None) in (
+        mock_update_state.call_args_list
+    )
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_batch_retries_then_spools(
+    mock_pubsub, _mock_update_state, dd_event, config, tmp_path
+):
+    config = dataclasses.replace(
+        config,
+        spool=f"sqlite:{tmp_path}/spool.db",
+        publish_retry_attempts=2,
+        publish_retry_initial=0.001,
+    )
+    failed_future = mock.Mock()
+    failed_future.result.side_effect = exceptions.ServiceUnavailable("unavailable")
+    recovered_future = mock.Mock()
+    recovered_future.result.return_value = "message-id"
+    mock_pubsub.side_effect = [
+        failed_future,
+        failed_future,
+        failed_future,
+        recovered_future,
+    ]
+
+    results = list(publish_batch([dd_event("OPN2101A"), dd_event("OPN2102R")], config))
+
+    assert [result.status for result in results] == ["spooled", "published"]
+    assert len(SQLiteSpool(str(tmp_path / "spool.db"))) == 1
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_drain_command(mock_pubsub, _mock_update_state, tmp_path, capsys):
+    path = str(tmp_path / "spool.jsonl")
+    spool = FileSpool(path)
+    for n in range(5):
+        spool.add(entry(f"dd_OPN210{n}A.zip"))
+
+    with mock.patch.dict(os.environ, SPOOL_ENVIRON):
+        assert drain_command.main(["--spool", f"file:{path}", "--batch-size", "2"]) == 0
+
+    assert mock_pubsub.call_count == 5
+    assert len(spool) == 0
+    summary = json.loads(capsys.readouterr().out.splitlines()[-1])
+    assert summary["published"] == 5
+    assert "per_second" in summary
+
+
+def test_drain_all_stops_when_entries_keep_failing(config, tmp_path):
+    spool = FileSpool(str(tmp_path / "spool.jsonl"))
+    spool.add(entry("dd_OPN2101A.zip"))
+    with mock.patch.object(
+        PublisherClient, "publish", side_effect=Exception("unavailable")
+    ), mock.patch("drain.get_updater", return_value=DeliveryStateUpdater(workers=1)):
+        stats = drain_command.drain_all(spool, config)
+
+    assert (stats.published, stats.failed) == (0, 1)
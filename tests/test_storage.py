@@ -0,0 +1,99 @@
+import datetime
+from unittest import mock
+
+from storage import GCSStorage, LocalStorage, rfc3339
+
+
+def test_rfc3339():
+    timestamp = datetime.datetime(2021, 3, 1, 16, 42, 8, 123456)
+    assert rfc3339(timestamp) == "2021-03-01T16:42:08.123Z"
+
+
+def test_local_storage_list_objects(tmp_path):
+    (tmp_path / "dd_OPN2102R_0103202021_16428.zip").write_bytes(b"zip")
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "mi_OPN2101A_0103202021_16428.zip").write_bytes(b"")
+
+    objects = list(LocalStorage(tmp_path, "ons-blaise-v2-nifi").list_objects())
+
+    assert [obj.name for obj in objects] == [
+        "dd_OPN2102R_0103202021_16428.zip",
+        "nested/mi_OPN2101A_0103202021_16428.zip",
+    ]
+    assert objects[0].bucket == "ons-blaise-v2-nifi"
+    assert objects[0].size == 3
+    assert objects[1].md5_hash == "1B2M2Y8AsgTpgAmY7PhCfg=="
+
+
+def test_local_storage_list_objects_with_prefix(tmp_path):
+    (tmp_path / "dd_OPN2102R_0103202021_16428.zip").write_bytes(b"")
+    (tmp_path / "mi_OPN2101A_0103202021_16428.zip").write_bytes(b"")
+
+    objects = LocalStorage(tmp_path).list_objects(prefix="mi_")
+
+    assert [obj.name for obj in objects] == ["mi_OPN2101A_0103202021_16428.zip"]
+
+
+def test_object_info_to_event(tmp_path):
+    (tmp_path / "dd_OPN2102R_0103202021_16428.zip").write_bytes(b"zip")
+    obj = next(LocalStorage(tmp_path, "ons-blaise-v2-nifi").list_objects())
+
+    event = obj.to_event()
+
+    assert event["name"] == "dd_OPN2102R_0103202021_16428.zip"
+    assert event["bucket"] == "ons-blaise-v2-nifi"
+    assert event["size"] == "3"
+    assert event["md5Hash"] == obj.md5_hash
+    assert event["timeCreated"] == obj.time_created
+    assert event["generation"] == obj.generation
+
+
+def test_gcs_storage_list_objects():
+    blob = mock.Mock(
+        size=20,
+        md5_hash="0a14db6e48b947b57988a2f61469f228",
+        time_created=datetime.datetime(2021, 3, 1, 16, 42, 8),
+        generation=1614616928000000,
+    )
+    blob.name = "dd_OPN2102R_0103202021_16428.zip"
+    client = mock.Mock()
+    client.list_blobs.return_value = iter([blob])
+
+    objects = list(GCSStorage("ons-blaise-v2-nifi", client).list_objects("dd_"))
+
+    client.list_blobs.assert_called_once_with("ons-blaise-v2-nifi", prefix="dd_")
+    assert objects[0].to_event() == {
+        "name": "dd_OPN2102R_0103202021_16428.zip",
+        "bucket": "ons-blaise-v2-nifi",
+        "md5Hash": "0a14db6e48b947b57988a2f61469f228",
+        "size": "20",
+        "timeCreated": "2021-03-01T16:42:08.000Z",
+        "generation": "1614616928000000",
+    }
+
+
+def test_local_storage_read_range(tmp_path):
+    (tmp_path / "dd_OPN2102R_0103202021_16428.zip").write_bytes(b"0123456789")
+
+    storage = LocalStorage(tmp_path)
+
+    assert storage.read_range("dd_OPN2102R_0103202021_16428.zip", 2, 5) == b"234"
+
+
+def test_gcs_storage_read_range_requests_inclusive_end():
+    client = mock.Mock()
+    blob = client.bucket.return_value.blob.return_value
+    blob.download_as_bytes.return_value = b"234"
+
+    storage = GCSStorage("ons-blaise-v2-nifi", client=client)
+
+    assert storage.read_range("dd_file.zip", 2, 5) == b"234"
+    client.bucket.assert_called_once_with("ons-blaise-v2-nifi")
+    blob.download_as_bytes.assert_called_once_with(start=2, end=4)
+
+
+def test_local_storage_open(tmp_path):
+    (tmp_path / "dd_OPN2102R_0103202021_16428.zip").write_bytes(b"zip")
+
+    with LocalStorage(tmp_path).open("dd_OPN2102R_0103202021_16428.zip") as file:
+        assert file.read() == b"zip"
@@ -1,3 +1,4 @@
+import json
 from unittest import mock
 
 import blaise_dds
@@ -64,7 +65,10 @@ def test_update_data_delivery_state_fail(
     dd_event = dd_event(instrument)
     update_data_delivery_state(dd_event, state)
     captured = capsys.readouterr()
-    assert (
-        captured.out
-        == "failed to update dds state: Computer says no. Do not pass Go. Do not collect £200\n"
-    )
+    assert json.loads(captured.out) == {
+        "severity": "WARNING",
+        "message": "failed to update dds state",
+        "file_name": dd_event["name"],
+        "state": state,
+        "error": "Computer says no. Do not pass Go. Do not collect £200",
+    }
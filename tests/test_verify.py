@@ -0,0 +1,154 @@
+import base64
+import dataclasses
+import hashlib
+import io
+import os
+from unittest import mock
+
+import blaise_dds
+import pytest
+from google.cloud.pubsub_v1 import PublisherClient
+
+from batch import publish_batch
+from main import publishMsg
+from utils import InvalidContent
+from verify import stream_md5, verify_content, verify_messages
+
+
+class ChunkedReader(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.buffers = set()
+
+    def readinto(self, buffer):
+        self.buffers.add(id(buffer.obj))
+        return super().readinto(buffer)
+
+
+def md5_hash(data):
+    return str(base64.b64encode(hashlib.md5(data).digest()), "utf-8")
+
+
+@pytest.fixture
+def stored(tmp_path, dd_event):
+    def wrapper(instrument, data, md5=None):
+        event = dd_event(instrument)
+        bucket = tmp_path / event["bucket"]
+        bucket.mkdir(exist_ok=True)
+        (bucket / event["name"]).write_bytes(data)
+        event["size"] = str(len(data))
+        event["md5Hash"] = md5 or md5_hash(data)
+        return event
+
+    return wrapper
+
+
+@pytest.fixture
+def verify_config(config, tmp_path):
+    return dataclasses.replace(
+        config, verify_enabled=True, storage_root=str(tmp_path), verify_chunk_size=64
+    )
+
+
+def test_stream_md5_reuses_one_buffer():
+    data = os.urandom(1000)
+    first, second = ChunkedReader(data), ChunkedReader(data)
+
+    assert stream_md5(first, chunk_size=64) == hashlib.md5(data).digest()
+    assert stream_md5(second, chunk_size=64) == hashlib.md5(data).digest()
+    assert len(first.buffers | second.buffers) == 1
+
+
+def test_verify_content_accepts_matching_objects(stored, verify_config):
+    verify_content(stored("OPN2101A", b"zip contents"), verify_config)
+
+
+def test_verify_content_rejects_truncated_objects(stored, verify_config):
+    event = stored("OPN2101A", b"zip", md5=md5_hash(b"zip contents"))
+
+    with pytest.raises(InvalidContent, match="expected"):
+        verify_content(event, verify_config)
+
+
+def test_verify_content_rejects_missing_objects(dd_event, verify_config):
+    with pytest.raises(InvalidContent, match="could not read"):
+        verify_content(dd_event("OPN2101A"), verify_config)
+
+
+def test_verify_content_skips_objects_over_the_size_limit(dd_event, verify_config):
+    config = dataclasses.replace(verify_config, verify_max_bytes=10)
+    verify_content(dict(dd_event("OPN2101A"), size="11"), config)
+
+
+def test_verify_messages_marks_mismatches(stored, verify_config):
+    good = stored("OPN2101A", b"good")
+    bad = stored("OPN2102R", b"bad", md5=md5_hash(b"worse"))
+    messages = [(good, "message", None), (bad, "message", None)]
+
+    verified = verify_messages(messages, verify_config)
+
+    assert verified[0] == (good, "message", None)
+    assert verified[1][:2] == (bad, None)
+    assert isinstance(verified[1][2], InvalidContent)
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_batch_reports_unverified_objects(
+    mock_pubsub, _mock_update_state, stored, verify_config
+):
+    mock_pubsub.return_value.result.return_value = "message-id"
+    events = [
+        stored("OPN2101A", b"good"),
+        stored("OPN2102R", b"bad", md5=md5_hash(b"worse")),
+    ]
+
+    results = list(publish_batch(events, verify_config))
+
+    assert [result.status for result in results] == ["published", "errored"]
+    assert results[1].error.startswith("InvalidContent(")
+    assert mock_pubsub.call_count == 1
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publish_batch_reports_objects_whose_storage_fails(
+    mock_pubsub, mock_update_state, stored, verify_config
+):
+    events = [stored("OPN2101A", b"good"), stored("OPN2102R", b"good")]
+
+    with mock.patch(
+        "verify.get_storage", side_effect=ImportError("no google.cloud.storage")
+    ):
+        results = list(publish_batch(events, verify_config))
+
+    assert [result.status for result in results] == ["errored", "errored"]
+    assert "no google.cloud.storage" in results[0].error
+    mock_pubsub.assert_not_called()
+    for event, result in zip(events, results):
+        assert (
+            mock.call(event["name"], "errored", result.error)
+            in mock_update_state.call_args_list
+        )
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_publishMsg_does_not_publish_unverified_objects(
+    mock_pubsub, mock_update_state, stored, tmp_path
+):
+    event = stored("OPN2101A", b"zip", md5=md5_hash(b"zip contents"))
+    environ = {
+        "PROJECT_ID": "test_project_id",
+        "ENV": "test",
+        "TOPIC_NAME": "nifi-notify",
+        "ON-PREM-SUBFOLDER": "DEV",
+        "VERIFY_ENABLED": "true",
+        "STORAGE_ROOT": str(tmp_path),
+    }
+    with mock.patch.dict(os.environ, environ):
+        publishMsg(event, None)
+
+    assert mock_pubsub.call_count == 0
+    assert mock_update_state.call_args[0][1] == "errored"
+    assert "InvalidContent" in mock_update_state.call_args[0][2]
@@ -0,0 +1,258 @@
+import dataclasses
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+import blaise_dds
+import pytest
+from google.api_core import exceptions
+from google.cloud.pubsub_v1 import PublisherClient
+
+import clients
+import worker
+from fakes import FakePublisherClient
+from worker import LocalQueueSource, PubSubSource, Worker, create_source
+
+
+@pytest.fixture
+def worker_config(config):
+    return dataclasses.replace(
+        config,
+        publish_retry_attempts=1,
+        worker_concurrency=4,
+        worker_shutdown_timeout=5.0,
+    )
+
+
+def run_worker(config, events, **source_options):
+    source = LocalQueueSource(concurrency=config.worker_concurrency, **source_options)
+    for event in events:
+        source.put(event)
+    pool = Worker(config, source)
+    pool.run(until_idle=True)
+    return pool, source
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_worker_acks_events_after_publishing(
+    mock_pubsub, mock_update_state, worker_config, dd_event
+):
+    events = [dd_event("OPN2101A"), dd_event("OPN2102R")]
+
+    pool, source = run_worker(worker_config, events)
+
+    assert pool.outcomes == {"published": 2}
+    assert len(source.acked) == 2
+    assert mock_pubsub.call_count == 2
+    states = sorted(call[0][:2] for call in mock_update_state.call_args_list)
+    assert states == sorted(
+        (event["name"], state)
+        for event in events
+        for state in ("in_nifi_bucket", "nifi_notified")
+    )
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_worker_redelivers_events_whose_publish_failed(
+    mock_pubsub, _mock_update_state, worker_config, dd_event
+):
+    mock_pubsub.side_effect = exceptions.PermissionDenied("denied")
+
+    pool, source = run_worker(worker_config, [dd_event("OPN2101A")], max_deliveries=3)
+
+    assert pool.outcomes == {"errored": 3}
+    assert mock_pubsub.call_count == 3
+    assert source.acked == []
+    assert [message.delivery_attempt for message in source.dead] == [3]
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_worker_acks_events_whose_publish_was_spooled(
+    mock_pubsub, _mock_update_state, worker_config, dd_event, tmp_path
+):
+    worker_config = dataclasses.replace(
+        worker_config, spool=f"file:{tmp_path}/spool.jsonl"
+    )
+    mock_pubsub.side_effect = exceptions.PermissionDenied("denied")
+
+    pool, source = run_worker(worker_config, [dd_event("OPN2101A")], max_deliveries=3)
+
+    assert pool.outcomes == {"spooled": 1}
+    assert len(source.acked) == 1
+    assert source.dead == []
+    assert len((tmp_path / "spool.jsonl").read_text().splitlines()) == 1
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_worker_acks_events_that_cannot_be_published(
+    mock_pubsub, _mock_update_state, worker_config, event
+):
+    source = LocalQueueSource()
+    source.put(event("xx_OPN2101A"))
+    source.put(event("dd_OPN2101A"), attributes={"eventType": "OBJECT_DELETE"})
+    source._queue.put(worker.LocalMessage(b"not json", source=source))
+
+    pool = Worker(worker_config, source)
+    pool.run(until_idle=True)
+
+    assert pool.outcomes == {"rejected": 1, "ignored": 1, "invalid": 1}
+    assert len(source.acked) == 3
+    mock_pubsub.assert_not_called()
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+def test_worker_handles_events_concurrently(
+    _mock_update_state, worker_config, dd_event
+):
+    publisher = FakePublisherClient(latency=0.1)
+    clients.set_client_factories(publisher_factory=lambda _config: publisher)
+    events = [dd_event(f"OPN21{month:02}A") for month in range(1, 9)]
+    try:
+        start = time.perf_counter()
+        pool, _ = run_worker(worker_config, events)
+        elapsed = time.perf_counter() - start
+    finally:
+        clients.set_client_factories()
+        publisher.stop()
+
+    assert pool.outcomes == {"published": 8}
+    assert elapsed < 0.6
+
+
+def test_local_queue_source_limits_outstanding_messages():
+    source = LocalQueueSource(concurrency=4, max_messages=2)
+    for number in range(6):
+        source.put({"name": f"file_{number}"})
+    lock = threading.Lock()
+    outstanding = []
+    active = [0]
+
+    def callback(message):
+        with lock:
+            active[0] += 1
+            outstanding.append(active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        message.ack()
+
+    source.start(callback)
+    deadline = time.monotonic() + 5
+    while not source.idle() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    source.stop()
+
+    assert len(source.acked) == 6
+    assert max(outstanding) == 2
+
+
+@mock.patch("worker.MetricsServer")
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_worker_serves_metrics_while_running(
+    _mock_pubsub,
+    _mock_update_state,
+    mock_server,
+    worker_config,
+    dd_event,
+    enabled_metrics,
+):
+    run_worker(
+        dataclasses.replace(worker_config, metrics_port=9100), [dd_event("OPN2101A")]
+    )
+
+    mock_server.assert_called_once_with(enabled_metrics, 9100)
+    mock_server.return_value.start.assert_called_once_with()
+    mock_server.return_value.stop.assert_called_once_with()
+
+
+@mock.patch("worker.MetricsServer")
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_worker_serves_no_metrics_when_disabled(
+    _mock_pubsub, _mock_update_state, mock_server, worker_config, dd_event
+):
+    run_worker(worker_config, [dd_event("OPN2101A")])
+
+    mock_server.assert_not_called()
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+def test_worker_finishes_in_flight_events_on_stop(
+    _mock_update_state, worker_config, dd_event
+):
+    publisher = FakePublisherClient(latency=0.2)
+    clients.set_client_factories(publisher_factory=lambda _config: publisher)
+    source = LocalQueueSource(concurrency=2)
+    source.put(dd_event("OPN2101A"))
+    pool = Worker(worker_config, source)
+    threading.Timer(0.05, pool.stop).start()
+    try:
+        pool.run()
+    finally:
+        clients.set_client_factories()
+        publisher.stop()
+
+    assert pool.outcomes == {"published": 1}
+    assert len(source.acked) == 1
+
+
+@mock.patch("google.cloud.pubsub_v1.SubscriberClient")
+def test_pubsub_source_subscribes_with_flow_control(mock_subscriber):
+    client = mock_subscriber.return_value
+    source = PubSubSource(
+        "projects/p/subscriptions/s", concurrency=2, max_messages=10, max_bytes=1000
+    )
+    callback = mock.Mock()
+    on_close = mock.Mock()
+
+    source.start(callback, on_close=on_close)
+    _, kwargs = client.subscribe.call_args
+    assert client.subscribe.call_args[0] == ("projects/p/subscriptions/s", callback)
+    assert kwargs["flow_control"].max_messages == 10
+    assert kwargs["flow_control"].max_bytes == 1000
+
+    future = client.subscribe.return_value
+    future.add_done_callback.call_args[0][0](future)
+    on_close.assert_called_once_with()
+
+    source.stop(timeout=1)
+    future.cancel.assert_called_once_with()
+    future.result.assert_called_once_with(timeout=1)
+    client.close.assert_called_once_with()
+
+
+@mock.patch("worker.PubSubSource")
+def test_create_source_expands_subscription_names(mock_source, worker_config):
+    create_source(dataclasses.replace(worker_config, subscription="gcs-events"))
+    assert mock_source.call_args[0] == (
+        "projects/survey_project_id/subscriptions/gcs-events",
+    )
+
+
+@mock.patch.object(blaise_dds.Client, "update_state")
+@mock.patch.object(PublisherClient, "publish")
+def test_worker_command_handles_local_events(
+    mock_pubsub, _mock_update_state, dd_event, tmp_path
+):
+    events = tmp_path / "events.jsonl"
+    events.write_text(
+        "\n".join(json.dumps(dd_event(name)) for name in ["OPN2101A", "OPN2102R"])
+    )
+    environ = {
+        "PROJECT_ID": "test_project_id",
+        "TOPIC_NAME": "nifi-notify",
+        "ENV": "test",
+        "ON-PREM-SUBFOLDER": "DEV",
+    }
+
+    with mock.patch.dict(os.environ, environ), mock.patch("worker.signal.signal"):
+        assert worker.main(["--events", str(events), "--concurrency", "2"]) == 0
+
+    assert mock_pubsub.call_count == 2
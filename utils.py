@@ -1,12 +1,18 @@
 import base64
 import binascii
 
-import blaise_dds
+from clients import get_dds_client, reset_dds_client
+from logger import logger
+from metrics import metrics
 
 
 def log_event(event):
-    print(f"Configuration: File name: {event['name']}")
-    print(f"Configuration: Bucket Name: {event['bucket']}")
+    logger.info(
+        "Event received",
+        sampled=True,
+        file_name=event["name"],
+        bucket=event["bucket"],
+    )
 
 
 def md5hash_to_md5sum(md5hash):
@@ -19,12 +25,27 @@ def size_in_megabytes(size_in_bytes):
     return "{:.6f}".format(int(size_in_bytes) / 1000000)
 
 
+def send_data_delivery_state(event, state, error=None):
+    dds_client = get_dds_client()
+    try:
+        with metrics.timer("dds_update_latency_ms", state=state):
+            dds_client.update_state(event["name"], state, error)
+    except Exception as err:
+        reset_dds_client()
+        metrics.increment("errors_total", stage="dds_update", error=type(err).__name__)
+        raise
+
+
 def update_data_delivery_state(event, state, error=None):
-    dds_client = blaise_dds.Client(blaise_dds.Config.from_env())
     try:
-        dds_client.update_state(event["name"], state, error)
+        send_data_delivery_state(event, state, error)
     except Exception as err:
-        print(f"failed to update dds state: {err}")
+        logger.warning(
+            "failed to update dds state",
+            file_name=event["name"],
+            state=state,
+            error=str(err),
+        )
     return
 
 
@@ -34,3 +55,31 @@ class InvalidFileExtension(Exception):
 
 class InvalidFileType(Exception):
     pass
+
+
+class InvalidFileName(Exception):
+    pass
+
+
+class InvalidConfig(Exception):
+    pass
+
+
+class InvalidArchive(Exception):
+    pass
+
+
+class InvalidContent(Exception):
+    pass
+
+
+class InvalidEvent(Exception):
+    def __init__(self, problems):
+        super().__init__(f"event is invalid: {'; '.join(problems)}")
+        self.problems = problems
+
+
+class EventRejected(Exception):
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
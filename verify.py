@@ -0,0 +1,83 @@
+import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from logger import logger
+from storage import get_storage
+from utils import InvalidContent
+
+_buffers = threading.local()
+
+
+def _buffer(chunk_size):
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None or len(buffer) != chunk_size:
+        buffer = memoryview(bytearray(chunk_size))
+        _buffers.buffer = buffer
+    return buffer
+
+
+def stream_md5(file, chunk_size=1048576):
+    buffer = _buffer(chunk_size)
+    md5 = hashlib.md5()
+    while True:
+        count = file.readinto(buffer)
+        if not count:
+            break
+        md5.update(buffer[:count])
+    return md5.digest()
+
+
+def needs_verification(event, config):
+    return config.verify_enabled and int(event["size"]) <= config.verify_max_bytes
+
+
+def verify_content(event, config):
+    if not needs_verification(event, config):
+        return
+    try:
+        storage = get_storage(config, event["bucket"])
+        with storage.open(event["name"]) as file:
+            digest = stream_md5(file, config.verify_chunk_size)
+    except Exception as error:
+        raise InvalidContent(f"could not read '{event['name']}': {error}") from error
+    md5_hash = str(base64.b64encode(digest), "utf-8")
+    if md5_hash != event["md5Hash"]:
+        raise InvalidContent(
+            f"content of '{event['name']}' has md5Hash {md5_hash}, "
+            f"expected {event['md5Hash']}"
+        )
+    logger.debug("Content verified", file_name=event["name"], size=event["size"])
+
+
+def verify_messages(messages, config):
+    pending = [
+        index
+        for index, (event, _, error) in enumerate(messages)
+        if error is None and needs_verification(event, config)
+    ]
+    if not pending:
+        return messages
+
+    verified = list(messages)
+    events = [messages[index][0] for index in pending]
+    with ThreadPoolExecutor(max_workers=config.verify_workers) as executor:
+        errors = executor.map(_verification_error, events, [config] * len(events))
+        for index, error in zip(pending, errors):
+            if error is not None:
+                verified[index] = (messages[index][0], None, error)
+    return verified
+
+
+def _verification_error(event, config):
+    try:
+        verify_content(event, config)
+    except InvalidContent as error:
+        return error
+    except Exception as error:
+        # one object failing to verify must not stop the rest of the batch
+        invalid = InvalidContent(f"could not verify '{event['name']}': {error}")
+        invalid.__cause__ = error
+        return invalid
+    return None
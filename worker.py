@@ -0,0 +1,275 @@
+import argparse
+import collections
+import dataclasses
+import json
+import queue
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import aggregate
+import clients
+import dds
+from logger import StageTimer, logger
+from main import process_event
+from metrics import MetricsServer, metrics
+from models.config import get_config
+from utils import InvalidConfig
+
+FINALIZE = "OBJECT_FINALIZE"
+
+
+class LocalMessage:
+    def __init__(self, data, attributes=None, source=None):
+        self.data = data
+        self.attributes = attributes or {}
+        self.delivery_attempt = 1
+        self._source = source
+
+    def ack(self):
+        self._source.settle(self, acked=True)
+
+    def nack(self):
+        self._source.settle(self, acked=False)
+
+
+class LocalQueueSource:
+    def __init__(self, concurrency=8, max_messages=100, max_deliveries=5):
+        self.concurrency = concurrency
+        self.max_deliveries = max_deliveries
+        self.acked = []
+        self.dead = []
+        self._queue = queue.Queue()
+        self._flow = threading.BoundedSemaphore(max_messages)
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._stopped = threading.Event()
+        self._executor = None
+        self._dispatcher = None
+
+    def put(self, event, attributes=None):
+        data = json.dumps(event).encode("utf-8")
+        self._queue.put(LocalMessage(data, attributes, source=self))
+
+    def start(self, callback, on_close=None):
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="worker"
+        )
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, args=(callback,), daemon=True
+        )
+        self._dispatcher.start()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout)
+            self._executor.shutdown(wait=True)
+
+    def idle(self):
+        with self._lock:
+            return self._queue.empty() and not self._outstanding
+
+    def settle(self, message, acked):
+        with self._lock:
+            self._outstanding -= 1
+            if acked:
+                self.acked.append(message)
+            elif message.delivery_attempt >= self.max_deliveries:
+                self.dead.append(message)
+            else:
+                message.delivery_attempt += 1
+                self._queue.put(message)
+        self._flow.release()
+
+    def _dispatch(self, callback):
+        while not self._stopped.is_set():
+            # like the Pub/Sub client, messages are leased up to the flow
+            # control limit and handed to the callback executor
+            if not self._flow.acquire(timeout=0.1):
+                continue
+            with self._lock:
+                try:
+                    message = self._queue.get_nowait()
+                except queue.Empty:
+                    message = None
+                else:
+                    self._outstanding += 1
+            if message is None:
+                self._flow.release()
+                self._stopped.wait(0.01)
+                continue
+            self._executor.submit(callback, message)
+
+
+class PubSubSource:
+    def __init__(
+        self, subscription, concurrency=8, max_messages=100, max_bytes=104857600
+    ):
+        from google.cloud import pubsub_v1
+
+        self.subscription = subscription
+        self._client = pubsub_v1.SubscriberClient()
+        self._flow_control = pubsub_v1.types.FlowControl(
+            max_messages=max_messages, max_bytes=max_bytes
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="worker"
+        )
+        self._scheduler = pubsub_v1.subscriber.scheduler.ThreadScheduler(self._executor)
+        self._future = None
+
+    def start(self, callback, on_close=None):
+        self._future = self._client.subscribe(
+            self.subscription,
+            callback,
+            flow_control=self._flow_control,
+            scheduler=self._scheduler,
+        )
+        if on_close is not None:
+            self._future.add_done_callback(lambda _future: on_close())
+
+    def stop(self, timeout=None):
+        if self._future is not None:
+            self._future.cancel()
+            try:
+                self._future.result(timeout=timeout)
+            except Exception as error:
+                if not self._future.cancelled():
+                    logger.error("Subscription failed", error=repr(error))
+        # callbacks already running finish before their clients are shut down
+        self._executor.shutdown(wait=True)
+        self._client.close()
+
+
+class Worker:
+    def __init__(self, config, source):
+        self.config = config
+        self.source = source
+        self.outcomes = collections.Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._metrics_server = None
+
+    def handle(self, message):
+        try:
+            event = json.loads(message.data)
+        except ValueError as error:
+            logger.error("Invalid notification", error=repr(error))
+            self._settle(message, "invalid", ack=True)
+            return
+        if message.attributes.get("eventType", FINALIZE) != FINALIZE:
+            self._settle(message, "ignored", ack=True)
+            return
+        try:
+            outcome, failed_stage = process_event(
+                event, self.config, StageTimer(), flush_dds=False
+            )
+        except Exception as error:
+            logger.error("Event failed", file_name=event.get("name"), error=repr(error))
+            self._settle(message, "errored", ack=False)
+            return
+        # only a publish that failed and was not spooled is worth redelivering,
+        # files that cannot be built or verified would fail the same way again
+        self._settle(
+            message,
+            outcome,
+            ack=outcome in ("published", "spooled") or failed_stage != "publish",
+        )
+
+    def run(self, until_idle=False):
+        self.source.start(self.handle, on_close=self.stop)
+        if metrics.enabled:
+            # a worker runs for hours, so Prometheus scrapes it directly
+            self._metrics_server = MetricsServer(metrics, self.config.metrics_port)
+            self._metrics_server.start()
+        logger.info(
+            "Worker started",
+            concurrency=self.config.worker_concurrency,
+            max_messages=self.config.worker_max_messages,
+        )
+        while not self._stopped.wait(0.1):
+            if until_idle and self.source.idle():
+                break
+        self.shutdown()
+
+    def stop(self, *_args):
+        self._stopped.set()
+
+    def shutdown(self):
+        timeout = self.config.worker_shutdown_timeout
+        self.source.stop(timeout)
+        aggregate.shutdown()
+        dds.shutdown(timeout)
+        clients.shutdown()
+        if self._metrics_server is not None:
+            self._metrics_server.stop()
+        logger.info("Worker stopped", **dict(self.outcomes))
+
+    def _settle(self, message, outcome, ack):
+        with self._lock:
+            self.outcomes[outcome] += 1
+        if ack:
+            message.ack()
+        else:
+            message.nack()
+
+
+def create_source(config, events=None):
+    if events is not None:
+        source = LocalQueueSource(
+            concurrency=config.worker_concurrency,
+            max_messages=config.worker_max_messages,
+        )
+        for event in events:
+            source.put(event)
+        return source
+    subscription = config.subscription
+    if "/" not in subscription:
+        subscription = f"projects/{config.project_id}/subscriptions/{subscription}"
+    return PubSubSource(
+        subscription,
+        concurrency=config.worker_concurrency,
+        max_messages=config.worker_max_messages,
+        max_bytes=config.worker_max_bytes,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Publish manifests for GCS notifications pulled from Pub/Sub"
+    )
+    parser.add_argument(
+        "--subscription", help="subscription to pull, defaults to SUBSCRIPTION"
+    )
+    parser.add_argument("--concurrency", type=int, help="events handled at once")
+    parser.add_argument(
+        "--events",
+        type=argparse.FileType("r"),
+        help="JSON lines file of events to handle from a local queue, then exit",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        config = get_config()
+    except InvalidConfig as error:
+        parser.error(str(error))
+    if args.subscription:
+        config = dataclasses.replace(config, subscription=args.subscription)
+    if args.concurrency:
+        config = dataclasses.replace(config, worker_concurrency=args.concurrency)
+    events = None
+    if args.events is not None:
+        events = [json.loads(line) for line in args.events if line.strip()]
+    elif not config.subscription:
+        parser.error("no subscription configured, set SUBSCRIPTION or pass --events")
+
+    worker = Worker(config, create_source(config, events))
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(until_idle=events is not None)
+    return 0 if worker.outcomes["errored"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())